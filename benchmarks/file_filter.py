@@ -0,0 +1,122 @@
+"""比较 FileFilter 编译为单个正则前后的过滤速度
+
+    python benchmarks/file_filter.py [-n 100000]
+
+旧实现逐个模式调用 `Path.match`, 新实现对整个路径只匹配一次正则.
+两者对同一组路径的结果必须一致.
+"""
+
+import argparse
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from kirami_cli.handlers.reloader import FileFilter  # noqa: E402
+
+
+class OldFileFilter:
+    """FileFilter 在编译为正则之前的实现"""
+
+    def __init__(
+        self, includes: list[str] | None = None, excludes: list[str] | None = None
+    ):
+        includes = includes or []
+        excludes = excludes or []
+
+        default_includes = ["*.py", "pyproject.toml", "kirami.*"]
+        self.includes = [
+            default for default in default_includes if default not in excludes
+        ]
+        self.includes.extend(includes)
+        self.includes = list(set(self.includes))
+
+        default_excludes = [".*", ".py[cod]", ".sw.*", "~*"]
+        self.excludes = [
+            default for default in default_excludes if default not in includes
+        ]
+        self.exclude_dirs: list[Path] = []
+        for e in excludes:
+            p = Path(e)
+            if p.is_dir():
+                self.exclude_dirs.append(p.resolve())
+            else:
+                self.excludes.append(e)
+        self.excludes = list(set(self.excludes))
+
+    def __call__(self, path: Path) -> bool:
+        for include_pattern in self.includes:
+            if path.match(include_pattern):
+                for exclude_dir in self.exclude_dirs:
+                    if exclude_dir in path.parents:
+                        return False
+
+                return not any(
+                    path.match(exclude_pattern) for exclude_pattern in self.excludes
+                )
+        return False
+
+
+DIRS = ["src", "plugins", "plugins/weather", "data", "node_modules/x", ".git/objects"]
+NAMES = [
+    "__init__.py",
+    "main.py",
+    "config.toml",
+    "kirami.toml",
+    "pyproject.toml",
+    "module.pyc",
+    ".main.py.swp",
+    "~lock.py",
+    "notes.md",
+    "image.png",
+    "test_x.py",
+]
+
+
+def make_paths(root: Path, count: int, seed: int = 0) -> list[Path]:
+    rng = random.Random(seed)
+    return [
+        root.joinpath(*rng.sample(DIRS, rng.randint(1, 3)), rng.choice(NAMES))
+        for _ in range(count)
+    ]
+
+
+def measure(file_filter, paths: list[Path]) -> tuple[float, list[bool]]:
+    started = time.perf_counter()
+    results = [file_filter(path) for path in paths]
+    return time.perf_counter() - started, results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--count", type=int, default=100_000)
+    args = parser.parse_args()
+
+    # excluded directories only count when they exist
+    temp_dir = tempfile.TemporaryDirectory()
+    root = Path(temp_dir.name).resolve()
+    root.joinpath("data").mkdir()
+    paths = make_paths(root, args.count)
+    cases = {
+        "defaults": ([], []),
+        "excludes": (["*.toml"], ["test_*.py", str(root / "data")]),
+    }
+    for name, (includes, excludes) in cases.items():
+        old_time, old_results = measure(OldFileFilter(includes, excludes), paths)
+        new_time, new_results = measure(FileFilter(includes, excludes), paths)
+        mismatches = sum(a != b for a, b in zip(old_results, new_results))
+        print(  # noqa: T201
+            f"{name:<10} old {old_time:.3f}s  new {new_time:.3f}s  "
+            f"speedup {old_time / new_time:.1f}x  matched {sum(new_results)}  "
+            f"mismatches {mismatches}"
+        )
+        if mismatches:
+            sys.exit(1)
+    temp_dir.cleanup()
+
+
+if __name__ == "__main__":
+    main()
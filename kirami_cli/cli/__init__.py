@@ -107,12 +107,38 @@ async def cli(ctx: click.Context):
     await run_sync(ctx.invoke)(sub_cmd)
 
 
-from .commands import adapter, create, driver, migrate, plugin, run, self
+from .commands import (
+    adapter,
+    bench,
+    compile_project,
+    create,
+    ctl,
+    driver,
+    install,
+    lock,
+    mem,
+    migrate,
+    plugin,
+    profile,
+    run,
+    self,
+    sync,
+    wheelhouse,
+)
 
 cli.add_command(create)
 cli.add_command(run)
+cli.add_command(compile_project)
+cli.add_command(profile)
+cli.add_command(mem)
+cli.add_command(bench)
+cli.add_command(install)
+cli.add_command(sync)
+cli.add_command(lock)
 cli.add_command(plugin)
 cli.add_command(adapter)
 cli.add_command(driver)
 cli.add_command(self)
 cli.add_command(migrate)
+cli.add_command(wheelhouse)
+cli.add_command(ctl)
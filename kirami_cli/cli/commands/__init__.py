@@ -1,7 +1,16 @@
 from .adapter import adapter as adapter
+from .bench import bench as bench
+from .ctl import ctl as ctl
+from .dependency import install as install
+from .dependency import lock as lock
+from .dependency import sync as sync
 from .driver import driver as driver
+from .mem import mem as mem
 from .migrate import migrate as migrate
 from .plugin import plugin as plugin
+from .profile import profile as profile
+from .project import compile_project as compile_project
 from .project import create as create
 from .project import run as run
 from .self import self as self
+from .wheelhouse import wheelhouse as wheelhouse
@@ -0,0 +1,454 @@
+import asyncio
+import json
+from collections.abc import Awaitable, Callable
+from pathlib import Path
+from typing import Any
+
+import click
+
+from kirami_cli import _
+from kirami_cli.cli import ClickAliasedGroup, run_async
+from kirami_cli.handlers import (
+    DEFAULT_SELF_ID,
+    AgentServer,
+    Capture,
+    LoadResult,
+    OneBotStandIn,
+    compare_results,
+    feed_events,
+    generate_load,
+    get_listen_address,
+    run_project,
+    terminate_process,
+    wait_for_listen,
+)
+
+
+def print_load_result(result: LoadResult) -> None:
+    click.echo(
+        _(
+            "Sent {sent} events in {duration:.1f}s ({rate:.1f} events/s), "
+            "{failed} failed."
+        ).format(
+            sent=result.sent,
+            duration=result.duration,
+            rate=result.events_per_second,
+            failed=result.failed,
+        )
+    )
+    click.echo(
+        _("Replied to {replied} events ({rate:.1f} replies/s).").format(
+            replied=len(result.latencies), rate=result.replies_per_second
+        )
+    )
+    if result.latencies:
+        latency = result.to_dict()["latency"]
+        click.echo(
+            _("Reply latency: ")
+            + ", ".join(
+                f"{name} {value * 1000:.1f} ms" for name, value in latency.items()
+            )
+        )
+    if result.api_calls:
+        click.echo(
+            _("API calls: ")
+            + ", ".join(
+                f"{action} {count}" for action, count in result.api_calls.most_common()
+            )
+        )
+
+
+def print_comparison(old: dict[str, Any], new: dict[str, Any]) -> None:
+    click.echo(
+        f"{_('metric'):<24} {_('previous'):>12} {_('this run'):>12} {_('change'):>9}"
+    )
+    for metric, before, after in compare_results(old, new):
+        change = ""
+        if before and after is not None:
+            change = f"{(after - before) / before:+.1%}"
+        values = [f"{'-' if value is None else value:>12}" for value in (before, after)]
+        if metric.startswith("latency_"):
+            metric += " (ms)"
+            values = [
+                f"{'-' if value is None else f'{value * 1000:.1f}':>12}"
+                for value in (before, after)
+            ]
+        elif metric.endswith("_per_second"):
+            values = [
+                f"{'-' if value is None else f'{value:.1f}':>12}"
+                for value in (before, after)
+            ]
+        click.echo(f"{metric:<24} {' '.join(values)} {change:>9}")
+
+
+def bot_options(func: Callable[..., Any]) -> Callable[..., Any]:
+    """`kirami bench` 中连接 bot 的共同选项"""
+    options = [
+        click.option(
+            "-f",
+            "--file",
+            default="bot.py",
+            show_default=True,
+            help=_("Exist entry file of your bot."),
+        ),
+        click.option(
+            "--attach",
+            is_flag=True,
+            default=False,
+            help=_("Use a bot that is already running instead of starting one."),
+        ),
+        click.option(
+            "--mode",
+            type=click.Choice(["ws", "http"]),
+            default="ws",
+            show_default=True,
+            help=_("Report events over reverse WebSocket or HTTP POST."),
+        ),
+        click.option(
+            "--host",
+            default=None,
+            help=_("Host of the bot, from the config by default."),
+        ),
+        click.option(
+            "--port",
+            type=int,
+            default=None,
+            help=_("Port of the bot, from the config by default."),
+        ),
+        click.option(
+            "--api-port",
+            type=click.IntRange(min=0, max=65535),
+            default=5700,
+            show_default=True,
+            help=_(
+                "Port to serve the API calls of the bot on in HTTP mode, "
+                "onebot_api_roots of a running bot needs to point to it."
+            ),
+        ),
+        click.option(
+            "--access-token", default=None, help=_("OneBot access token of the bot.")
+        ),
+        click.option(
+            "--secret", default=None, help=_("OneBot secret to sign HTTP events.")
+        ),
+        click.option(
+            "--grace",
+            type=click.FloatRange(min=0),
+            default=5.0,
+            show_default=True,
+            help=_("Seconds to wait for replies after the last event."),
+        ),
+        click.option(
+            "--show-output",
+            is_flag=True,
+            default=False,
+            help=_("Show the output of the started bot, which slows it down."),
+        ),
+        click.option(
+            "-o",
+            "--output",
+            type=click.Path(dir_okay=False, writable=True, path_type=Path),
+            default=None,
+            help=_("File to write the JSON report to."),
+        ),
+    ]
+    for option in reversed(options):
+        func = option(func)
+    return func
+
+
+async def run_bench(
+    ctx: click.Context,
+    stand_in: OneBotStandIn,
+    feed: Callable[[OneBotStandIn], Awaitable[LoadResult]],
+    *,
+    file: str,
+    attach: bool,
+    mode: str,
+    host: str | None,
+    port: int | None,
+    api_port: int,
+    show_output: bool,
+    output: Path | None,
+) -> LoadResult:
+    """连接到 bot 并上报事件, 未连接到已运行的 bot 时启动 bot"""
+    default_host, default_port = get_listen_address()
+    host = host or default_host
+    if host in ("0.0.0.0", "::"):
+        host = "127.0.0.1"
+    port = port or default_port
+    address = f"{host}:{port}"
+
+    agent: AgentServer | None = None
+    process: asyncio.subprocess.Process | None = None
+    try:
+        env: dict[str, str] = {}
+        if mode == "http":
+            try:
+                api_port = await stand_in.start_api_server(
+                    f"http://{address}/onebot/v11/", port=api_port
+                )
+            except OSError as e:
+                click.secho(
+                    _("Failed to serve the API on port {port}: {error}").format(
+                        port=api_port, error=e
+                    ),
+                    fg="red",
+                )
+                ctx.exit(1)
+            api_root = f"http://127.0.0.1:{api_port}"
+            env["ONEBOT_API_ROOTS"] = json.dumps({str(stand_in.self_id): api_root})
+            if attach:
+                click.secho(
+                    _("Serving the API on {url} for the bot.").format(url=api_root),
+                    fg="yellow",
+                )
+
+        if not attach:
+            agent = AgentServer()
+            await agent.start()
+            output_pipe = None if show_output else asyncio.subprocess.DEVNULL
+            process = await run_project(
+                exist_bot=Path(file),
+                agent=agent,
+                env=env,
+                stdout=output_pipe,
+                stderr=output_pipe,
+            )
+            try:
+                connection = await agent.wait_for(process.pid, 60.0)
+                await connection.wait_event("ready", 60.0)
+            except asyncio.TimeoutError:
+                click.secho(
+                    _("The bot did not get ready, see --show-output for why."),
+                    fg="red",
+                )
+                ctx.exit(1)
+            # the server starts listening after the bot reports ready
+            await wait_for_listen(host, port, 10.0)
+
+        if mode == "ws":
+            try:
+                await stand_in.connect(f"ws://{address}/onebot/v11/ws")
+            except (OSError, asyncio.TimeoutError) as e:
+                click.secho(
+                    _("Failed to connect to the bot at {address}: {error}").format(
+                        address=address, error=e
+                    ),
+                    fg="red",
+                )
+                ctx.exit(1)
+
+        result = await feed(stand_in)
+    finally:
+        await stand_in.close()
+        if process is not None and process.returncode is None:
+            await terminate_process(process)
+        if agent is not None:
+            await agent.close()
+
+    print_load_result(result)
+    if output is not None:
+        output.write_text(json.dumps(result.to_dict(), indent=2), encoding="utf-8")
+        click.secho(_("Wrote the report to {path}").format(path=output), fg="green")
+    return result
+
+
+def _parse_speed(ctx: click.Context, param: click.Parameter, value: str) -> float:
+    try:
+        speed = float(value.lower().removesuffix("x"))
+    except ValueError:
+        speed = 0.0
+    if speed <= 0:
+        raise click.BadParameter(
+            _("{value!r} is not a speed like 10x.").format(value=value)
+        )
+    return speed
+
+
+@click.group(
+    cls=ClickAliasedGroup,
+    help=_("Measure the performance of the bot without a real account."),
+)
+def bench():
+    pass
+
+
+@bench.command(
+    help=_(
+        "Stand in for a OneBot V11 implementation and feed the bot synthetic "
+        "events at a fixed rate."
+    )
+)
+@bot_options
+@click.option(
+    "-r",
+    "--rate",
+    type=click.FloatRange(min=0.1),
+    default=50.0,
+    show_default=True,
+    help=_("Events to send each second."),
+)
+@click.option(
+    "-d",
+    "--duration",
+    type=click.FloatRange(min=0.1),
+    default=10.0,
+    show_default=True,
+    help=_("Seconds to send events for."),
+)
+@click.option(
+    "-m",
+    "--message",
+    "messages",
+    multiple=True,
+    default=["hello"],
+    show_default=True,
+    help=_("Message text to send, used in turn when given multiple times."),
+)
+@click.option(
+    "--group-ratio",
+    type=click.FloatRange(min=0, max=1),
+    default=0.5,
+    show_default=True,
+    help=_("Share of group events, the rest are private."),
+)
+@click.option(
+    "--notice-ratio",
+    type=click.FloatRange(min=0, max=1),
+    default=0.0,
+    show_default=True,
+    help=_("Share of poke notices among the events."),
+)
+@click.option(
+    "--self-id",
+    type=int,
+    default=DEFAULT_SELF_ID,
+    show_default=True,
+    help=_("Account of the simulated bot."),
+)
+@click.pass_context
+@run_async
+async def load(
+    ctx: click.Context,
+    rate: float,
+    duration: float,
+    messages: tuple[str, ...],
+    group_ratio: float,
+    notice_ratio: float,
+    self_id: int,
+    access_token: str | None,
+    secret: str | None,
+    grace: float,
+    **options: Any,
+):
+    async def feed(stand_in: OneBotStandIn) -> LoadResult:
+        click.secho(
+            _("Sending {rate} events/s for {duration}s ...").format(
+                rate=rate, duration=duration
+            ),
+            fg="yellow",
+        )
+        return await generate_load(
+            stand_in,
+            rate=rate,
+            duration=duration,
+            messages=messages,
+            group_ratio=group_ratio,
+            notice_ratio=notice_ratio,
+            grace=grace,
+        )
+
+    stand_in = OneBotStandIn(self_id=self_id, access_token=access_token, secret=secret)
+    await run_bench(ctx, stand_in, feed, **options)
+
+
+@bench.command(
+    help=_(
+        "Replay the events recorded by kirami run --capture against the bot "
+        "and measure its replies."
+    )
+)
+@click.argument("capture", type=click.Path(exists=True, dir_okay=False, path_type=Path))
+@bot_options
+@click.option(
+    "--speed",
+    default="1x",
+    show_default=True,
+    callback=_parse_speed,
+    help=_("Replay speed, e.g. 10x replays ten times faster than recorded."),
+)
+@click.option(
+    "--self-id",
+    type=int,
+    default=None,
+    help=_("Account of the simulated bot, the recorded one by default."),
+)
+@click.option(
+    "--compare",
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    default=None,
+    help=_("JSON report of a previous run to compare this run with."),
+)
+@click.pass_context
+@run_async
+async def replay(
+    ctx: click.Context,
+    capture: Path,
+    speed: float,
+    self_id: int | None,
+    compare: Path | None,
+    access_token: str | None,
+    secret: str | None,
+    grace: float,
+    **options: Any,
+):
+    try:
+        recorded = Capture.load(capture)
+    except (OSError, ValueError) as e:
+        click.secho(_("Failed to read the capture: {error}").format(error=e), fg="red")
+        ctx.exit(1)
+    previous = None
+    if compare is not None:
+        try:
+            previous = json.loads(compare.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            click.secho(
+                _("Failed to read the report: {error}").format(error=e), fg="red"
+            )
+            ctx.exit(1)
+    if not recorded.events:
+        click.secho(_("No OneBot V11 events were captured."), fg="red")
+        ctx.exit(1)
+    if recorded.skipped:
+        click.secho(
+            _("Skipped {count} events of other adapters.").format(
+                count=recorded.skipped
+            ),
+            fg="yellow",
+        )
+
+    if self_id is None:
+        self_id = int(recorded.events[0][1].get("self_id", DEFAULT_SELF_ID))
+
+    async def feed(stand_in: OneBotStandIn) -> LoadResult:
+        click.secho(
+            _("Replaying {count} events of {duration:.1f}s at {speed}x ...").format(
+                count=len(recorded.events), duration=recorded.duration, speed=speed
+            ),
+            fg="yellow",
+        )
+        return await feed_events(
+            stand_in, recorded.schedule(speed, self_id), grace=grace
+        )
+
+    stand_in = OneBotStandIn(self_id=self_id, access_token=access_token, secret=secret)
+    result = await run_bench(ctx, stand_in, feed, **options)
+    click.echo(
+        _("{count} API calls were recorded, {replayed} made in this run.").format(
+            count=sum(recorded.api_calls.values()),
+            replayed=sum(result.api_calls.values()),
+        )
+    )
+    if previous is not None:
+        print_comparison(previous, result.to_dict())
@@ -0,0 +1,104 @@
+import asyncio
+import json
+from pathlib import Path
+from typing import Any
+
+import click
+
+from kirami_cli import _
+from kirami_cli.cli import ClickAliasedGroup, run_async
+from kirami_cli.consts import WINDOWS
+from kirami_cli.handlers import format_bytes, get_control_path, send_control
+
+
+async def _send(ctx: click.Context, command: str, **data: Any) -> dict[str, Any]:
+    if WINDOWS:
+        click.secho(_("Control socket is not supported on Windows!"), fg="red")
+        ctx.exit(1)
+
+    path: Path | None = ctx.parent.params.get("socket") if ctx.parent else None
+    path = path or get_control_path()
+    try:
+        reply = await send_control(path, command, timeout=10.0, **data)
+    except (OSError, asyncio.TimeoutError) as e:
+        click.secho(
+            _("Failed to reach the running bot at {path}: {error}").format(
+                path=path, error=e
+            ),
+            fg="red",
+        )
+        ctx.exit(1)
+    if not reply.get("ok"):
+        click.secho(reply.get("error", _("Unknown error.")), fg="red")
+        ctx.exit(1)
+    return reply
+
+
+@click.group(
+    cls=ClickAliasedGroup,
+    help=_("Control the bot started by kirami run in this project."),
+)
+@click.option(
+    "-s",
+    "--socket",
+    default=None,
+    type=click.Path(dir_okay=False, path_type=Path),
+    help=_("Path of the control socket, found from the project by default."),
+)
+def ctl(socket: Path | None):
+    pass
+
+
+@ctl.command(help=_("Restart the bot now, one worker after another."))
+@click.pass_context
+@run_async
+async def reload(ctx: click.Context):
+    await _send(ctx, "reload")
+    click.secho(_("Reload requested."), fg="green")
+
+
+@ctl.command(help=_("Show the resource usage of the bot processes."))
+@click.option("--json", "as_json", is_flag=True, default=False, help=_("Print JSON."))
+@click.pass_context
+@run_async
+async def stats(ctx: click.Context, as_json: bool):
+    reply = await _send(ctx, "stats")
+    if as_json:
+        click.echo(json.dumps(reply["workers"], indent=2))
+        return
+
+    for worker in reply["workers"]:
+        if not worker["running"]:
+            click.secho(
+                _("worker {worker}: not running, {restarts} restarts").format(**worker),
+                fg="yellow",
+            )
+            continue
+        click.echo(
+            _(
+                "worker {worker} [{pid}]: RSS {rss}, CPU {cpu:.1f}%, "
+                "{open_fds} fds, {threads} threads, {restarts} restarts"
+            ).format(
+                **{**worker, "rss": format_bytes(worker["rss"])},
+                cpu=worker["cpu_percent"],
+            )
+        )
+
+
+@ctl.command("restart-worker", help=_("Restart a worker now."))
+@click.argument("index", type=click.IntRange(min=1))
+@click.pass_context
+@run_async
+async def restart_worker(ctx: click.Context, index: int):
+    await _send(ctx, "restart-worker", worker=index)
+    click.secho(
+        _("Restart of worker {index} requested.").format(index=index), fg="green"
+    )
+
+
+@ctl.command(help=_("Stop the bot and kirami run."))
+@click.pass_context
+@run_async
+async def stop(ctx: click.Context):
+    await _send(ctx, "stop")
+    click.secho(_("Stop requested."), fg="green")
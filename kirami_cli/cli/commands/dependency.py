@@ -0,0 +1,230 @@
+from pathlib import Path
+
+import click
+
+from kirami_cli import _
+from kirami_cli.cli import ClickAliasedCommand, run_async
+from kirami_cli.exceptions import LockEnvironmentError, ModuleLoadFailed
+from kirami_cli.handlers import (
+    DEFAULT_LOCK_FILE,
+    call_pip_install,
+    call_pip_uninstall,
+    check_lock_environment,
+    check_sync_state,
+    get_distributions,
+    get_extra_packages,
+    get_locked_requirements,
+    get_marker_environment,
+    get_missing_packages,
+    get_project_packages,
+    get_project_root,
+    get_sync_state,
+    get_wheelhouse_packages,
+    install_locked,
+    resolve_lock,
+    save_sync_state,
+    write_lock_file,
+)
+
+
+def _echo_lock_environment_error(lock_file: Path, error: LockEnvironmentError):
+    click.secho(
+        _(
+            "Lock file {lock_file} was resolved for {locked}, but the environment "
+            "is {current}. Run `kirami lock` again."
+        ).format(lock_file=lock_file, locked=error.locked, current=error.current),
+        fg="red",
+    )
+
+
+@click.command(
+    cls=ClickAliasedCommand,
+    context_settings={"ignore_unknown_options": True},
+    help=_("Install dependencies of current project."),
+)
+@click.option(
+    "-w",
+    "--wheelhouse",
+    default=None,
+    type=click.Path(exists=True, file_okay=False, path_type=Path),
+    help=_("Install from a local wheelhouse without network."),
+)
+@click.option(
+    "-l",
+    "--locked",
+    is_flag=True,
+    default=False,
+    help=_("Install the exact versions pinned in the lock file."),
+)
+@click.option(
+    "-j",
+    "--jobs",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help=_("Number of concurrent downloads when installing locked packages."),
+)
+@click.argument("pip_args", nargs=-1, default=None)
+@click.pass_context
+@run_async
+async def install(
+    ctx: click.Context,
+    wheelhouse: Path | None,
+    locked: bool,
+    jobs: int,
+    pip_args: list[str] | None,
+):
+    if locked:
+        lock_file = get_project_root() / DEFAULT_LOCK_FILE
+        if not lock_file.is_file():
+            click.secho(
+                _("Lock file {lock_file} not found! Run `kirami lock` first.").format(
+                    lock_file=lock_file
+                ),
+                fg="red",
+            )
+            ctx.exit(1)
+
+        try:
+            returncode = await install_locked(
+                lock_file, pip_args, jobs=jobs, wheelhouse=wheelhouse
+            )
+        except LockEnvironmentError as e:
+            _echo_lock_environment_error(lock_file, e)
+            ctx.exit(1)
+        if returncode != 0:
+            ctx.exit(returncode)
+        return
+
+    packages = get_wheelhouse_packages(wheelhouse) if wheelhouse else None
+    if packages is None:
+        try:
+            packages = await get_project_packages()
+        except ModuleLoadFailed as e:
+            click.secho(repr(e), fg="red")
+            ctx.exit(1)
+
+    proc = await call_pip_install(packages, pip_args, wheelhouse=wheelhouse)
+    await proc.wait()
+
+    if proc.returncode != 0:
+        ctx.exit(proc.returncode or 1)
+
+
+@click.command(
+    cls=ClickAliasedCommand,
+    context_settings={"ignore_unknown_options": True},
+    help=_("Install only the missing dependencies of current project."),
+)
+@click.option(
+    "--prune",
+    is_flag=True,
+    default=False,
+    help=_("Uninstall plugins and adapters not used by the project."),
+)
+@click.option(
+    "--force",
+    is_flag=True,
+    default=False,
+    help=_("Check the environment even if nothing changed."),
+)
+@click.argument("pip_args", nargs=-1, default=None)
+@click.pass_context
+@run_async
+async def sync(
+    ctx: click.Context, prune: bool, force: bool, pip_args: list[str] | None
+):
+    state = await get_sync_state()
+    if not force and check_sync_state(state):
+        click.secho(_("Environment is already in sync."), fg="green")
+        return
+
+    install_args = list(pip_args or [])
+    lock_file = get_project_root() / DEFAULT_LOCK_FILE
+    if lock_file.is_file():
+        try:
+            await check_lock_environment(lock_file)
+        except LockEnvironmentError as e:
+            _echo_lock_environment_error(lock_file, e)
+            ctx.exit(1)
+        # the lock file already contains the whole dependency tree
+        packages = get_locked_requirements(lock_file)
+        install_args.insert(0, "--no-deps")
+    else:
+        try:
+            packages = await get_project_packages()
+        except ModuleLoadFailed as e:
+            click.secho(repr(e), fg="red")
+            ctx.exit(1)
+
+    dists = await get_distributions()
+    environment = await get_marker_environment()
+    missing = get_missing_packages(packages, dists, environment)
+    extras = get_extra_packages(packages, dists, environment) if prune else []
+
+    if missing:
+        click.secho(
+            _("Installing {packages} ...").format(packages=", ".join(missing)),
+            fg="yellow",
+        )
+        proc = await call_pip_install(missing, install_args)
+        await proc.wait()
+        if proc.returncode != 0:
+            ctx.exit(proc.returncode or 1)
+
+    if extras:
+        click.secho(
+            _("Uninstalling {packages} ...").format(packages=", ".join(extras)),
+            fg="yellow",
+        )
+        proc = await call_pip_uninstall(extras, ["--yes"])
+        await proc.wait()
+        if proc.returncode != 0:
+            ctx.exit(proc.returncode or 1)
+
+    if not missing and not extras:
+        click.secho(_("Environment is already in sync."), fg="green")
+
+    save_sync_state(await get_sync_state())
+
+
+@click.command(
+    cls=ClickAliasedCommand,
+    context_settings={"ignore_unknown_options": True},
+    help=_("Resolve dependencies of current project and write the lock file."),
+)
+@click.argument("pip_args", nargs=-1, default=None)
+@click.pass_context
+@run_async
+async def lock(ctx: click.Context, pip_args: list[str] | None):
+    try:
+        packages = await get_project_packages()
+    except ModuleLoadFailed as e:
+        click.secho(repr(e), fg="red")
+        ctx.exit(1)
+
+    click.secho(
+        _("Resolving {packages} ...").format(packages=", ".join(packages)),
+        fg="yellow",
+    )
+    locked, output = await resolve_lock(packages, pip_args)
+    if locked is None:
+        click.echo(output.decode(errors="replace"))
+        click.secho(_("Failed to resolve dependencies!"), fg="red")
+        ctx.exit(1)
+
+    lock_file = get_project_root() / DEFAULT_LOCK_FILE
+    if not write_lock_file(lock_file, locked, await get_marker_environment()):
+        click.secho(
+            _(
+                "Some packages have no hashes, e.g. VCS or local references, "
+                "so hashes were left out of the lock file."
+            ),
+            fg="yellow",
+        )
+    click.secho(
+        _("Locked {count} packages to {lock_file}.").format(
+            count=len(locked), lock_file=lock_file
+        ),
+        fg="green",
+    )
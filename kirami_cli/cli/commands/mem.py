@@ -0,0 +1,189 @@
+import asyncio
+from datetime import datetime
+from pathlib import Path
+
+import click
+
+from kirami_cli import _
+from kirami_cli.cli import ClickAliasedGroup, run_async
+from kirami_cli.consts import WINDOWS
+from kirami_cli.handlers import (
+    MemorySnapshot,
+    diff_counts,
+    format_bytes,
+    get_control_path,
+    get_plugin_modules,
+    send_control,
+)
+
+
+def _format_diff(size: int) -> str:
+    return ("+" if size >= 0 else "-") + format_bytes(abs(size))
+
+
+def _load(ctx: click.Context, path: Path) -> MemorySnapshot:
+    try:
+        return MemorySnapshot.load(path)
+    except (OSError, ValueError) as e:
+        click.secho(_("Failed to read the snapshot: {error}").format(error=e), fg="red")
+        ctx.exit(1)
+
+
+def _print_tracing_hint(snapshot: MemorySnapshot) -> None:
+    click.secho(
+        _(
+            "tracemalloc was not tracing process [{pid}], only object counts were "
+            "recorded. Run the bot with --trace-memory, or send SIGUSR2 to a bot "
+            "run with --inspect."
+        ).format(pid=snapshot.pid),
+        fg="yellow",
+    )
+
+
+@click.group(
+    cls=ClickAliasedGroup,
+    help=_("Inspect the memory of the bot started by kirami run in this project."),
+)
+@click.option(
+    "-s",
+    "--socket",
+    default=None,
+    type=click.Path(dir_okay=False, path_type=Path),
+    help=_("Path of the control socket, found from the project by default."),
+)
+def mem(socket: Path | None):
+    pass
+
+
+@mem.command(
+    help=_("Write the allocation sites and object counts of a worker to a file.")
+)
+@click.option(
+    "-o",
+    "--output",
+    type=click.Path(dir_okay=False, writable=True, path_type=Path),
+    default=None,
+    help=_("Snapshot file, named after the current time by default."),
+)
+@click.option(
+    "-w",
+    "--worker",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help=_("Worker to take the snapshot of."),
+)
+@click.option(
+    "--top",
+    type=click.IntRange(min=0),
+    default=10,
+    show_default=True,
+    help=_("Number of entries to show."),
+)
+@click.pass_context
+@run_async
+async def snapshot(ctx: click.Context, output: Path | None, worker: int, top: int):
+    if WINDOWS:
+        click.secho(_("Control socket is not supported on Windows!"), fg="red")
+        ctx.exit(1)
+
+    if output is None:
+        output = Path(datetime.now().strftime("kirami-memory-%Y%m%d-%H%M%S.json"))
+    path: Path | None = ctx.parent.params.get("socket") if ctx.parent else None
+    path = path or get_control_path()
+    try:
+        reply = await send_control(
+            path,
+            "memory",
+            timeout=180.0,
+            worker=worker,
+            output=str(output.resolve()),
+        )
+    except (OSError, asyncio.TimeoutError) as e:
+        click.secho(
+            _("Failed to reach the running bot at {path}: {error}").format(
+                path=path, error=e
+            ),
+            fg="red",
+        )
+        ctx.exit(1)
+    if not reply.get("ok"):
+        click.secho(reply.get("error", _("Unknown error.")), fg="red")
+        ctx.exit(1)
+
+    click.secho(_("Wrote the snapshot to {path}").format(path=output), fg="green")
+    result = _load(ctx, output)
+    if not result.tracing:
+        _print_tracing_hint(result)
+    else:
+        click.echo(
+            _("Traced memory: {size}").format(size=format_bytes(result.traced_memory))
+        )
+        groups = result.groups(get_plugin_modules())
+        click.echo(_("Top allocations by package:"))
+        for name, (size, count) in sorted(
+            groups.items(), key=lambda item: item[1][0], reverse=True
+        )[:top]:
+            click.echo(f"  {format_bytes(size):>12} {count:>10}  {name}")
+
+    click.echo(_("Top objects by type:"))
+    for name, count in list(result.types.items())[:top]:
+        click.echo(f"  {count:>10}  {name}")
+
+
+@mem.command(help=_("Compare two snapshots written by kirami mem snapshot."))
+@click.argument("old", type=click.Path(exists=True, dir_okay=False, path_type=Path))
+@click.argument("new", type=click.Path(exists=True, dir_okay=False, path_type=Path))
+@click.option(
+    "--top",
+    type=click.IntRange(min=0),
+    default=10,
+    show_default=True,
+    help=_("Number of entries to show."),
+)
+@click.pass_context
+def diff(ctx: click.Context, old: Path, new: Path, top: int):
+    before = _load(ctx, old)
+    after = _load(ctx, new)
+    if before.pid != after.pid:
+        click.secho(
+            _("The snapshots are of different processes [{old}] and [{new}].").format(
+                old=before.pid, new=after.pid
+            ),
+            fg="yellow",
+        )
+    click.echo(
+        _("{seconds:.0f}s between the snapshots.").format(
+            seconds=after.time - before.time
+        )
+    )
+
+    if not (before.tracing and after.tracing):
+        _print_tracing_hint(after if before.tracing else before)
+    else:
+        click.echo(
+            _("Traced memory: {size} ({diff})").format(
+                size=format_bytes(after.traced_memory),
+                diff=_format_diff(after.traced_memory - before.traced_memory),
+            )
+        )
+        plugins = get_plugin_modules()
+        old_groups = before.groups(plugins)
+        new_groups = after.groups(plugins)
+        click.echo(_("Top changes by package:"))
+        for name, size, change in diff_counts(
+            {name: size for name, (size, _count) in old_groups.items()},
+            {name: size for name, (size, _count) in new_groups.items()},
+        )[:top]:
+            click.echo(f"  {_format_diff(change):>12} {format_bytes(size):>12}  {name}")
+
+        click.echo(_("Top changes by line:"))
+        for name, size, change in diff_counts(
+            {f"{site.file}:{site.line}": site.size for site in before.sites},
+            {f"{site.file}:{site.line}": site.size for site in after.sites},
+        )[:top]:
+            click.echo(f"  {_format_diff(change):>12} {format_bytes(size):>12}  {name}")
+
+    click.echo(_("Top changes by type:"))
+    for name, count, change in diff_counts(before.types, after.types)[:top]:
+        click.echo(f"  {change:>+10} {count:>10}  {name}")
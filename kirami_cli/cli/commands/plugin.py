@@ -14,6 +14,7 @@ from kirami_cli.handlers import (
     call_pip_update,
     create_plugin,
     format_package_results,
+    get_installed_plugins,
     list_plugins,
 )
 
@@ -54,8 +55,22 @@ async def plugin(ctx: click.Context):
 @plugin.command(
     name="list", help=_("List kiramibot plugins published on kiramibot homepage.")
 )
+@click.option(
+    "-i",
+    "--installed",
+    is_flag=True,
+    default=False,
+    help=_("List plugins installed in current environment."),
+)
 @run_async
-async def get_list():
+async def get_list(installed: bool):
+    if installed:
+        if dists := await get_installed_plugins():
+            click.echo("\n".join(f"{d.name} ({d.version})" for d in dists))
+        else:
+            click.secho(_("No plugins are installed."), fg="yellow")
+        return
+
     plugins = await list_plugins()
     click.echo(format_package_results(plugins))
 
@@ -0,0 +1,183 @@
+import asyncio
+from pathlib import Path
+from typing import Any
+
+import click
+
+from kirami_cli import _
+from kirami_cli.cli import run_async
+from kirami_cli.consts import WINDOWS
+from kirami_cli.handlers import (
+    AgentServer,
+    get_control_path,
+    request_profile,
+    run_project,
+    send_control,
+    summarize_folded,
+    terminate_process,
+)
+
+
+async def _profile_new_bot(
+    ctx: click.Context, file: str, output: Path, **options: Any
+) -> dict[str, Any]:
+    agent = AgentServer()
+    await agent.start()
+    proc = await run_project(exist_bot=Path(file), agent=agent)
+    try:
+        try:
+            connection = await agent.wait_for(proc.pid, 60.0)
+            await connection.wait_event("ready", 60.0)
+        except asyncio.TimeoutError:
+            click.secho(_("The bot did not get ready."), fg="red")
+            ctx.exit(1)
+        click.secho(
+            _("Profiling the bot for {duration}s ...").format(
+                duration=options["duration"]
+            ),
+            fg="yellow",
+        )
+        try:
+            return await request_profile(connection, output, **options)
+        except (RuntimeError, ConnectionError) as e:
+            click.secho(
+                _("Failed to profile the bot: {error}").format(error=e), fg="red"
+            )
+            ctx.exit(1)
+    finally:
+        if proc.returncode is None:
+            await terminate_process(proc)
+        await agent.close()
+
+
+async def _profile_running_bot(
+    ctx: click.Context, worker: int, output: Path, **options: Any
+) -> dict[str, Any]:
+    if WINDOWS:
+        click.secho(_("Control socket is not supported on Windows!"), fg="red")
+        ctx.exit(1)
+
+    click.secho(
+        _("Profiling worker {worker} for {duration}s ...").format(
+            worker=worker, duration=options["duration"]
+        ),
+        fg="yellow",
+    )
+    path = get_control_path()
+    try:
+        reply = await send_control(
+            path,
+            "profile",
+            timeout=options["duration"] + 60.0,
+            worker=worker,
+            output=str(output.resolve()),
+            **options,
+        )
+    except (OSError, asyncio.TimeoutError) as e:
+        click.secho(
+            _("Failed to reach the running bot at {path}: {error}").format(
+                path=path, error=e
+            ),
+            fg="red",
+        )
+        ctx.exit(1)
+    if not reply.get("ok"):
+        click.secho(reply.get("error", _("Unknown error.")), fg="red")
+        ctx.exit(1)
+    return reply
+
+
+@click.command(
+    help=_(
+        "Sample the call stacks of the bot into collapsed stacks for flamegraph tools."
+    )
+)
+@click.option(
+    "-f",
+    "--file",
+    default="bot.py",
+    show_default=True,
+    help=_("Exist entry file of your bot."),
+)
+@click.option(
+    "-d",
+    "--duration",
+    type=click.FloatRange(min=0.1),
+    default=30.0,
+    show_default=True,
+    help=_("Seconds to profile for."),
+)
+@click.option(
+    "-o",
+    "--output",
+    type=click.Path(dir_okay=False, writable=True, path_type=Path),
+    default="kirami-profile",
+    show_default=True,
+    help=_("Output path without extension, .folded and .pstats are appended."),
+)
+@click.option(
+    "--interval",
+    type=click.FloatRange(min=0.001),
+    default=0.005,
+    show_default=True,
+    help=_("Seconds between two samples."),
+)
+@click.option(
+    "--cprofile",
+    is_flag=True,
+    default=False,
+    help=_("Also record the event loop thread with cProfile into pstats."),
+)
+@click.option(
+    "--attach",
+    is_flag=True,
+    default=False,
+    help=_("Profile the bot started by kirami run instead of starting one."),
+)
+@click.option(
+    "-w",
+    "--worker",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help=_("Worker to profile when attaching."),
+)
+@click.option(
+    "--top",
+    type=click.IntRange(min=0),
+    default=10,
+    show_default=True,
+    help=_("Number of functions to show."),
+)
+@click.pass_context
+@run_async
+async def profile(
+    ctx: click.Context,
+    file: str,
+    duration: float,
+    output: Path,
+    interval: float,
+    cprofile: bool,
+    attach: bool,
+    worker: int,
+    top: int,
+):
+    options = {"duration": duration, "interval": interval, "cprofile": cprofile}
+    if attach:
+        reply = await _profile_running_bot(ctx, worker, output, **options)
+    else:
+        reply = await _profile_new_bot(ctx, file, output, **options)
+
+    folded = Path(f"{output}.folded")
+    click.secho(
+        _("Took {samples} samples of process [{pid}].").format(**reply), fg="green"
+    )
+    click.echo(_("Collapsed stacks: {path}").format(path=folded))
+    if cprofile:
+        click.echo(_("cProfile stats: {path}").format(path=f"{output}.pstats"))
+
+    samples = reply["samples"] or 1
+    if rows := summarize_folded(folded, top):
+        click.echo(_("   self   total  function"))
+    for frame, own, total in rows:
+        click.echo(f"{own / samples:7.1%} {total / samples:7.1%}  {frame}")
@@ -1,11 +1,15 @@
+import asyncio
 import json
 import re
+import shutil
 import sys
+import time
+from collections.abc import Awaitable, Callable, Iterable
 from dataclasses import dataclass, field
 from functools import partial
 from logging import Logger
 from pathlib import Path
-from typing import Any
+from typing import Any, Literal, TypeVar
 
 import click
 from noneprompt import (
@@ -17,24 +21,50 @@ from noneprompt import (
 )
 
 from kirami_cli import _
-from kirami_cli.cli import CLI_DEFAULT_STYLE, ClickAliasedCommand, run_async
-from kirami_cli.config import ConfigManager
-from kirami_cli.consts import DEFAULT_ADAPTER, DEFAULT_DRIVER
+from kirami_cli.cli import CLI_DEFAULT_STYLE, ClickAliasedCommand, run_async, run_sync
+from kirami_cli.config import Adapter, Driver
+from kirami_cli.consts import DEFAULT_ADAPTER, DEFAULT_DRIVER, WINDOWS
 from kirami_cli.exceptions import ModuleLoadFailed
 from kirami_cli.handlers import (
+    DEFAULT_METRICS_PORT,
+    LISTEN_PORT_ENV,
+    AgentServer,
+    ControlServer,
     FileFilter,
+    LogFile,
+    MetricsServer,
+    PreloadServer,
     Reloader,
+    StartupProfile,
+    Supervisor,
+    Worker,
+    apply_virtualenv_template,
     call_pip_install,
+    compile_bytecode,
+    create_listen_socket,
     create_project,
     create_virtualenv,
+    detect_virtualenv,
+    get_compile_targets,
+    get_control_path,
+    get_listen_address,
+    get_plugin_modules,
     get_project_root,
+    get_virtualenv_template,
+    get_watch_scope,
     list_adapters,
     list_drivers,
+    pipe_output,
+    profile_startup,
     run_project,
+    shutdown_policy,
     terminate_process,
+    uses_server_driver,
 )
 from kirami_cli.log import ClickHandler
 
+R = TypeVar("R")
+
 VALID_PROJECT_NAME = r"^[a-zA-Z][a-zA-Z0-9 _-]*$"
 BLACKLISTED_PROJECT_NAME = {"kiramibot", "kirami", "bot"}
 
@@ -54,6 +84,42 @@ class ProjectContext:
     packages: list[str] = field(default_factory=list)
 
 
+@dataclass
+class StageTimer:
+    """项目创建各阶段耗时
+
+    参数:
+        durations: 各阶段累计耗时
+        started: 开始时间
+    """
+
+    durations: dict[str, float] = field(default_factory=dict)
+    started: float = field(default_factory=time.perf_counter)
+
+    async def track(self, stage: str, awaitable: Awaitable[R]) -> R:
+        start = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            self.durations[stage] = (
+                self.durations.get(stage, 0.0) + time.perf_counter() - start
+            )
+
+    def summary(self) -> str:
+        wall = time.perf_counter() - self.started
+        sequential = sum(self.durations.values())
+        stages = ", ".join(f"{k} {v:.1f}s" for k, v in self.durations.items())
+        return _(
+            "Finished in {wall:.1f}s ({stages}), "
+            "overlapping saved {saved:.1f}s of {sequential:.1f}s."
+        ).format(
+            wall=wall,
+            stages=stages,
+            saved=max(sequential - wall, 0.0),
+            sequential=sequential,
+        )
+
+
 def project_name_validator(name: str) -> bool:
     return (
         bool(re.match(VALID_PROJECT_NAME, name))
@@ -61,31 +127,47 @@ def project_name_validator(name: str) -> bool:
     )
 
 
-async def prompt_common_context(context: ProjectContext) -> ProjectContext:
-    click.secho(_("Loading adapters..."))
-    all_adapters = await list_adapters()
-    click.secho(_("Loading drivers..."))
-    all_drivers = await list_drivers()
-    click.clear()
-
-    project_name = await InputPrompt(
-        _("Project Name:"),
-        validator=project_name_validator,
-        error_message=_("Invalid project name!"),
-    ).prompt_async(style=CLI_DEFAULT_STYLE)
+async def prompt_project_name(context: ProjectContext, timer: StageTimer) -> str:
+    project_name = await timer.track(
+        "prompt",
+        InputPrompt(
+            _("Project Name:"),
+            validator=project_name_validator,
+            error_message=_("Invalid project name!"),
+        ).prompt_async(style=CLI_DEFAULT_STYLE),
+    )
     context.variables["project_name"] = project_name
+    return project_name
+
 
-    drivers = await CheckboxPrompt(
-        _("Which driver(s) would you like to use?"),
-        [Choice(f"{driver.name} ({driver.desc})", driver) for driver in all_drivers],
-        default_select=[
-            index
-            for index, driver in enumerate(all_drivers)
-            if driver.name in DEFAULT_DRIVER
-        ],
-        validator=bool,
-        error_message=_("Chosen drivers is not valid!"),
-    ).prompt_async(style=CLI_DEFAULT_STYLE)
+async def prompt_common_context(
+    context: ProjectContext,
+    all_drivers: Awaitable[list[Driver]],
+    all_adapters: Awaitable[list[Adapter]],
+    timer: StageTimer,
+) -> ProjectContext:
+    drivers_future = asyncio.ensure_future(all_drivers)
+    if not drivers_future.done():
+        click.secho(_("Loading drivers..."))
+    drivers_list = await drivers_future
+
+    drivers = await timer.track(
+        "prompt",
+        CheckboxPrompt(
+            _("Which driver(s) would you like to use?"),
+            [
+                Choice(f"{driver.name} ({driver.desc})", driver)
+                for driver in drivers_list
+            ],
+            default_select=[
+                index
+                for index, driver in enumerate(drivers_list)
+                if driver.name in DEFAULT_DRIVER
+            ],
+            validator=bool,
+            error_message=_("Chosen drivers is not valid!"),
+        ).prompt_async(style=CLI_DEFAULT_STYLE),
+    )
     context.variables["drivers"] = json.dumps(
         {d.data.project_link: d.data.model_dump() for d in drivers}
     )
@@ -93,28 +175,39 @@ async def prompt_common_context(context: ProjectContext) -> ProjectContext:
         [d.data.project_link for d in drivers if d.data.project_link]
     )
 
+    adapters_future = asyncio.ensure_future(all_adapters)
+    if not adapters_future.done():
+        click.secho(_("Loading adapters..."))
+    adapters_list = await adapters_future
+
     confirm = False
     adapters = []
     while not confirm:
-        adapters = await CheckboxPrompt(
-            _("Which adapter(s) would you like to use?"),
-            [
-                Choice(f"{adapter.name} ({adapter.desc})", adapter)
-                for adapter in all_adapters
-            ],
-            default_select=[
-                index
-                for index, adapter in enumerate(all_adapters)
-                if adapter.name in DEFAULT_ADAPTER
-            ],
-        ).prompt_async(style=CLI_DEFAULT_STYLE)
+        adapters = await timer.track(
+            "prompt",
+            CheckboxPrompt(
+                _("Which adapter(s) would you like to use?"),
+                [
+                    Choice(f"{adapter.name} ({adapter.desc})", adapter)
+                    for adapter in adapters_list
+                ],
+                default_select=[
+                    index
+                    for index, adapter in enumerate(adapters_list)
+                    if adapter.name in DEFAULT_ADAPTER
+                ],
+            ).prompt_async(style=CLI_DEFAULT_STYLE),
+        )
         confirm = (
             True
             if adapters
-            else await ConfirmPrompt(
-                _("You haven't chosen any adapter! Please confirm."),
-                default_choice=False,
-            ).prompt_async(style=CLI_DEFAULT_STYLE)
+            else await timer.track(
+                "prompt",
+                ConfirmPrompt(
+                    _("You haven't chosen any adapter! Please confirm."),
+                    default_choice=False,
+                ).prompt_async(style=CLI_DEFAULT_STYLE),
+            )
         )
 
     context.variables["adapters"] = json.dumps(
@@ -125,6 +218,48 @@ async def prompt_common_context(context: ProjectContext) -> ProjectContext:
     return context
 
 
+async def install_project_dependencies(
+    packages: list[str],
+    pip_args: list[str] | None,
+    venv_task: "asyncio.Task[Any] | None",
+    venv_dir: Path,
+    *,
+    venv_cache: bool,
+    python_interpreter: str | None,
+    timer: StageTimer,
+) -> int:
+    python_path = None
+    if venv_task is not None:
+        await venv_task
+        python_path = detect_virtualenv(venv_dir.parent)
+
+        if venv_cache:
+            venv_template, missing = await timer.track(
+                "template",
+                get_virtualenv_template(
+                    packages, pip_args, python_path=python_interpreter
+                ),
+            )
+            if venv_template is not None:
+                click.secho(
+                    _("Cloning virtual environment from {venv_template} ...").format(
+                        venv_template=venv_template
+                    ),
+                    fg="yellow",
+                )
+                if await timer.track(
+                    "template",
+                    run_sync(apply_virtualenv_template)(venv_template, venv_dir),
+                ):
+                    packages = missing
+
+    if not packages:
+        return 0
+
+    proc = await call_pip_install(packages, pip_args, python_path=python_path)
+    return await timer.track("install", proc.wait())
+
+
 @click.command(
     cls=ClickAliasedCommand,
     aliases=["init"],
@@ -144,6 +279,11 @@ async def prompt_common_context(context: ProjectContext) -> ProjectContext:
     default=None,
     help=_("The python interpreter virtualenv is installed into."),
 )
+@click.option(
+    "--venv-cache/--no-venv-cache",
+    default=True,
+    help=_("Clone the virtual environment from a cached template."),
+)
 @click.argument("pip_args", nargs=-1, default=None)
 @click.pass_context
 @run_async
@@ -152,39 +292,46 @@ async def create(
     output_dir: str | None,
     template: str | None,
     python_interpreter: str | None,
+    venv_cache: bool,
     pip_args: list[str] | None,
 ):
-    context = ProjectContext()
-    try:
-        context = await prompt_common_context(context)
-    except ModuleLoadFailed as e:
-        click.secho(repr(e), fg="red")
-        ctx.exit()
-    except CancelledError:
-        ctx.exit()
+    timer = StageTimer()
+    # start loading the registry before anything is drawn, prompts can be
+    # answered while the requests are in flight
+    drivers_task = asyncio.ensure_future(timer.track("registry", list_drivers()))
+    adapters_task = asyncio.ensure_future(timer.track("registry", list_adapters()))
 
-    create_project(template, {"kiramibot": context.variables}, output_dir)
+    context = ProjectContext()
+    venv_task: asyncio.Task[Any] | None = None
+    install_dependencies = False
 
     try:
-        install_dependencies = await ConfirmPrompt(
-            _("Install dependencies now?"), default_choice=True
-        ).prompt_async(style=CLI_DEFAULT_STYLE)
-    except CancelledError:
-        ctx.exit()
-
-    project_dir_name = context.variables["project_name"].replace(" ", "-")
-    project_dir = Path(output_dir or ".") / project_dir_name
-
-    if install_dependencies:
-        use_venv = False
+        project_name = await prompt_project_name(context, timer)
+        project_dir_name = project_name.replace(" ", "-")
+        project_dir = Path(output_dir or ".") / project_dir_name
         venv_dir = project_dir / ".venv"
 
-        try:
-            use_venv = await ConfirmPrompt(
+        if project_dir.exists():
+            click.secho(
+                _("Directory {project_dir} already exists!").format(
+                    project_dir=project_dir
+                ),
+                fg="red",
+            )
+            ctx.exit(1)
+
+        install_dependencies = await timer.track(
+            "prompt",
+            ConfirmPrompt(
+                _("Install dependencies now?"), default_choice=True
+            ).prompt_async(style=CLI_DEFAULT_STYLE),
+        )
+        use_venv = install_dependencies and await timer.track(
+            "prompt",
+            ConfirmPrompt(
                 _("Create virtual environment?"), default_choice=True
-            ).prompt_async(style=CLI_DEFAULT_STYLE)
-        except CancelledError:
-            ctx.exit()
+            ).prompt_async(style=CLI_DEFAULT_STYLE),
+        )
 
         if use_venv:
             click.secho(
@@ -193,28 +340,64 @@ async def create(
                 ),
                 fg="yellow",
             )
-            await create_virtualenv(
-                venv_dir, prompt=project_dir_name, python_path=python_interpreter
+            venv_task = asyncio.create_task(
+                timer.track(
+                    "venv",
+                    create_virtualenv(
+                        venv_dir,
+                        prompt=project_dir_name,
+                        python_path=python_interpreter,
+                    ),
+                )
             )
 
-        config_manager = ConfigManager(working_dir=project_dir, use_venv=use_venv)
-
-        proc = await call_pip_install(
-            ["kiramibot", *context.packages],
-            pip_args,
-            python_path=config_manager.python_path,
+        context = await prompt_common_context(
+            context, drivers_task, adapters_task, timer
         )
-        await proc.wait()
+    except (ModuleLoadFailed, CancelledError) as e:
+        if isinstance(e, ModuleLoadFailed):
+            click.secho(repr(e), fg="red")
+        if venv_task is not None:
+            # the virtualenv is created in a worker thread and cannot be
+            # interrupted, wait for it and clean up the half created project
+            await asyncio.gather(venv_task, return_exceptions=True)
+            shutil.rmtree(project_dir, ignore_errors=True)
+        ctx.exit()
 
-        if proc.returncode != 0:
-            click.secho(
-                _(
-                    "Failed to install dependencies! "
-                    "You should install the dependencies manually."
-                ),
-                fg="red",
+    install_task = None
+    if install_dependencies:
+        install_task = asyncio.create_task(
+            install_project_dependencies(
+                ["kiramibot", *context.packages],
+                pip_args,
+                venv_task,
+                venv_dir,
+                venv_cache=venv_cache,
+                python_interpreter=python_interpreter,
+                timer=timer,
             )
+        )
+
+    await timer.track(
+        "render",
+        run_sync(create_project)(
+            template,
+            {"kiramibot": context.variables},
+            output_dir,
+            overwrite_if_exists=venv_task is not None,
+        ),
+    )
+
+    if install_task is not None and await install_task != 0:
+        click.secho(
+            _(
+                "Failed to install dependencies! "
+                "You should install the dependencies manually."
+            ),
+            fg="red",
+        )
 
+    click.secho(timer.summary(), dim=True)
     click.secho(_("Done!"), fg="green")
     click.secho(
         _(
@@ -229,6 +412,45 @@ async def create(
     click.secho("  kirami run --reload", fg="green")
 
 
+def print_startup_profile(
+    profile: StartupProfile, top: int, budget: float | None = None
+) -> None:
+    click.secho(
+        _("Ready in {ready}, {total:.2f}s spent importing {count} modules.").format(
+            ready=(
+                f"{profile.ready_time:.2f}s" if profile.ready_time is not None else "-"
+            ),
+            total=profile.total / 1e6,
+            count=len(profile.records),
+        ),
+        bold=True,
+    )
+    click.echo(_("Slowest packages:"))
+    for name, time_, count in profile.packages()[:top]:
+        click.echo(
+            _("  {time:8.1f}ms  {name} ({count} modules)").format(
+                time=time_ / 1000, name=name, count=count
+            )
+        )
+    if plugin_times := profile.plugin_times():
+        click.echo(_("Plugins, including their dependencies:"))
+    for name, time_ in plugin_times:
+        over = budget is not None and time_ / 1e6 > budget
+        click.secho(
+            _("  {time:8.1f}ms  {name}").format(time=time_ / 1000, name=name),
+            fg="yellow" if over else None,
+        )
+    for name, time_ in plugin_times:
+        if budget is not None and time_ / 1e6 > budget:
+            click.secho(
+                _(
+                    "Plugin {name} took {time:.2f}s to import, "
+                    "over the budget of {budget:.2f}s."
+                ).format(name=name, time=time_ / 1e6, budget=budget),
+                fg="yellow",
+            )
+
+
 @click.command(
     cls=ClickAliasedCommand, aliases=["start"], help=_("Run the bot in current folder.")
 )
@@ -265,25 +487,623 @@ async def create(
     show_default=True,
     help=_("Delay time for reloading in seconds."),
 )
+@click.option(
+    "--reload-mode",
+    type=click.Choice(["process", "module"]),
+    default="process",
+    show_default=True,
+    help=_(
+        "Restart the whole process, or reload changed plugins in place "
+        "and restart only when that is not possible."
+    ),
+)
+@click.option(
+    "--reload-hash",
+    type=click.Choice(["none", "content", "ast"]),
+    default="content",
+    show_default=True,
+    help=_(
+        "Skip reloading when the file content (or the syntax tree, "
+        "ignoring comments and whitespace) did not change."
+    ),
+)
+@click.option(
+    "--reload-backend",
+    type=click.Choice(["native", "poll"]),
+    default="native",
+    show_default=True,
+    help=_(
+        "Use filesystem events, or poll for changes on filesystems "
+        "without events such as NFS or container mounts."
+    ),
+)
+@click.option(
+    "--poll-interval",
+    type=click.FloatRange(min=0.05),
+    default=1.0,
+    show_default=True,
+    help=_("Interval of polling for changes in seconds."),
+)
+@click.option(
+    "--reload-standby",
+    is_flag=True,
+    default=False,
+    help=_("Keep a warm standby process to take over on reload."),
+)
+@click.option(
+    "--shared-socket",
+    is_flag=True,
+    default=False,
+    help=_(
+        "Listen on the bot port in kirami and pass the socket to the bot, "
+        "so connections are not refused while restarting."
+    ),
+)
+@click.option(
+    "-w",
+    "--workers",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help=_("Number of bot processes to run and supervise."),
+)
+@click.option(
+    "--worker-ports",
+    is_flag=True,
+    default=False,
+    help=_(
+        "Give each worker its own port counting up from the bot port, "
+        "instead of sharing the socket, e.g. for reverse WebSocket adapters."
+    ),
+)
+@click.option(
+    "--preload",
+    is_flag=True,
+    default=False,
+    help=_(
+        "Import the bot and plugins once and fork the workers from it, "
+        "so the imported modules are shared between the workers."
+    ),
+)
+@click.option(
+    "--shutdown-timeout",
+    type=click.FloatRange(min=0),
+    default=10.0,
+    show_default=True,
+    help=_(
+        "Seconds to wait for the bot to exit before killing it "
+        "and the processes it started."
+    ),
+)
+@click.option(
+    "--metrics",
+    is_flag=True,
+    default=False,
+    help=_(
+        "Sample the memory, CPU, file descriptors and threads of the bot "
+        "and serve them in Prometheus format."
+    ),
+)
+@click.option(
+    "--metrics-port",
+    type=click.IntRange(min=1, max=65535),
+    default=DEFAULT_METRICS_PORT,
+    show_default=True,
+    help=_("Port of the metrics endpoint on localhost."),
+)
+@click.option(
+    "--log-file",
+    default=None,
+    type=click.Path(dir_okay=False, writable=True, path_type=Path),
+    help=_(
+        "Also write the output of the bot to this file, "
+        "without ever blocking the bot on the disk."
+    ),
+)
+@click.option(
+    "--log-max-size",
+    type=click.FloatRange(min=0),
+    default=10.0,
+    show_default=True,
+    help=_("Rotate the log file when it grows beyond this size in MiB, 0 to disable."),
+)
+@click.option(
+    "--log-interval",
+    type=click.FloatRange(min=1),
+    default=None,
+    help=_("Rotate the log file every this many seconds."),
+)
+@click.option(
+    "--log-backups",
+    type=click.IntRange(min=0),
+    default=5,
+    show_default=True,
+    help=_("Number of rotated log files to keep."),
+)
+@click.option(
+    "--log-compress/--no-log-compress",
+    default=True,
+    show_default=True,
+    help=_("Compress rotated log files with gzip."),
+)
+@click.option(
+    "--precompile",
+    is_flag=True,
+    default=False,
+    help=_(
+        "Compile the project, plugin directories and site-packages to bytecode "
+        "in parallel before starting, and changed files before reloading."
+    ),
+)
+@click.option(
+    "--inspect",
+    is_flag=True,
+    default=False,
+    help=_(
+        "Run an agent inside the bot, so that kirami profile --attach and "
+        "kirami mem can inspect it."
+    ),
+)
+@click.option(
+    "--trace-memory",
+    type=click.IntRange(min=0),
+    default=0,
+    metavar="FRAMES",
+    help=_(
+        "Trace memory allocations with tracemalloc from the start, storing this "
+        "many frames each, for kirami mem snapshot. SIGUSR2 toggles tracing "
+        "of a bot run with --inspect."
+    ),
+)
+@click.option(
+    "--capture",
+    type=click.Path(dir_okay=False, writable=True, path_type=Path),
+    default=None,
+    help=_(
+        "Record the events the bot receives and the APIs it calls to this "
+        "JSON Lines file, for kirami bench replay."
+    ),
+)
+@click.option(
+    "--profile-startup",
+    "startup_profiling",
+    is_flag=True,
+    default=False,
+    help=_(
+        "Start the bot once with import timing, report the slowest packages "
+        "and plugins, then exit."
+    ),
+)
+@click.option(
+    "--profile-top",
+    type=click.IntRange(min=1),
+    default=20,
+    show_default=True,
+    help=_("Number of packages to show in the startup profile."),
+)
+@click.option(
+    "--profile-output",
+    type=click.Path(dir_okay=False, writable=True, path_type=Path),
+    default="startup-profile.json",
+    show_default=True,
+    help=_("File to write the JSON report of the startup profile to."),
+)
+@click.option(
+    "--plugin-budget",
+    type=click.FloatRange(min=0),
+    default=None,
+    help=_("Warn about plugins taking longer than this many seconds to import."),
+)
+@click.pass_context
 @run_async
 async def run(
+    ctx: click.Context,
     file: str,
     reload: bool,
     reload_includes: list[str] | None,
     reload_excludes: list[str] | None,
     reload_delay: float,
+    reload_mode: str,
+    reload_hash: Literal["none", "content", "ast"],
+    reload_backend: Literal["native", "poll"],
+    poll_interval: float,
+    reload_standby: bool,
+    shared_socket: bool,
+    workers: int,
+    worker_ports: bool,
+    preload: bool,
+    shutdown_timeout: float,
+    metrics: bool,
+    metrics_port: int,
+    log_file: Path | None,
+    log_max_size: float,
+    log_interval: float | None,
+    log_backups: int,
+    log_compress: bool,
+    precompile: bool,
+    inspect: bool,
+    trace_memory: int,
+    capture: Path | None,
+    startup_profiling: bool,
+    profile_top: int,
+    profile_output: Path,
+    plugin_budget: float | None,
 ):
-    if reload:
-        logger = Logger(__name__)
-        logger.addHandler(ClickHandler())
-        await Reloader(
-            partial(run_project, exist_bot=Path(file)),
+    supervise = workers > 1 or preload
+    if startup_profiling and (supervise or reload):
+        click.secho(
+            _("Startup profiling cannot be used with reload or workers!"), fg="red"
+        )
+        ctx.exit(1)
+    if supervise and reload:
+        click.secho(_("Multiple workers cannot be used with reload!"), fg="red")
+        ctx.exit(1)
+    if worker_ports and shared_socket:
+        click.secho(_("Worker ports cannot be used with a shared socket!"), fg="red")
+        ctx.exit(1)
+    if preload and WINDOWS:
+        click.secho(_("Preload is not supported on Windows!"), fg="red")
+        ctx.exit(1)
+    if supervise and not worker_ports and uses_server_driver():
+        # the workers accept connections from the same socket
+        shared_socket = True
+
+    listen_socket = None
+    if shared_socket:
+        if WINDOWS:
+            click.secho(_("Shared socket is not supported on Windows!"), fg="red")
+            ctx.exit(1)
+        try:
+            listen_socket = create_listen_socket()
+        except OSError as e:
+            click.secho(
+                _("Failed to listen on the bot port: {error}").format(error=e),
+                fg="red",
+            )
+            ctx.exit(1)
+
+    startup_func = partial(
+        run_project,
+        exist_bot=Path(file),
+        listen_socket=listen_socket,
+        trace_memory=trace_memory,
+        capture=capture,
+    )
+    logger = Logger(__name__)
+    logger.addHandler(ClickHandler())
+    shutdown_policy.grace_timeout = shutdown_timeout
+    shutdown_policy.logger = logger
+    agent = None
+
+    if startup_profiling:
+        agent = AgentServer()
+        await agent.start()
+        try:
+            profile = await profile_startup(
+                partial(startup_func, agent=agent, profile_imports=True),
+                agent,
+                plugins=get_plugin_modules(),
+            )
+        finally:
+            await agent.close()
+            if listen_socket is not None:
+                listen_socket.close()
+
+        print_startup_profile(profile, profile_top, plugin_budget)
+        profile_output.write_text(
+            json.dumps(profile.to_dict(plugin_budget), indent=2), encoding="utf-8"
+        )
+        click.secho(
+            _("Wrote the startup profile to {path}").format(path=profile_output),
+            fg="green",
+        )
+        if profile.ready_time is None:
+            click.secho(_("The bot did not get ready."), fg="red")
+            ctx.exit(1)
+        return
+
+    metrics_server: MetricsServer | None = None
+    control_server: ControlServer | None = None
+
+    output_file = None
+    pipes: set[asyncio.Task] = set()
+    if log_file is not None:
+        output_file = LogFile(
+            log_file,
+            max_bytes=int(log_max_size * 1024 * 1024) or None,
+            interval=log_interval,
+            backup_count=log_backups,
+            compress=log_compress,
+        )
+        try:
+            output_file.open()
+        except OSError as e:
+            click.secho(
+                _("Failed to open the log file: {error}").format(error=e), fg="red"
+            )
+            ctx.exit(1)
+
+        if not supervise:
+            # supervised workers are always piped, otherwise the bot writes
+            # to the terminal directly unless its output is logged
+            run_bot = startup_func
+
+            async def run_logged(**kwargs: Any) -> asyncio.subprocess.Process:
+                process = await run_bot(
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE,
+                    **kwargs,
+                )
+                for reader, output in (
+                    (process.stdout, sys.stdout),
+                    (process.stderr, sys.stderr),
+                ):
+                    assert reader is not None
+                    task = asyncio.create_task(
+                        pipe_output(reader, output, log_file=output_file)
+                    )
+                    pipes.add(task)
+                    task.add_done_callback(pipes.discard)
+                return process
+
+            startup_func = run_logged
+
+    async def start_metrics(
+        workers: Callable[[], Iterable[Worker]]
+    ) -> MetricsServer | None:
+        if not metrics:
+            return None
+        server = MetricsServer(workers, port=metrics_port, logger=logger)
+        try:
+            await server.start()
+        except OSError as e:
+            click.secho(_("Failed to serve metrics: {error}").format(error=e), fg="red")
+            ctx.exit(1)
+        return server
+
+    async def start_control(
+        workers: Callable[[], Iterable[Worker]],
+        stop: Callable[[], None],
+        reload: Callable[[], Awaitable[None]] | None = None,
+        restart_worker: Callable[[int], Awaitable[None]] | None = None,
+    ) -> ControlServer | None:
+        if WINDOWS:
+            return None
+        server = ControlServer(
+            get_control_path(),
+            workers=workers,
+            stop=stop,
+            reload=reload,
+            restart_worker=restart_worker,
+            agent=agent,
+            logger=logger,
+        )
+        try:
+            await server.start()
+        except (OSError, RuntimeError) as e:
+            # the bot still runs, only `kirami ctl` cannot reach it
+            logger.warning(
+                _("Failed to open the control socket: {error}").format(error=e)
+            )
+            return None
+        return server
+
+    if precompile:
+        started = time.perf_counter()
+        proc = await compile_bytecode(await get_compile_targets())
+        if await proc.wait() == 0:
+            logger.info(
+                _("Compiled bytecode in {elapsed:.1f}s.").format(
+                    elapsed=time.perf_counter() - started
+                )
+            )
+        else:
+            # the bot reports the errors again when importing the files
+            logger.warning(_("Some files failed to compile."))
+
+    async def compile_changes(files: list[Path]) -> None:
+        proc = await compile_bytecode(files=files)
+        await proc.wait()
+
+    try:
+        if supervise:
+            # the agent reports when the workers are ready
+            agent = AgentServer()
+            await agent.start()
+            base_port = get_listen_address()[1]
+
+            preload_server = None
+            if preload:
+                preload_server = PreloadServer(
+                    partial(
+                        startup_func,
+                        agent=agent,
+                        listen_port=base_port if worker_ports else None,
+                    ),
+                    terminate_process,
+                    agent=agent,
+                    workers=workers,
+                    log_file=output_file,
+                    logger=logger,
+                )
+                try:
+                    await preload_server.start()
+                except RuntimeError as e:
+                    await preload_server.close()
+                    click.secho(str(e), fg="red")
+                    ctx.exit(1)
+
+            def start_worker(index: int, **kwargs: Any):
+                port = base_port + index - 1
+                if preload_server is not None:
+                    env = {LISTEN_PORT_ENV: str(port)} if worker_ports else None
+                    return preload_server.fork(index, env=env)
+                if worker_ports:
+                    kwargs["listen_port"] = port
+                return startup_func(agent=agent, **kwargs)
+
+            supervisor = Supervisor(
+                start_worker,
+                terminate_process,
+                workers=workers,
+                agent=agent,
+                preload=preload_server.process if preload_server else None,
+                log_file=output_file,
+                logger=logger,
+            )
+            metrics_server = await start_metrics(lambda: supervisor.workers)
+            control_server = await start_control(
+                lambda: supervisor.workers,
+                lambda: supervisor.should_exit.set(),
+                supervisor.reload,
+                lambda index: supervisor.restart_worker(supervisor.workers[index - 1]),
+            )
+            if preload_server is not None:
+                # workers cannot be forked any more once the preload process exits
+                preload_task = asyncio.create_task(preload_server.wait_closed())
+                preload_task.add_done_callback(
+                    lambda _task: supervisor.should_exit.set()
+                )
+            try:
+                await supervisor.run()
+            finally:
+                if preload_server is not None:
+                    await preload_server.close()
+            if supervisor.failed or (
+                preload_server is not None and preload_server.returncode
+            ):
+                ctx.exit(1)
+            return
+
+        if (inspect or trace_memory) and not WINDOWS:
+            # lets `kirami ctl` reach into the bot, e.g. to profile it, memory
+            # is only traced to take snapshots through the agent
+            agent = AgentServer()
+            await agent.start()
+
+        if not reload:
+            proc = await startup_func(agent=agent)
+            metrics_server = await start_metrics(lambda: [Worker(1, proc)])
+            stopping = asyncio.Event()
+            control_server = await start_control(
+                lambda: [Worker(1, proc)], stopping.set
+            )
+            exited = asyncio.ensure_future(proc.wait())
+            stopped = asyncio.ensure_future(stopping.wait())
+            await asyncio.wait((exited, stopped), return_when=asyncio.FIRST_COMPLETED)
+            stopped.cancel()
+            if not exited.done():
+                await terminate_process(proc)
+            return
+
+        if agent is None and (reload_mode == "module" or reload_standby):
+            agent = AgentServer()
+            await agent.start()
+
+        startup_func = partial(
+            startup_func, agent=agent, module_reload=reload_mode == "module"
+        )
+        reloader = Reloader(
+            startup_func,
             terminate_process,
             file_filter=FileFilter(reload_includes, reload_excludes),
             reload_delay=reload_delay,
+            agent=agent,
+            module_reload=reload_mode == "module",
+            standby_func=(
+                partial(startup_func, standby=True) if reload_standby else None
+            ),
+            # with a shared socket both processes can accept at the same time
+            standby_exclusive=listen_socket is None and uses_server_driver(),
+            content_hash=reload_hash,
+            watch_scope=get_watch_scope(Path(file)),
+            backend=reload_backend,
+            poll_interval=poll_interval,
+            compile_func=compile_changes if precompile else None,
             cwd=get_project_root(),
             logger=logger,
-        ).run()
-    else:
-        proc = await run_project(exist_bot=Path(file))
-        await proc.wait()
+        )
+
+        def reloader_workers() -> list[Worker]:
+            return [
+                Worker(
+                    1,
+                    reloader.process,
+                    restarts=reloader.restarts,
+                    last_restart_duration=reloader.last_restart_duration,
+                )
+            ]
+
+        metrics_server = await start_metrics(reloader_workers)
+        control_server = await start_control(
+            reloader_workers,
+            lambda: reloader.should_exit.set(),
+            reloader.reload,
+            lambda _index: reloader.reload(),
+        )
+        await reloader.run()
+    finally:
+        if control_server is not None:
+            await control_server.close()
+        if metrics_server is not None:
+            await metrics_server.close()
+        if agent is not None:
+            await agent.close()
+        if listen_socket is not None:
+            listen_socket.close()
+        if output_file is not None:
+            if pipes:
+                _done, pending = await asyncio.wait(pipes, timeout=1.0)
+                for task in pending:
+                    task.cancel()
+            await run_sync(output_file.close)()
+
+
+@click.command(
+    name="compile", help=_("Compile the project and its dependencies to bytecode.")
+)
+@click.option(
+    "-O",
+    "--optimize",
+    type=click.IntRange(min=0, max=2),
+    multiple=True,
+    help=_(
+        "Optimization level to compile for, can be given more than once. "
+        "Defaults to the level of the interpreter."
+    ),
+)
+@click.option(
+    "-j",
+    "--jobs",
+    type=click.IntRange(min=0),
+    default=0,
+    show_default=True,
+    help=_("Number of compiling processes, 0 to use all CPU cores."),
+)
+@click.option(
+    "--site-packages/--no-site-packages",
+    default=True,
+    show_default=True,
+    help=_("Also compile the site-packages of the project environment."),
+)
+@click.pass_context
+@run_async
+async def compile_project(
+    ctx: click.Context, optimize: tuple[int, ...], jobs: int, site_packages: bool
+):
+    targets = await get_compile_targets(site_packages=site_packages)
+    click.secho(
+        _("Compiling {paths} ...").format(
+            paths=", ".join(str(path) for path, _exclude in targets)
+        ),
+        fg="yellow",
+    )
+    started = time.perf_counter()
+    proc = await compile_bytecode(targets, optimize=optimize, jobs=jobs)
+    if await proc.wait() != 0:
+        click.secho(_("Some files failed to compile."), fg="red")
+        ctx.exit(1)
+    click.secho(
+        _("Done in {elapsed:.1f}s!").format(elapsed=time.perf_counter() - started),
+        fg="green",
+    )
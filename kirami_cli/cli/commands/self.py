@@ -11,6 +11,7 @@ from kirami_cli.handlers import (
     call_pip_list,
     call_pip_uninstall,
     call_pip_update,
+    get_distributions,
 )
 
 
@@ -109,5 +110,20 @@ async def uninstall(ctx: click.Context, name: str | None, pip_args: list[str] |
 @click.argument("pip_args", nargs=-1, default=None)
 @run_async
 async def get_list(pip_args: list[str] | None):
-    proc = await call_pip_list(pip_args, python_path=sys.executable)
-    await proc.wait()
+    if pip_args:
+        proc = await call_pip_list(pip_args, python_path=sys.executable)
+        await proc.wait()
+        return
+
+    # read metadata from disk, starting pip is much slower
+    dists = sorted(
+        await get_distributions(sys.executable), key=lambda d: d.normalized_name
+    )
+    name_width = max((len(d.name) for d in dists), default=0)
+    name_width = max(name_width, len("Package"))
+    version_width = max((len(d.version) for d in dists), default=0)
+    version_width = max(version_width, len("Version"))
+    click.echo(f"{'Package':<{name_width}} Version")
+    click.echo(f"{'-' * name_width} {'-' * version_width}")
+    for dist in dists:
+        click.echo(f"{dist.name:<{name_width}} {dist.version}")
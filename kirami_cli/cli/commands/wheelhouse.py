@@ -0,0 +1,108 @@
+from pathlib import Path
+from typing import cast
+
+import click
+from noneprompt import CancelledError, Choice, ListPrompt
+
+from kirami_cli import _
+from kirami_cli.cli import CLI_DEFAULT_STYLE, ClickAliasedGroup, run_async, run_sync
+from kirami_cli.exceptions import ModuleLoadFailed
+from kirami_cli.handlers import (
+    DEFAULT_WHEELHOUSE,
+    build_wheelhouse,
+    get_project_packages,
+    get_project_root,
+)
+
+
+@click.group(
+    cls=ClickAliasedGroup,
+    invoke_without_command=True,
+    help=_("Manage local wheelhouse."),
+)
+@click.pass_context
+@run_async
+async def wheelhouse(ctx: click.Context):
+    if ctx.invoked_subcommand is not None:
+        return
+
+    command = cast(ClickAliasedGroup, ctx.command)
+
+    choices: list[Choice[click.Command]] = []
+    for sub_cmd_name in await run_sync(command.list_commands)(ctx):
+        if sub_cmd := await run_sync(command.get_command)(ctx, sub_cmd_name):
+            choices.append(
+                Choice(
+                    sub_cmd.help
+                    or _("Run subcommand {sub_cmd.name!r}").format(sub_cmd=sub_cmd),
+                    sub_cmd,
+                )
+            )
+
+    try:
+        result = await ListPrompt(
+            _("What do you want to do?"), choices=choices
+        ).prompt_async(style=CLI_DEFAULT_STYLE)
+    except CancelledError:
+        ctx.exit()
+
+    sub_cmd = result.data
+    await run_sync(ctx.invoke)(sub_cmd)
+
+
+@wheelhouse.command(
+    context_settings={"ignore_unknown_options": True},
+    help=_("Collect wheels of project dependencies into a local directory."),
+)
+@click.option(
+    "-w",
+    "--wheel-dir",
+    default=None,
+    type=click.Path(file_okay=False, writable=True, path_type=Path),
+    help=_("Directory to store the wheels."),
+)
+@click.option(
+    "-j",
+    "--jobs",
+    type=click.IntRange(min=1),
+    default=None,
+    help=_("Number of concurrent downloads."),
+)
+@click.argument("pip_args", nargs=-1, default=None)
+@click.pass_context
+@run_async
+async def build(
+    ctx: click.Context,
+    wheel_dir: Path | None,
+    jobs: int | None,
+    pip_args: list[str] | None,
+):
+    if wheel_dir is None:
+        wheel_dir = get_project_root() / DEFAULT_WHEELHOUSE
+
+    try:
+        packages = await get_project_packages()
+    except ModuleLoadFailed as e:
+        click.secho(repr(e), fg="red")
+        ctx.exit(1)
+
+    click.secho(
+        _("Collecting wheels for {packages} into {wheel_dir} ...").format(
+            packages=", ".join(packages), wheel_dir=wheel_dir
+        ),
+        fg="yellow",
+    )
+    failed = await build_wheelhouse(
+        packages, wheel_dir, list(pip_args or []), jobs=jobs
+    )
+
+    for package, output in failed.items():
+        click.echo(output.decode(errors="replace"))
+        click.secho(
+            _("Failed to collect wheels for {package}.").format(package=package),
+            fg="red",
+        )
+    if failed:
+        ctx.exit(1)
+
+    click.secho(_("Done!"), fg="green")
@@ -16,3 +16,12 @@ class KiramiBotNotInstalledError(RuntimeError):
 
 class ProjectNotFoundError(RuntimeError):
     """Raised when project root directory not found"""
+
+
+class LockEnvironmentError(RuntimeError):
+    """Raised when the lock file was resolved for another environment."""
+
+    def __init__(self, locked: str, current: str) -> None:
+        super().__init__(locked, current)
+        self.locked = locked
+        self.current = current
@@ -26,6 +26,7 @@ from .meta import requires_kiramibot as requires_kiramibot
 from .meta import requires_pip as requires_pip
 from .meta import requires_project_root as requires_project_root
 from .meta import requires_python as requires_python
+from .meta import strip_plugin_priority as strip_plugin_priority
 
 # isort: split
 
@@ -43,9 +44,12 @@ from .store import load_module_data as load_module_data
 # isort: split
 
 # process
+from .process import ProcessLike as ProcessLike
+from .process import ShutdownPolicy as ShutdownPolicy
 from .process import create_process as create_process
 from .process import create_process_shell as create_process_shell
 from .process import ensure_process_terminated as ensure_process_terminated
+from .process import shutdown_policy as shutdown_policy
 from .process import terminate_process as terminate_process
 
 # isort: split
@@ -56,12 +60,26 @@ from .pip import call_pip_install as call_pip_install
 from .pip import call_pip_list as call_pip_list
 from .pip import call_pip_uninstall as call_pip_uninstall
 from .pip import call_pip_update as call_pip_update
+from .pip import call_pip_wheel as call_pip_wheel
+
+# isort: split
+
+# metadata
+from .metadata import Distribution as Distribution
+from .metadata import get_distributions as get_distributions
+from .metadata import get_installed_plugins as get_installed_plugins
+from .metadata import get_marker_environment as get_marker_environment
+from .metadata import get_site_packages as get_site_packages
+from .metadata import normalize_name as normalize_name
 
 # isort: split
 
 # virtualenv
+from .venv import VENV_TEMPLATE_DIR as VENV_TEMPLATE_DIR
+from .venv import apply_virtualenv_template as apply_virtualenv_template
 from .venv import create_virtualenv as create_virtualenv
 from .venv import detect_virtualenv as detect_virtualenv
+from .venv import get_virtualenv_template as get_virtualenv_template
 
 # isort: split
 
@@ -90,15 +108,151 @@ from .driver import list_drivers as list_drivers
 
 # isort: split
 
+# dependency
+from .dependency import check_sync_state as check_sync_state
+from .dependency import get_extra_packages as get_extra_packages
+from .dependency import get_missing_packages as get_missing_packages
+from .dependency import get_project_packages as get_project_packages
+from .dependency import get_sync_state as get_sync_state
+from .dependency import save_sync_state as save_sync_state
+
+# isort: split
+
+# lock
+from .lock import DEFAULT_LOCK_FILE as DEFAULT_LOCK_FILE
+from .lock import LockedPackage as LockedPackage
+from .lock import check_lock_environment as check_lock_environment
+from .lock import get_lock_environment as get_lock_environment
+from .lock import get_locked_requirements as get_locked_requirements
+from .lock import install_locked as install_locked
+from .lock import read_lock_environment as read_lock_environment
+from .lock import resolve_lock as resolve_lock
+from .lock import write_lock_file as write_lock_file
+
+# isort: split
+
+# wheelhouse
+from .wheelhouse import DEFAULT_WHEELHOUSE as DEFAULT_WHEELHOUSE
+from .wheelhouse import build_wheelhouse as build_wheelhouse
+from .wheelhouse import get_wheelhouse_packages as get_wheelhouse_packages
+
+# isort: split
+
 # script
 from .script import list_scripts as list_scripts
 from .script import run_script as run_script
 
 # isort: split
 
+# agent
+from .agent import AgentConnection as AgentConnection
+from .agent import AgentServer as AgentServer
+
+# isort: split
+
+# listen
+from .listen import LISTEN_FD_ENV as LISTEN_FD_ENV
+from .listen import LISTEN_PORT_ENV as LISTEN_PORT_ENV
+from .listen import create_listen_socket as create_listen_socket
+from .listen import get_listen_address as get_listen_address
+from .listen import wait_for_listen as wait_for_listen
+
+# isort: split
+
+# procfs
+from .procfs import MemoryUsage as MemoryUsage
+from .procfs import ProcessStats as ProcessStats
+from .procfs import format_bytes as format_bytes
+from .procfs import read_memory_usage as read_memory_usage
+from .procfs import read_process_stats as read_process_stats
+
+# isort: split
+
+# logfile
+from .logfile import LogFile as LogFile
+
+# isort: split
+
+# metrics
+from .metrics import DEFAULT_METRICS_PORT as DEFAULT_METRICS_PORT
+from .metrics import MetricsServer as MetricsServer
+from .metrics import Sample as Sample
+
+# isort: split
+
+# websocket
+from .websocket import WebSocketClient as WebSocketClient
+
+# isort: split
+
+# onebot
+from .onebot import DEFAULT_SELF_ID as DEFAULT_SELF_ID
+from .onebot import LoadResult as LoadResult
+from .onebot import OneBotStandIn as OneBotStandIn
+from .onebot import compare_results as compare_results
+from .onebot import feed_events as feed_events
+from .onebot import generate_load as generate_load
+from .onebot import get_session as get_session
+from .onebot import make_event as make_event
+
+# isort: split
+
+# capture
+from .capture import CAPTURE_ADAPTER as CAPTURE_ADAPTER
+from .capture import Capture as Capture
+
+# isort: split
+
+# memory
+from .memory import TRACEMALLOC_ENV as TRACEMALLOC_ENV
+from .memory import AllocationSite as AllocationSite
+from .memory import MemorySnapshot as MemorySnapshot
+from .memory import diff_counts as diff_counts
+from .memory import request_memory_snapshot as request_memory_snapshot
+
+# isort: split
+
+# profiler
+from .profiler import request_profile as request_profile
+from .profiler import summarize_folded as summarize_folded
+
+# isort: split
+
+# control
+from .control import ControlServer as ControlServer
+from .control import get_control_path as get_control_path
+from .control import send_control as send_control
+
+# isort: split
+
+# importtime
+from .importtime import ImportRecord as ImportRecord
+from .importtime import StartupProfile as StartupProfile
+from .importtime import get_plugin_modules as get_plugin_modules
+from .importtime import parse_import_time as parse_import_time
+from .importtime import profile_startup as profile_startup
+
+# isort: split
+
+# bytecode
+from .bytecode import compile_bytecode as compile_bytecode
+from .bytecode import get_compile_targets as get_compile_targets
+
+# isort: split
+
 # project
+from .preload import FORK_FDS_ENV as FORK_FDS_ENV
+from .preload import ForkedProcess as ForkedProcess
+from .preload import PreloadServer as PreloadServer
 from .project import create_project as create_project
 from .project import generate_run_script as generate_run_script
+from .project import get_preload_modules as get_preload_modules
 from .project import run_project as run_project
+from .project import uses_server_driver as uses_server_driver
 from .reloader import FileFilter as FileFilter
 from .reloader import Reloader as Reloader
+from .supervisor import Supervisor as Supervisor
+from .supervisor import Worker as Worker
+from .supervisor import pipe_output as pipe_output
+from .watch import WatchScope as WatchScope
+from .watch import get_watch_scope as get_watch_scope
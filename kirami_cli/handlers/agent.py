@@ -0,0 +1,151 @@
+import asyncio
+import contextlib
+import itertools
+import json
+import secrets
+from dataclasses import dataclass, field
+from typing import Any
+
+
+class AgentConnection:
+    """与 bot 进程内代理的连接
+
+    代理使用按行分隔的 JSON 通信, 请求带有 `id`, 代理主动发送的消息为事件.
+    """
+
+    def __init__(
+        self, pid: int, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        self.pid = pid
+        self.reader = reader
+        self.writer = writer
+        self.events: dict[str, asyncio.Event] = {}
+        self._ids = itertools.count(1)
+        self._pending: dict[int, asyncio.Future[dict[str, Any]]] = {}
+        self._task = asyncio.create_task(self._read_loop())
+
+    @property
+    def closed(self) -> bool:
+        return self._task.done()
+
+    def _get_event(self, name: str) -> asyncio.Event:
+        return self.events.setdefault(name, asyncio.Event())
+
+    async def _read_loop(self) -> None:
+        try:
+            while line := await self.reader.readline():
+                message = json.loads(line)
+                if (future := self._pending.pop(message.get("id"), None)) is not None:
+                    if not future.done():
+                        future.set_result(message)
+                elif message.get("type") == "event":
+                    self._get_event(message["event"]).set()
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("agent disconnected"))
+            self._pending.clear()
+
+    async def request(
+        self, type_: str, timeout: float | None = None, **data: Any
+    ) -> dict[str, Any]:
+        """向代理发送请求并等待回复
+
+        异常:
+            ConnectionError: 连接已断开
+            asyncio.TimeoutError: 等待回复超时
+        """
+        if self.closed:
+            raise ConnectionError("agent disconnected")
+
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        self.writer.write(
+            (json.dumps({"id": request_id, "type": type_, **data}) + "\n").encode()
+        )
+        try:
+            await self.writer.drain()
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self._pending.pop(request_id, None)
+
+    async def wait_event(self, name: str, timeout: float | None = None) -> None:
+        """等待代理发送的事件, 如 bot 启动完成时的 `ready`"""
+        await asyncio.wait_for(self._get_event(name).wait(), timeout)
+
+    async def close(self) -> None:
+        self.writer.close()
+        with contextlib.suppress(ConnectionError):
+            await self.writer.wait_closed()
+        self._task.cancel()
+
+
+@dataclass
+class AgentServer:
+    """接收 bot 进程内代理连接的本地服务
+
+    参数:
+        host: 监听地址
+        token: 代理连接时需要提供的令牌
+        connections: 已连接的代理, 按进程 ID 索引
+    """
+
+    host: str = "127.0.0.1"
+    token: str = field(default_factory=lambda: secrets.token_hex(16))
+    connections: dict[int, AgentConnection] = field(default_factory=dict)
+    _server: asyncio.Server | None = field(default=None, init=False)
+    _waiters: dict[int, asyncio.Event] = field(default_factory=dict, init=False)
+
+    @property
+    def port(self) -> int:
+        if self._server is None:
+            raise RuntimeError("Agent server is not started")
+        return self._server.sockets[0].getsockname()[1]
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle, self.host, 0)
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+        for connection in list(self.connections.values()):
+            await connection.close()
+        self.connections.clear()
+
+    async def _handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            hello = json.loads(await reader.readline())
+        except ValueError:
+            hello = {}
+        if hello.get("token") != self.token or not isinstance(hello.get("pid"), int):
+            writer.close()
+            return
+
+        pid = hello["pid"]
+        self.connections[pid] = AgentConnection(pid, reader, writer)
+        self._waiters.setdefault(pid, asyncio.Event()).set()
+
+    def get(self, pid: int) -> AgentConnection | None:
+        """获取进程对应的连接, 进程未连接或已断开时返回 `None`"""
+        connection = self.connections.get(pid)
+        if connection is None or connection.closed:
+            return None
+        return connection
+
+    async def wait_for(self, pid: int, timeout: float | None = None) -> AgentConnection:
+        """等待进程的代理连接"""
+        await asyncio.wait_for(
+            self._waiters.setdefault(pid, asyncio.Event()).wait(), timeout
+        )
+        return self.connections[pid]
+
+    def discard(self, pid: int) -> None:
+        self._waiters.pop(pid, None)
+        if (connection := self.connections.pop(pid, None)) is not None:
+            connection.writer.close()
@@ -0,0 +1,83 @@
+import asyncio
+import re
+from collections.abc import Sequence
+from pathlib import Path
+from typing import IO, Any
+
+from . import templates
+from .meta import (
+    get_default_python,
+    get_kiramibot_config,
+    get_project_root,
+    requires_project_root,
+    strip_plugin_priority,
+)
+from .metadata import get_site_packages
+from .process import create_process
+
+# hidden directories, caches and virtual environments
+COMPILE_EXCLUDE_DIRS = r"(\.[^\\/]*|__pycache__|site-packages|node_modules)"
+
+
+def _exclude_in(directory: Path) -> str:
+    # only match below the directory, which itself may be in a hidden directory
+    return re.escape(str(directory)) + rf"[\\/](.*[\\/])?{COMPILE_EXCLUDE_DIRS}[\\/]"
+
+
+@requires_project_root
+async def get_compile_targets(
+    *,
+    site_packages: bool = True,
+    python_path: str | None = None,
+    cwd: Path | None = None,
+) -> list[tuple[Path, str | None]]:
+    """获取需要预编译的目录及其排除规则
+
+    包括项目目录, 项目外的插件目录, 以及项目 Python 环境的 site-packages.
+    """
+    root = get_project_root(cwd).resolve()
+    targets: list[tuple[Path, str | None]] = [(root, _exclude_in(root))]
+    for plugin_dir in get_kiramibot_config().plugin_dirs:
+        path = (root / strip_plugin_priority(plugin_dir)).resolve()
+        if path.is_dir() and root not in path.parents:
+            targets.append((path, _exclude_in(path)))
+    if site_packages:
+        targets.extend((path, None) for path in await get_site_packages(python_path))
+    return targets
+
+
+async def compile_bytecode(
+    dirs: Sequence[tuple[Path, str | None]] = (),
+    files: Sequence[Path] = (),
+    *,
+    optimize: Sequence[int] = (),
+    jobs: int = 0,
+    python_path: str | None = None,
+    cwd: Path | None = None,
+    stdout: IO[Any] | int | None = None,
+    stderr: IO[Any] | int | None = None,
+) -> asyncio.subprocess.Process:
+    """使用项目的 Python 解释器将源文件编译为字节码
+
+    字节码与解释器版本相关, 因此编译在项目的解释器中进行. 目录中的文件由
+    `compileall` 的进程池并行编译, 已是最新的字节码会被跳过.
+
+    参数:
+        dirs: 需要编译的目录及其排除规则
+        files: 需要编译的文件
+        optimize: 优化级别, 为空时使用解释器当前的级别
+        jobs: 并行编译的进程数, 为 0 时使用所有 CPU 核心
+    """
+    if python_path is None:
+        python_path = await get_default_python()
+
+    t = templates.get_template("project/compile.py.jinja")
+    script = await t.render_async(
+        dirs=[(str(path), exclude) for path, exclude in dirs],
+        files=[str(path) for path in files],
+        optimize=list(optimize) or -1,
+        workers=jobs,
+    )
+    return await create_process(
+        python_path, "-c", script, cwd=cwd, stdout=stdout, stderr=stderr
+    )
@@ -0,0 +1,105 @@
+import json
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from kirami_cli import _
+
+from .onebot import get_session
+
+CAPTURE_ADAPTER = "OneBot V11"
+
+
+@dataclass
+class Capture:
+    """`kirami run --capture` 记录的流量
+
+    参数:
+        events: 事件, 相对第一个事件的时间以及记录中 bot 是否回复了该事件,
+            按时间排列
+        api_calls: bot 调用各 API 的次数
+        skipped: 其他适配器的事件数
+    """
+
+    events: list[tuple[float, dict[str, Any], bool]] = field(default_factory=list)
+    api_calls: Counter[str] = field(default_factory=Counter)
+    skipped: int = 0
+
+    @property
+    def duration(self) -> float:
+        return self.events[-1][0] if self.events else 0.0
+
+    @classmethod
+    def load(cls, path: Path, adapter: str = CAPTURE_ADAPTER) -> "Capture":
+        """读取记录的流量, 只保留指定适配器的事件
+
+        多个工作进程的记录可能交错, 事件按时间重新排列. 在同一会话的下一个事件
+        之前, bot 向该会话调用了 API 的事件视为得到了回复.
+
+        异常:
+            OSError: 无法读取文件
+            ValueError: 文件不是流量记录
+        """
+        capture = cls()
+        events: list[tuple[float, dict[str, Any]]] = []
+        calls: list[tuple[float, int | None]] = []
+        with path.open(encoding="utf-8") as file:
+            for number, line in enumerate(file, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                    if record["adapter"] != adapter:
+                        capture.skipped += record["type"] == "event"
+                    elif record["type"] == "event":
+                        events.append((record["t"], record["data"]))
+                    elif record["type"] == "api":
+                        capture.api_calls[record["api"]] += 1
+                        calls.append((record["t"], get_session(record["params"])))
+                except (AttributeError, KeyError, TypeError, ValueError) as e:
+                    raise ValueError(
+                        _("Line {number} of {path} is not a capture record.").format(
+                            number=number, path=path
+                        )
+                    ) from e
+        events.sort(key=lambda event: event[0])
+        calls.sort(key=lambda call: call[0])
+
+        # latest event of each session before each api call
+        replied = [False] * len(events)
+        latest: dict[int, int] = {}
+        index = 0
+        for time_, target in calls:
+            while index < len(events) and events[index][0] <= time_:
+                if (session := get_session(events[index][1])) is not None:
+                    latest[session] = index
+                index += 1
+            if target in latest:
+                replied[latest[target]] = True
+
+        if events:
+            start = events[0][0]
+            capture.events = [
+                (time_ - start, event, reply)
+                for (time_, event), reply in zip(events, replied)
+            ]
+        return capture
+
+    def schedule(
+        self, speed: float = 1.0, self_id: int | None = None
+    ) -> list[tuple[float, dict[str, Any], bool]]:
+        """按倍速重放的事件, 上报时间以及是否等待回复
+
+        参数:
+            speed: 重放速度的倍数
+            self_id: 替换事件中的机器人账号, 所有事件都由同一个替身上报
+        """
+        return [
+            (
+                offset / speed,
+                event if self_id is None else event | {"self_id": self_id},
+                reply,
+            )
+            for offset, event, reply in self.events
+        ]
@@ -0,0 +1,233 @@
+import asyncio
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from collections.abc import Awaitable, Callable, Iterable
+from pathlib import Path
+from typing import Any
+
+from kirami_cli import _
+
+from .agent import AgentConnection, AgentServer
+from .memory import request_memory_snapshot
+from .meta import get_project_root
+from .metrics import MetricsServer
+from .profiler import request_profile
+from .supervisor import Worker
+
+
+def get_control_path(cwd: Path | None = None) -> Path:
+    """获取项目控制套接字的路径
+
+    套接字放在仅当前用户可访问的运行时目录中, 项目目录可能过长而无法用作套接字路径.
+    """
+    root = get_project_root(cwd).resolve()
+    if runtime_dir := os.environ.get("XDG_RUNTIME_DIR"):
+        base = Path(runtime_dir) / "kirami-cli"
+    else:
+        base = Path(tempfile.gettempdir()) / f"kirami-cli-{os.getuid()}"
+    digest = hashlib.sha1(str(root).encode()).hexdigest()[:16]
+    return base / f"{digest}.sock"
+
+
+class ControlServer:
+    """`kirami run` 持有的本地控制套接字
+
+    使用按行分隔的 JSON 通信, 请求为 `{"command": ...}`, 支持的命令为
+    `reload`, `stats`, `restart-worker`, `profile`, `memory` 与 `stop`.
+
+    参数:
+        path: 套接字路径
+        workers: 获取当前的工作进程
+        stop: 停止 `kirami run`
+        reload: 立即重启 bot, 不支持时为 `None`
+        restart_worker: 重启指定序号的工作进程, 不支持时为 `None`
+        agent: 代理服务, 用于转发需要在 bot 进程内完成的命令
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        *,
+        workers: Callable[[], Iterable[Worker]],
+        stop: Callable[[], None],
+        reload: Callable[[], Awaitable[None]] | None = None,
+        restart_worker: Callable[[int], Awaitable[None]] | None = None,
+        agent: AgentServer | None = None,
+        logger: logging.Logger | None = None,
+    ) -> None:
+        self.path = path
+        self.workers = workers
+        self.stop = stop
+        self.reload = reload
+        self.restart_worker = restart_worker
+        self.agent = agent
+        self.logger = logger
+
+        self.metrics = MetricsServer(workers, port=None)
+        self._server: asyncio.Server | None = None
+        self._tasks: set[asyncio.Task] = set()
+
+    async def start(self) -> None:
+        """开始监听控制套接字
+
+        异常:
+            RuntimeError: 项目已经有正在运行的 `kirami run`
+        """
+        self.path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        if self.path.exists():
+            try:
+                await send_control(self.path, "ping", timeout=1.0)
+            except (OSError, asyncio.TimeoutError, ValueError):
+                # left behind by a process that did not exit cleanly
+                self.path.unlink()
+            else:
+                raise RuntimeError(_("The bot is already running in this project."))
+
+        self._server = await asyncio.start_unix_server(self._handle, self.path)
+        self.path.chmod(0o600)
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+            with contextlib.suppress(FileNotFoundError):
+                self.path.unlink()
+
+    async def _handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            while line := await reader.readline():
+                try:
+                    message = json.loads(line)
+                    result = await self._dispatch(message)
+                except Exception as e:
+                    result = {"ok": False, "error": str(e) or repr(e)}
+                writer.write((json.dumps(result) + "\n").encode())
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, message: dict[str, Any]) -> dict[str, Any]:
+        command = message.get("command")
+        if self.logger and command != "ping":
+            self.logger.info(
+                _("Received control command {command!r}.").format(command=command)
+            )
+
+        if command == "ping":
+            return {"ok": True}
+        if command == "stats":
+            return {"ok": True, "workers": await self.stats()}
+        if command == "stop":
+            self.stop()
+            return {"ok": True}
+        if command == "reload":
+            if self.reload is None:
+                raise RuntimeError(_("Reload needs --reload or --workers."))
+            self._create_task(self.reload())
+            return {"ok": True}
+        if command == "restart-worker":
+            if self.restart_worker is None:
+                raise RuntimeError(_("Restart needs --reload or --workers."))
+            worker = self._get_worker(message.get("worker"))
+            self._create_task(self.restart_worker(worker.index))
+            return {"ok": True}
+        if command == "profile":
+            reply = await request_profile(
+                self._get_connection(message.get("worker", 1)),
+                Path(message["output"]),
+                duration=message["duration"],
+                interval=message.get("interval", 0.005),
+                cprofile=message.get("cprofile", False),
+            )
+            return {"ok": True, **reply}
+        if command == "memory":
+            reply = await request_memory_snapshot(
+                self._get_connection(message.get("worker", 1)),
+                Path(message["output"]),
+            )
+            return {"ok": True, **reply}
+        raise ValueError(_("Unknown command {command!r}.").format(command=command))
+
+    def _get_worker(self, index: Any) -> Worker:
+        workers = list(self.workers())
+        for worker in workers:
+            if worker.index == index:
+                return worker
+        raise ValueError(
+            _("No worker {index}, the workers are {indexes}.").format(
+                index=index, indexes=", ".join(str(w.index) for w in workers)
+            )
+        )
+
+    def _get_connection(self, index: Any) -> AgentConnection:
+        worker = self._get_worker(index)
+        connection = None
+        if self.agent is not None and worker.process is not None:
+            connection = self.agent.get(worker.process.pid)
+        if connection is None:
+            raise RuntimeError(
+                _(
+                    "Worker {index} cannot be inspected, "
+                    "start the bot with kirami run --inspect."
+                ).format(index=worker.index)
+            )
+        return connection
+
+    async def stats(self) -> list[dict[str, Any]]:
+        """采样各工作进程的资源占用"""
+        if not self.metrics.samples:
+            # CPU usage is measured between two samples
+            self.metrics.sample()
+            await asyncio.sleep(0.1)
+        result: list[dict[str, Any]] = []
+        for sample in self.metrics.sample():
+            worker, stats = sample.worker, sample.stats
+            result.append(
+                {
+                    "worker": worker.index,
+                    "pid": worker.process.pid if worker.process else None,
+                    "running": stats is not None,
+                    "rss": stats.rss if stats else None,
+                    "cpu_percent": sample.cpu_percent,
+                    "open_fds": stats.open_fds if stats else None,
+                    "threads": stats.threads if stats else None,
+                    "restarts": worker.restarts,
+                    "last_restart_duration": worker.last_restart_duration,
+                }
+            )
+        return result
+
+    def _create_task(self, coro: Awaitable[None]) -> None:
+        # the reply does not wait for the restart, which may take a while
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+
+async def send_control(
+    path: Path, command: str, timeout: float | None = None, **data: Any
+) -> dict[str, Any]:
+    """向控制套接字发送命令并等待回复
+
+    异常:
+        OSError: 无法连接控制套接字
+        asyncio.TimeoutError: 等待回复超时
+    """
+    reader, writer = await asyncio.wait_for(asyncio.open_unix_connection(path), timeout)
+    try:
+        writer.write((json.dumps({"command": command, **data}) + "\n").encode())
+        await writer.drain()
+        line = await asyncio.wait_for(reader.readline(), timeout)
+    finally:
+        writer.close()
+    if not line:
+        raise ConnectionResetError("control socket closed")
+    return json.loads(line)
@@ -0,0 +1,183 @@
+import asyncio
+import hashlib
+import json
+from pathlib import Path
+from typing import Any
+
+from kirami_cli.config import GLOBAL_CONFIG, KiramiBotConfig
+
+from .adapter import list_adapters
+from .data import CACHE_DIR
+from .driver import list_drivers
+from .lock import DEFAULT_LOCK_FILE
+from .meta import get_default_python, get_kiramibot_config
+from .metadata import (
+    Distribution,
+    get_site_packages,
+    is_plugin_distribution,
+    parse_requirement,
+)
+from .plugin import list_plugins
+
+SYNC_STATE_DIR = CACHE_DIR / "sync"
+
+
+def _normalize_module_name(name: str, prefix: str) -> str:
+    return name.replace(prefix, "~")
+
+
+async def get_project_packages(config: KiramiBotConfig | None = None) -> list[str]:
+    """根据项目配置获取需要安装的包
+
+    参数:
+        config: KiramiBot 配置, 默认为当前项目配置
+
+    返回:
+        以 `kiramibot` 开头的包列表, 不在商店中的模块会被忽略
+    """
+    if config is None:
+        config = get_kiramibot_config()
+
+    drivers, adapters, plugins = await asyncio.gather(
+        list_drivers(), list_adapters(), list_plugins()
+    )
+
+    packages: list[str] = ["kiramibot"]
+
+    driver_names = {
+        _normalize_module_name(d, "nonebot.drivers.")
+        for d in config.driver.split("+")
+        if d
+    }
+    packages.extend(
+        d.project_link
+        for d in drivers
+        if _normalize_module_name(d.module_name, "nonebot.drivers.") in driver_names
+    )
+
+    adapter_names = {
+        _normalize_module_name(a, "nonebot.adapters.") for a in config.adapters
+    }
+    packages.extend(
+        a.project_link
+        for a in adapters
+        if _normalize_module_name(a.module_name, "nonebot.adapters.") in adapter_names
+    )
+
+    plugin_names = set(config.plugins)
+    packages.extend(p.project_link for p in plugins if p.module_name in plugin_names)
+
+    return list(dict.fromkeys(p for p in packages if p))
+
+
+def get_missing_packages(
+    packages: list[str],
+    dists: list[Distribution],
+    environment: dict[str, str] | None = None,
+) -> list[str]:
+    """获取未安装或版本与固定版本不一致的包
+
+    参数:
+        packages: 需要的包
+        dists: 目标解释器中已安装的发行包
+        environment: 目标解释器求值环境标记使用的环境
+    """
+    installed = {d.normalized_name: d for d in dists}
+    missing: list[str] = []
+    for package in packages:
+        name, extras, pin = parse_requirement(package)
+        dist = installed.get(name)
+        if (
+            dist is None
+            or (pin is not None and dist.version != pin)
+            or any(
+                n not in installed
+                for n in dist.get_requirement_names(extras, environment)
+            )
+        ):
+            missing.append(package)
+    return missing
+
+
+def get_extra_packages(
+    packages: list[str],
+    dists: list[Distribution],
+    environment: dict[str, str] | None = None,
+) -> list[str]:
+    """获取已安装但不被项目需要的插件与适配器
+
+    参数:
+        packages: 需要的包
+        dists: 目标解释器中已安装的发行包
+        environment: 目标解释器求值环境标记使用的环境
+    """
+    installed = {d.normalized_name: d for d in dists}
+    required: set[str] = set()
+    stack = [parse_requirement(p)[:2] for p in packages]
+    while stack:
+        name, extras = stack.pop()
+        if name in required and not extras:
+            continue
+        required.add(name)
+        if dist := installed.get(name):
+            stack.extend(
+                (n, set())
+                for n in dist.get_requirement_names(extras, environment)
+                if n not in required
+            )
+
+    return [
+        d.name
+        for d in dists
+        if d.normalized_name not in required
+        and (
+            is_plugin_distribution(d)
+            or d.normalized_name.startswith("nonebot-adapter-")
+        )
+    ]
+
+
+def _get_sync_state_file(project_root: Path) -> Path:
+    digest = hashlib.sha1(str(project_root).encode()).hexdigest()[:16]
+    return SYNC_STATE_DIR / f"{digest}.json"
+
+
+async def get_sync_state(python_path: str | None = None) -> dict[str, Any]:
+    """获取用于判断环境是否需要同步的状态
+
+    包含配置文件与锁文件内容的摘要以及 site-packages 的修改时间, 计算时不访问商店.
+    """
+    if python_path is None:
+        python_path = await get_default_python()
+
+    config_file = GLOBAL_CONFIG.config_file
+    config = config_file.read_bytes() if config_file.is_file() else b""
+    lock_file = GLOBAL_CONFIG.project_root / DEFAULT_LOCK_FILE
+    lock = lock_file.read_bytes() if lock_file.is_file() else b""
+    site_mtimes: dict[str, int] = {}
+    for site_dir in await get_site_packages(python_path):
+        try:
+            site_mtimes[str(site_dir)] = site_dir.stat().st_mtime_ns
+        except OSError:
+            continue
+
+    return {
+        "python": python_path,
+        "config": hashlib.sha256(config).hexdigest(),
+        "lock": hashlib.sha256(lock).hexdigest(),
+        "site": site_mtimes,
+    }
+
+
+def check_sync_state(state: dict[str, Any]) -> bool:
+    file = _get_sync_state_file(GLOBAL_CONFIG.project_root)
+    try:
+        return json.loads(file.read_text(encoding="utf-8")) == state
+    except (OSError, ValueError):
+        return False
+
+
+def save_sync_state(state: dict[str, Any]) -> None:
+    file = _get_sync_state_file(GLOBAL_CONFIG.project_root)
+    file.parent.mkdir(parents=True, exist_ok=True)
+    file.write_text(json.dumps(state), encoding="utf-8")
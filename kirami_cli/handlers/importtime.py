@@ -0,0 +1,217 @@
+import asyncio
+import re
+import sys
+import time
+from collections.abc import Callable, Coroutine
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from .agent import AgentServer
+from .meta import get_kiramibot_config, get_project_root, strip_plugin_priority
+from .process import ProcessLike, terminate_process
+
+IMPORT_TIME_LINE = re.compile(rb"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+@dataclass
+class ImportRecord:
+    """一条 `-X importtime` 格式的导入记录, 时间单位为微秒
+
+    参数:
+        module: 模块名
+        self_time: 导入该模块本身的时间
+        cumulative: 包括该模块导入的其他模块在内的时间
+        level: 嵌套层级, 顶层导入为 0
+    """
+
+    module: str
+    self_time: int
+    cumulative: int
+    level: int
+
+
+@dataclass
+class StartupProfile:
+    """bot 启动过程的导入耗时
+
+    参数:
+        records: 按完成顺序排列的导入记录
+        ready_time: 从启动进程到 bot 就绪的时间, 未就绪时为 `None`
+        plugins: 配置的插件及其可能的模块名
+    """
+
+    records: list[ImportRecord] = field(default_factory=list)
+    ready_time: float | None = None
+    plugins: dict[str, set[str]] = field(default_factory=dict)
+
+    @property
+    def total(self) -> int:
+        return sum(record.self_time for record in self.records)
+
+    def packages(self) -> list[tuple[str, int, int]]:
+        """按顶层包汇总的导入时间, 返回 `(包名, 时间, 模块数)` 并按时间降序排列"""
+        totals: dict[str, list[int]] = {}
+        for record in self.records:
+            total = totals.setdefault(record.module.partition(".")[0], [0, 0])
+            total[0] += record.self_time
+            total[1] += 1
+        return sorted(
+            ((name, time_, count) for name, (time_, count) in totals.items()),
+            key=lambda item: item[1],
+            reverse=True,
+        )
+
+    def plugin_times(self) -> list[tuple[str, int]]:
+        """各插件包括依赖在内的导入时间, 按时间降序排列
+
+        依赖已被先导入的插件导入时不计入后导入的插件.
+        """
+        times: dict[str, int] = {}
+        for record in self.records:
+            for plugin, modules in self.plugins.items():
+                if record.module in modules:
+                    times[plugin] = times.get(plugin, 0) + record.cumulative
+        return sorted(times.items(), key=lambda item: item[1], reverse=True)
+
+    def to_dict(self, budget: float | None = None) -> dict[str, Any]:
+        return {
+            "ready_time": self.ready_time,
+            "total_import_time": self.total / 1e6,
+            "packages": [
+                {"name": name, "time": time_ / 1e6, "modules": count}
+                for name, time_, count in self.packages()
+            ],
+            "plugins": [
+                {
+                    "name": name,
+                    "time": time_ / 1e6,
+                    "over_budget": budget is not None and time_ / 1e6 > budget,
+                }
+                for name, time_ in self.plugin_times()
+            ],
+            "modules": [
+                {
+                    "name": record.module,
+                    "self": record.self_time / 1e6,
+                    "cumulative": record.cumulative / 1e6,
+                    "level": record.level,
+                }
+                for record in self.records
+            ],
+        }
+
+
+def parse_import_time(line: bytes) -> ImportRecord | None:
+    """解析一行 `-X importtime` 的输出, 不是导入记录时返回 `None`"""
+    if (match := IMPORT_TIME_LINE.match(line)) is None:
+        return None
+    self_time, cumulative, indent, module = match.groups()
+    return ImportRecord(
+        module.decode(),
+        int(self_time),
+        int(cumulative),
+        max(len(indent) - 1, 0) // 2,
+    )
+
+
+def get_plugin_modules(cwd: Path | None = None) -> dict[str, set[str]]:
+    """获取配置的插件及其可能的模块名
+
+    插件目录中的插件可能以目录的相对路径或仅以其名称导入.
+    """
+    root = get_project_root(cwd).resolve()
+    config = get_kiramibot_config()
+    plugins = {name: {name} for name in config.plugins}
+    for plugin_dir in config.plugin_dirs:
+        directory = (root / strip_plugin_priority(plugin_dir)).resolve()
+        if not directory.is_dir():
+            continue
+        prefix = ""
+        if root in directory.parents:
+            prefix = ".".join(directory.relative_to(root).parts) + "."
+        for path in directory.iterdir():
+            if path.name.startswith(("_", ".")):
+                continue
+            if path.suffix == ".py":
+                name = path.stem
+            elif path.joinpath("__init__.py").is_file():
+                name = path.name
+            else:
+                continue
+            plugins[name] = {name, prefix + name}
+    return plugins
+
+
+async def profile_startup(
+    startup_func: Callable[..., Coroutine[Any, Any, ProcessLike]],
+    agent: AgentServer,
+    *,
+    timeout: float = 120.0,
+    plugins: dict[str, set[str]] | None = None,
+) -> StartupProfile:
+    """启动 bot 并记录导入耗时, bot 就绪后将其关闭
+
+    `startup_func` 启动的进程需要记录导入耗时并连接到代理,
+    导入记录以外的错误输出原样转发.
+
+    参数:
+        startup_func: 启动 bot 进程
+        agent: 代理服务, 用于得知 bot 就绪
+        timeout: 等待 bot 就绪的超时时间
+        plugins: 配置的插件及其可能的模块名
+    """
+    profile = StartupProfile(plugins=plugins or {})
+    started = time.perf_counter()
+    process = await startup_func(stderr=asyncio.subprocess.PIPE)
+    assert process.stderr is not None
+    reading = asyncio.create_task(_read_imports(process.stderr, profile.records))
+
+    async def wait_ready() -> None:
+        connection = await agent.wait_for(process.pid)
+        await connection.wait_event("ready")
+        profile.ready_time = time.perf_counter() - started
+
+    ready = asyncio.ensure_future(wait_ready())
+    exited = asyncio.ensure_future(process.wait())
+    try:
+        await asyncio.wait(
+            (ready, exited), timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+        )
+        # the records are written before the bot reports ready, read what is
+        # left in the pipe but leave out imports made while shutting down
+        await asyncio.sleep(0.1)
+        count = len(profile.records)
+    finally:
+        ready.cancel()
+        exited.cancel()
+        if process.returncode is None:
+            await terminate_process(process)
+        agent.discard(process.pid)
+        reading.cancel()
+    del profile.records[count:]
+    return profile
+
+
+async def _read_imports(
+    reader: asyncio.StreamReader, records: list[ImportRecord]
+) -> None:
+    pending = b""
+    while chunk := await reader.read(65536):
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        other: list[bytes] = []
+        for line in lines:
+            if (record := parse_import_time(line)) is not None:
+                records.append(record)
+            elif not line.startswith(b"import time: self"):
+                other.append(line + b"\n")
+        if other:
+            _write_stderr(b"".join(other))
+    if pending:
+        _write_stderr(pending + b"\n")
+
+
+def _write_stderr(data: bytes) -> None:
+    sys.stderr.buffer.write(data)
+    sys.stderr.flush()
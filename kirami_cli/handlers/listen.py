@@ -0,0 +1,58 @@
+import asyncio
+import socket
+import time
+
+from .meta import get_kiramibot_config
+
+LISTEN_FD_ENV = "KIRAMI_LISTEN_FD"
+LISTEN_PORT_ENV = "KIRAMI_LISTEN_PORT"
+# kiramibot defaults of the http and websocket server
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8120
+
+
+def get_listen_address() -> tuple[str, int]:
+    config = get_kiramibot_config()
+    return (
+        str(getattr(config, "host", DEFAULT_HOST)),
+        int(getattr(config, "port", DEFAULT_PORT)),
+    )
+
+
+def create_listen_socket(
+    host: str | None = None, port: int | None = None, backlog: int = 2048
+) -> socket.socket:
+    """创建由 CLI 持有并传递给 bot 进程的监听套接字
+
+    CLI 在重启期间保持监听, 新连接会在队列中等待新进程接受而不会被拒绝.
+    """
+    if host is None or port is None:
+        default_host, default_port = get_listen_address()
+        host = host or default_host
+        port = port or default_port
+
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+async def wait_for_listen(host: str, port: int, timeout: float = 30.0) -> bool:
+    """等待端口开始接受连接, 超时返回 `False`
+
+    bot 就绪时服务器可能还没有开始监听.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            _reader, writer = await asyncio.open_connection(host, port)
+        except OSError:
+            if time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(0.1)
+        else:
+            writer.close()
+            return True
@@ -0,0 +1,259 @@
+import asyncio
+import json
+import tempfile
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from kirami_cli.exceptions import LockEnvironmentError
+
+from .metadata import get_marker_environment, normalize_name
+from .pip import call_pip, call_pip_install
+
+DEFAULT_LOCK_FILE = "kirami.lock"
+LOCK_FILE_HEADER = (
+    "# This file is @generated by kirami lock.\n"
+    "# It is not intended for manual editing.\n"
+)
+# header fields of the environment the lock file was resolved for
+LOCK_ENVIRONMENT_KEYS = ("python", "platform")
+
+
+@dataclass
+class LockedPackage:
+    """锁定的包
+
+    参数:
+        name: 包名
+        version: 版本
+        url: 直接引用的地址, 仅在包不是从索引安装时存在
+        hashes: 包文件的哈希值
+    """
+
+    name: str
+    version: str
+    url: str | None = None
+    hashes: list[str] = field(default_factory=list)
+
+    @property
+    def requirement(self) -> str:
+        return (
+            f"{self.name} @ {self.url}" if self.url else f"{self.name}=={self.version}"
+        )
+
+    def to_line(self, with_hashes: bool = True) -> str:
+        hashes = self.hashes if with_hashes else []
+        return " \\\n    ".join([self.requirement, *(f"--hash={h}" for h in hashes)])
+
+
+def _parse_report_item(item: dict) -> LockedPackage:
+    metadata = item["metadata"]
+    download_info = item.get("download_info", {})
+    archive_info = download_info.get("archive_info", {})
+
+    hashes = [f"{k}:{v}" for k, v in archive_info.get("hashes", {}).items()]
+    if not hashes and (legacy_hash := archive_info.get("hash")):
+        hashes = [legacy_hash.replace("=", ":", 1)]
+
+    return LockedPackage(
+        name=normalize_name(metadata["name"]),
+        version=metadata["version"],
+        url=download_info.get("url") if item.get("is_direct") else None,
+        hashes=hashes,
+    )
+
+
+async def resolve_lock(
+    packages: list[str],
+    pip_args: list[str] | None = None,
+    *,
+    python_path: str | None = None,
+) -> tuple[list[LockedPackage] | None, bytes]:
+    """使用 pip 解析完整的依赖树
+
+    返回:
+        解析得到的包 (失败时为 `None`) 与 pip 的输出
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        report = Path(tmp) / "report.json"
+        proc = await call_pip(
+            [
+                "install",
+                "--dry-run",
+                "--ignore-installed",
+                "--quiet",
+                "--report",
+                str(report),
+                *packages,
+                *(pip_args or []),
+            ],
+            python_path=python_path,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+        )
+        stdout, _ = await proc.communicate()
+        if proc.returncode != 0:
+            return None, stdout
+
+        items = json.loads(report.read_text(encoding="utf-8"))["install"]
+
+    locked = [_parse_report_item(item) for item in items]
+    return sorted(locked, key=lambda p: p.name), stdout
+
+
+def get_lock_environment(environment: dict[str, str]) -> dict[str, str]:
+    """锁文件适用的解释器与平台
+
+    pip 只记录为当前解释器与平台选择的文件, 并且不保留环境标记,
+    因此锁文件只适用于解析时的环境.
+
+    参数:
+        environment: 解释器求值环境标记使用的环境
+    """
+    return {
+        "python": f"{environment['implementation_name']}-"
+        f"{environment['python_version']}",
+        "platform": f"{environment['sys_platform']}-"
+        f"{environment['platform_machine'].lower()}",
+    }
+
+
+def write_lock_file(
+    file: Path, locked: list[LockedPackage], environment: dict[str, str]
+) -> bool:
+    """写入锁文件
+
+    pip 在任一条目带有哈希值时会要求所有条目都带有哈希值, 因此只要有包
+    (如 VCS 或本地目录的直接引用) 没有哈希值, 所有条目都不会写入哈希值.
+
+    参数:
+        file: 锁文件路径
+        locked: 锁定的包
+        environment: 解析时解释器求值环境标记使用的环境
+
+    返回:
+        是否写入了哈希值
+    """
+    with_hashes = all(p.hashes for p in locked)
+    header = LOCK_FILE_HEADER + "".join(
+        f"# {key}: {value}\n"
+        for key, value in get_lock_environment(environment).items()
+    )
+    file.write_text(
+        header + "".join(f"{p.to_line(with_hashes)}\n" for p in locked),
+        encoding="utf-8",
+    )
+    return with_hashes
+
+
+def read_lock_environment(file: Path) -> dict[str, str]:
+    """读取锁文件头部记录的解释器与平台, 旧的锁文件没有记录"""
+    environment: dict[str, str] = {}
+    for line in file.read_text(encoding="utf-8").splitlines():
+        if not line.startswith("#"):
+            break
+        key, sep, value = line[1:].partition(":")
+        if sep and key.strip() in LOCK_ENVIRONMENT_KEYS:
+            environment[key.strip()] = value.strip()
+    return environment
+
+
+async def check_lock_environment(file: Path, *, python_path: str | None = None) -> None:
+    """检查锁文件是否适用于目标解释器
+
+    异常:
+        LockEnvironmentError: 锁文件是为其他解释器或平台解析的
+    """
+    locked = read_lock_environment(file)
+    current = get_lock_environment(await get_marker_environment(python_path))
+    if any(current[key] != value for key, value in locked.items()):
+        raise LockEnvironmentError(
+            " ".join(locked.values()), " ".join(current[key] for key in locked)
+        )
+
+
+def read_lock_file(file: Path) -> list[str]:
+    """读取锁文件, 返回每个包对应的 requirements 条目"""
+    entries: list[str] = []
+    for line in file.read_text(encoding="utf-8").splitlines():
+        stripped = line.strip()
+        if not stripped or stripped.startswith("#"):
+            continue
+        if entries and entries[-1].endswith("\\"):
+            entries[-1] = f"{entries[-1][:-1].rstrip()} {stripped}"
+        else:
+            entries.append(stripped)
+    return [e.rstrip("\\").rstrip() for e in entries]
+
+
+def get_locked_requirements(file: Path) -> list[str]:
+    """读取锁文件中的包, 不包含哈希值"""
+    return [entry.split(" --hash=")[0] for entry in read_lock_file(file)]
+
+
+async def install_locked(
+    file: Path,
+    pip_args: list[str] | None = None,
+    *,
+    jobs: int = 1,
+    python_path: str | None = None,
+    wheelhouse: Path | None = None,
+) -> int:
+    """按锁文件安装固定版本的包, 跳过依赖解析
+
+    `jobs` 大于 1 时会将锁文件拆分并同时运行多个 pip 进程下载包,
+    下载完成后再由一个 pip 进程安装, 避免多个进程同时写入 site-packages.
+
+    异常:
+        LockEnvironmentError: 锁文件是为其他解释器或平台解析的
+    """
+    await check_lock_environment(file, python_path=python_path)
+    entries = read_lock_file(file)
+    install_args = ["--no-deps", *(pip_args or [])]
+    if jobs <= 1 or len(entries) <= 1 or wheelhouse is not None:
+        proc = await call_pip_install(
+            ["-r", str(file)],
+            install_args,
+            python_path=python_path,
+            wheelhouse=wheelhouse,
+        )
+        return await proc.wait()
+
+    chunks = [entries[i::jobs] for i in range(jobs) if entries[i::jobs]]
+    with tempfile.TemporaryDirectory() as tmp:
+        download_dir = Path(tmp) / "downloads"
+        files: list[Path] = []
+        for index, chunk in enumerate(chunks):
+            chunk_file = Path(tmp) / f"{index}.txt"
+            chunk_file.write_text("".join(f"{e}\n" for e in chunk), encoding="utf-8")
+            files.append(chunk_file)
+
+        # every package is in exactly one chunk, so no two processes
+        # download the same file
+        procs = await asyncio.gather(
+            *(
+                call_pip(
+                    [
+                        "download",
+                        "--no-deps",
+                        "--dest",
+                        str(download_dir),
+                        "-r",
+                        str(chunk_file),
+                        *(pip_args or []),
+                    ],
+                    python_path=python_path,
+                )
+                for chunk_file in files
+            )
+        )
+        returncodes = await asyncio.gather(*(proc.wait() for proc in procs))
+        if returncode := next((code for code in returncodes if code != 0), 0):
+            return returncode
+
+        proc = await call_pip_install(
+            ["-r", str(file)],
+            install_args,
+            python_path=python_path,
+            wheelhouse=download_dir,
+        )
+        return await proc.wait()
@@ -0,0 +1,274 @@
+import atexit
+import contextlib
+import gzip
+import os
+import shutil
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import IO, Any, BinaryIO
+
+from kirami_cli import _
+
+
+class BufferedWriter(ABC):
+    """在后台线程中写入输出的基类
+
+    `write` 只把数据放入有界的环形缓冲区, 不会因输出缓慢而阻塞事件循环;
+    缓冲区写满时丢弃最旧的输出, 由写入线程记录丢弃的字节数.
+
+    参数:
+        buffer_size: 环形缓冲区的大小
+    """
+
+    def __init__(self, *, buffer_size: int) -> None:
+        self.buffer_size = buffer_size
+
+        self.dropped = 0
+        self._buffer: deque[bytes] = deque()
+        self._buffered = 0
+        self._closing = False
+        self._changed = threading.Condition()
+        self._thread: threading.Thread | None = None
+
+    def write(self, data: bytes) -> None:
+        """将数据放入缓冲区, 从不阻塞"""
+        with self._changed:
+            if len(data) > self.buffer_size:
+                self.dropped += len(data) - self.buffer_size
+                data = data[-self.buffer_size :]
+            while self._buffered + len(data) > self.buffer_size:
+                dropped = self._buffer.popleft()
+                self._buffered -= len(dropped)
+                self.dropped += len(dropped)
+            self._buffer.append(data)
+            self._buffered += len(data)
+            self._changed.notify()
+
+    def close(self) -> None:
+        """写入缓冲区中剩余的数据并停止写入线程"""
+        with self._changed:
+            self._closing = True
+            self._changed.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _start(self, name: str, *args: Any) -> None:
+        self._thread = threading.Thread(
+            target=self._run, args=args, name=name, daemon=True
+        )
+        self._thread.start()
+
+    @abstractmethod
+    def _run(self, *args: Any) -> None:
+        """在写入线程中运行, 通过 `_take` 取出数据直到关闭"""
+        raise NotImplementedError
+
+    def _take(self, timeout: float | None = None) -> tuple[list[bytes], int, bool]:
+        # waits for data, returns it with the dropped bytes so far and
+        # whether the writer is closing
+        with self._changed:
+            self._changed.wait_for(lambda: self._buffer or self._closing, timeout)
+            chunks = list(self._buffer)
+            self._buffer.clear()
+            self._buffered = 0
+            return chunks, self.dropped, self._closing
+
+
+class LogFile(BufferedWriter):
+    """将 bot 的输出写入文件, 并按大小或时间轮转
+
+    输出由后台线程写入磁盘, 缓冲区写满时丢弃最旧的输出并在文件中记录丢弃的字节数.
+    轮转后的文件以时间命名, 并在后台线程中压缩.
+
+    参数:
+        path: 日志文件路径
+        max_bytes: 文件超过该大小时轮转, 为 `None` 时不按大小轮转
+        interval: 每隔该秒数轮转, 为 `None` 时不按时间轮转
+        backup_count: 保留的轮转文件数量
+        compress: 是否使用 gzip 压缩轮转后的文件
+        buffer_size: 环形缓冲区的大小
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        *,
+        max_bytes: int | None = None,
+        interval: float | None = None,
+        backup_count: int = 5,
+        compress: bool = True,
+        buffer_size: int = 4 * 1024 * 1024,
+    ) -> None:
+        super().__init__(buffer_size=buffer_size)
+        self.path = path.resolve()
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.backup_count = backup_count
+        self.compress = compress
+        self._compressing: set[threading.Thread] = set()
+
+    def open(self) -> None:
+        """打开日志文件并启动写入线程
+
+        异常:
+            OSError: 无法打开日志文件
+        """
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._start("kirami-log-writer", self.path.open("ab"))
+
+    def close(self) -> None:
+        """写入缓冲区中剩余的数据, 并等待压缩完成"""
+        super().close()
+        for thread in list(self._compressing):
+            thread.join()
+
+    def _run(self, file: BinaryIO) -> None:
+        size = file.tell()
+        rollover = time.monotonic() + self.interval if self.interval else None
+        reported = 0
+        try:
+            while True:
+                timeout = max(rollover - time.monotonic(), 0) if rollover else None
+                chunks, dropped, closing = self._take(timeout)
+
+                if dropped > reported:
+                    notice = _(
+                        "[kirami] Dropped {count} bytes of output, "
+                        "the log file could not keep up.\n"
+                    ).format(count=dropped - reported)
+                    chunks.insert(0, notice.encode())
+                    reported = dropped
+                try:
+                    for chunk in chunks:
+                        file.write(chunk)
+                        size += len(chunk)
+                    file.flush()
+                except OSError:
+                    # e.g. the disk is full, the output is lost but the bot
+                    # keeps running
+                    pass
+                if closing:
+                    return
+
+                if (self.max_bytes and size >= self.max_bytes) or (
+                    rollover and time.monotonic() >= rollover
+                ):
+                    if size:
+                        file.close()
+                        with contextlib.suppress(OSError):
+                            self._rotate()
+                        file = self.path.open("ab")
+                        size = file.tell()
+                    if self.interval:
+                        rollover = time.monotonic() + self.interval
+        finally:
+            file.close()
+
+    def _rotate(self) -> None:
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        target = self.path.with_name(f"{self.path.name}.{stamp}")
+        index = 1
+        while target.exists() or target.with_name(target.name + ".gz").exists():
+            target = self.path.with_name(f"{self.path.name}.{stamp}-{index}")
+            index += 1
+        os.replace(self.path, target)
+
+        if not self.compress:
+            self._remove_backups()
+            return
+        thread = threading.Thread(
+            target=self._compress, args=(target,), name="kirami-log-compress"
+        )
+        self._compressing.add(thread)
+        thread.start()
+
+    def _compress(self, path: Path) -> None:
+        try:
+            partial = path.with_name(path.name + ".gz.part")
+            with path.open("rb") as source, gzip.open(partial, "wb") as target:
+                shutil.copyfileobj(source, target)
+            compressed = path.with_name(path.name + ".gz")
+            os.replace(partial, compressed)
+            # backups are ordered by the time they were rotated
+            shutil.copystat(path, compressed)
+            path.unlink()
+            self._remove_backups()
+        except OSError:
+            # keep the uncompressed file rather than losing it
+            pass
+        finally:
+            self._compressing.discard(threading.current_thread())
+
+    def _remove_backups(self) -> None:
+        backups: list[tuple[float, Path]] = []
+        for path in self.path.parent.glob(f"{self.path.name}.*"):
+            if path.name.endswith(".part"):
+                continue
+            with contextlib.suppress(OSError):
+                backups.append((path.stat().st_mtime, path))
+        backups.sort()
+        for _mtime, path in backups[: max(len(backups) - self.backup_count, 0)]:
+            with contextlib.suppress(OSError):
+                path.unlink()
+
+
+class TerminalWriter(BufferedWriter):
+    """在后台线程中将 bot 的输出写入终端, 终端无法及时读取时不阻塞事件循环
+
+    参数:
+        output: 写入的输出流, 如 `sys.stdout`
+        buffer_size: 环形缓冲区的大小
+    """
+
+    def __init__(self, output: IO[str], *, buffer_size: int = 1024 * 1024) -> None:
+        super().__init__(buffer_size=buffer_size)
+        self.output = output
+        self._start("kirami-terminal-writer")
+
+    def _run(self) -> None:
+        stream = getattr(self.output, "buffer", None)
+        reported = 0
+        while True:
+            chunks, dropped, closing = self._take()
+            if dropped > reported:
+                notice = _(
+                    "[kirami] Dropped {count} bytes of output, "
+                    "the terminal could not keep up.\n"
+                ).format(count=dropped - reported)
+                chunks.insert(0, notice.encode())
+                reported = dropped
+            try:
+                for chunk in chunks:
+                    if stream is not None:
+                        stream.write(chunk)
+                    else:
+                        self.output.write(chunk.decode(errors="replace"))
+                self.output.flush()
+            except (OSError, ValueError):
+                # the terminal went away or the stream was closed
+                pass
+            if closing:
+                return
+
+
+_terminal_writers: dict[int, TerminalWriter] = {}
+
+
+def get_terminal_writer(output: IO[str]) -> TerminalWriter:
+    """获取输出流共用的写入器, 在解释器退出前写完剩余的输出"""
+    if (writer := _terminal_writers.get(id(output))) is None:
+        if not _terminal_writers:
+            atexit.register(_close_terminal_writers)
+        writer = _terminal_writers[id(output)] = TerminalWriter(output)
+    return writer
+
+
+def _close_terminal_writers() -> None:
+    for writer in _terminal_writers.values():
+        writer.close()
+    _terminal_writers.clear()
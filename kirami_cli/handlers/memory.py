@@ -0,0 +1,128 @@
+import json
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from kirami_cli import _
+
+from .agent import AgentConnection
+
+# standard way to start tracemalloc when the interpreter starts, the value is
+# the number of frames stored for each allocation
+TRACEMALLOC_ENV = "PYTHONTRACEMALLOC"
+
+
+@dataclass
+class AllocationSite:
+    """tracemalloc 记录的一处内存分配位置
+
+    参数:
+        file: 源文件路径
+        line: 行号
+        module: 源文件所属的模块, 无法确定时为 `None`
+        size: 该位置分配且仍未释放的字节数
+        count: 该位置分配且仍未释放的内存块数
+    """
+
+    file: str
+    line: int
+    module: str | None
+    size: int
+    count: int
+
+    def group(self, plugins: dict[str, set[str]]) -> str:
+        """分配位置所属的插件, 不属于插件时为顶层包名或文件路径"""
+        if self.module is None:
+            return self.file
+        for plugin, modules in plugins.items():
+            for module in modules:
+                if self.module == module or self.module.startswith(module + "."):
+                    return plugin
+        return self.module.partition(".")[0]
+
+
+@dataclass
+class MemorySnapshot:
+    """bot 进程某一时刻的内存快照
+
+    参数:
+        pid: 进程 ID
+        time: 快照的时间戳
+        tracing: 快照时 tracemalloc 是否正在记录, 未记录时没有分配位置
+        traced_memory: tracemalloc 记录的内存总量
+        sites: 内存分配位置
+        types: 各类型的对象数量
+    """
+
+    pid: int
+    time: float
+    tracing: bool
+    traced_memory: int = 0
+    sites: list[AllocationSite] = field(default_factory=list)
+    types: dict[str, int] = field(default_factory=dict)
+
+    @classmethod
+    def load(cls, path: Path) -> "MemorySnapshot":
+        """读取 `kirami mem snapshot` 写入的快照
+
+        异常:
+            OSError: 无法读取文件
+            ValueError: 文件不是内存快照
+        """
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+            return cls(
+                pid=data["pid"],
+                time=data["time"],
+                tracing=data["tracing"],
+                traced_memory=data["traced_memory"],
+                sites=[AllocationSite(**site) for site in data["sites"]],
+                types=data["types"],
+            )
+        except (KeyError, TypeError) as e:
+            raise ValueError(
+                _("{path} is not a memory snapshot.").format(path=path)
+            ) from e
+
+    def groups(self, plugins: dict[str, set[str]]) -> dict[str, tuple[int, int]]:
+        """按插件汇总的分配位置, 返回 `{分组: (字节数, 内存块数)}`"""
+        groups: dict[str, tuple[int, int]] = {}
+        for site in self.sites:
+            group = site.group(plugins)
+            size, count = groups.get(group, (0, 0))
+            groups[group] = (size + site.size, count + site.count)
+        return groups
+
+
+def diff_counts(old: dict[str, int], new: dict[str, int]) -> list[tuple[str, int, int]]:
+    """比较两组计数, 返回 `(名称, 新计数, 变化量)` 并按变化量的绝对值降序排列"""
+    diffs = [
+        (name, new.get(name, 0), new.get(name, 0) - old.get(name, 0))
+        for name in old.keys() | new.keys()
+    ]
+    return sorted(
+        (diff for diff in diffs if diff[2]), key=lambda diff: abs(diff[2]), reverse=True
+    )
+
+
+async def request_memory_snapshot(
+    connection: AgentConnection, output: Path
+) -> dict[str, Any]:
+    """让 bot 进程将内存快照写入文件
+
+    tracemalloc 未在记录时, 快照只包含各类型的对象数量.
+
+    参数:
+        connection: 与 bot 进程内代理的连接
+        output: 快照文件路径
+
+    异常:
+        RuntimeError: bot 进程无法完成快照
+        ConnectionError: 与代理的连接已断开
+    """
+    reply = await connection.request(
+        "memory", timeout=120.0, output=str(output.resolve())
+    )
+    if "error" in reply:
+        raise RuntimeError(reply["error"])
+    return reply
@@ -41,6 +41,18 @@ def get_kiramibot_config() -> KiramiBotConfig:
     return GLOBAL_CONFIG.get_kiramibot_config()
 
 
+def strip_plugin_priority(entry: str) -> str:
+    """去掉 kiramibot 配置中插件或插件目录的优先级
+
+    `plugins` 与 `plugin_dirs` 的配置项可以写作 `name:priority`, 如 `plugins:10`.
+    只按最后一个 `:` 分割, 并保留 Windows 路径的盘符, 如 `C:\\bot\\plugins`.
+    """
+    name, sep, _priority = entry.rpartition(":")
+    if not sep or (len(name) == 1 and name.isalpha()):
+        return entry
+    return name
+
+
 def get_project_root(cwd: Path | None = None) -> Path:
     config = ConfigManager(working_dir=cwd) if cwd is not None else GLOBAL_CONFIG
     return config.project_root
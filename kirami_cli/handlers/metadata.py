@@ -0,0 +1,303 @@
+import asyncio
+import functools
+import hashlib
+import json
+import re
+from collections.abc import Iterable
+from configparser import ConfigParser
+from dataclasses import asdict, dataclass, field
+from email.parser import HeaderParser
+from pathlib import Path
+
+from packaging.markers import Marker
+from packaging.requirements import InvalidRequirement, Requirement
+
+from kirami_cli import cache
+
+from . import templates
+from .data import CACHE_DIR
+from .meta import get_default_python
+from .process import create_process
+
+METADATA_CACHE_DIR = CACHE_DIR / "metadata"
+# bump when the cached index format changes
+INDEX_VERSION = 2
+
+KIRAMIBOT_PACKAGES = ("kiramibot", "nonebot2")
+
+REQUIREMENT_PATTERN = re.compile(
+    r"\s*(?P<name>[A-Za-z0-9][A-Za-z0-9._-]*)\s*"
+    r"(?:\[(?P<extras>[^\]]*)\])?\s*"
+    r"(?:===?\s*(?P<pin>[^\s;,]+)\s*(?:;|$))?"
+)
+
+_index_cache: dict[Path, tuple[int, list["Distribution"]]] = {}
+
+
+@dataclass
+class Distribution:
+    """已安装的发行包
+
+    参数:
+        name: 包名
+        version: 版本
+        requires: 依赖声明 (`Requires-Dist`)
+        entry_points: 入口点, 按组分类
+    """
+
+    name: str
+    version: str
+    requires: list[str] = field(default_factory=list)
+    entry_points: dict[str, dict[str, str]] = field(default_factory=dict)
+
+    @property
+    def normalized_name(self) -> str:
+        return normalize_name(self.name)
+
+    @property
+    def requirement_names(self) -> set[str]:
+        return self.get_requirement_names()
+
+    def get_requirement_names(
+        self, extras: Iterable[str] = (), environment: dict[str, str] | None = None
+    ) -> set[str]:
+        """获取依赖包名
+
+        仅在 `extras` 中的额外依赖会被包含.
+
+        参数:
+            extras: 需要的额外依赖
+            environment: 求值环境标记使用的环境, 默认为当前解释器的环境
+        """
+        environments = [
+            {**(environment or {}), "extra": normalize_name(e)} for e in extras
+        ] or [{**(environment or {}), "extra": ""}]
+        names: set[str] = set()
+        for req in self.requires:
+            name, _, _ = parse_requirement(req)
+            if not name:
+                continue
+            marker = _parse_marker(req)
+            if marker is None or any(marker.evaluate(env) for env in environments):
+                names.add(name)
+        return names
+
+
+def normalize_name(name: str) -> str:
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+@functools.cache
+def _parse_marker(requirement: str) -> Marker | None:
+    try:
+        return Requirement(requirement).marker
+    except InvalidRequirement:
+        return None
+
+
+def parse_requirement(requirement: str) -> tuple[str, set[str], str | None]:
+    """解析依赖声明
+
+    返回:
+        规范化的包名, extras 以及 `==` 固定的版本 (若有)
+    """
+    match = REQUIREMENT_PATTERN.match(requirement)
+    if match is None:
+        return "", set(), None
+    extras = {
+        normalize_name(e.strip())
+        for e in (match["extras"] or "").split(",")
+        if e.strip()
+    }
+    return normalize_name(match["name"]), extras, match["pin"]
+
+
+def _read_egg_requires(requires_file: Path) -> list[str]:
+    # requires.txt groups the requirements under [extra:marker] sections
+    try:
+        lines = requires_file.read_text(encoding="utf-8").splitlines()
+    except OSError:
+        return []
+
+    requires: list[str] = []
+    marker = ""
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if line.startswith("[") and line.endswith("]"):
+            extra, _, env_marker = line[1:-1].partition(":")
+            markers = [f"({env_marker})"] if env_marker else []
+            if extra:
+                markers.insert(0, f'extra == "{extra}"')
+            marker = " and ".join(markers)
+            continue
+        requires.append(f"{line} ; {marker}" if marker else line)
+    return requires
+
+
+def _read_distribution(dist_info: Path) -> Distribution | None:
+    if dist_info.suffix == ".dist-info":
+        metadata_file = dist_info / "METADATA"
+    elif dist_info.is_dir():
+        metadata_file = dist_info / "PKG-INFO"
+    else:
+        # distutils installs the egg-info as a single PKG-INFO file
+        metadata_file = dist_info
+    try:
+        text = metadata_file.read_text(encoding="utf-8")
+    except OSError:
+        return None
+
+    metadata = HeaderParser().parsestr(text)
+    if not (name := metadata.get("Name")):
+        return None
+
+    requires = metadata.get_all("Requires-Dist") or []
+    if not requires and dist_info.suffix == ".egg-info":
+        requires = _read_egg_requires(dist_info / "requires.txt")
+
+    entry_points: dict[str, dict[str, str]] = {}
+    if (entry_points_file := dist_info / "entry_points.txt").is_file():
+        parser = ConfigParser(delimiters=("=",), interpolation=None)
+        parser.optionxform = str  # type: ignore
+        try:
+            parser.read(entry_points_file, encoding="utf-8")
+        except Exception:
+            pass
+        else:
+            entry_points = {
+                section: dict(parser.items(section)) for section in parser.sections()
+            }
+
+    return Distribution(
+        name=name,
+        version=metadata.get("Version", ""),
+        requires=requires,
+        entry_points=entry_points,
+    )
+
+
+def _get_index_file(site_dir: Path) -> Path:
+    digest = hashlib.sha1(str(site_dir).encode()).hexdigest()[:16]
+    return METADATA_CACHE_DIR / f"{digest}.json"
+
+
+def scan_site_packages(site_dir: Path) -> list[Distribution]:
+    """读取 site-packages 中的 `*.dist-info` 与 `*.egg-info`, 按目录修改时间缓存索引"""
+    try:
+        mtime = site_dir.stat().st_mtime_ns
+    except OSError:
+        return []
+
+    if (cached := _index_cache.get(site_dir)) and cached[0] == mtime:
+        return cached[1]
+
+    index_file = _get_index_file(site_dir)
+    try:
+        index = json.loads(index_file.read_text(encoding="utf-8"))
+        if index["version"] == INDEX_VERSION and index["mtime"] == mtime:
+            dists = [Distribution(**d) for d in index["distributions"]]
+            _index_cache[site_dir] = (mtime, dists)
+            return dists
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+
+    dists = [
+        dist
+        for dist_info in sorted(
+            [*site_dir.glob("*.dist-info"), *site_dir.glob("*.egg-info")]
+        )
+        if (dist := _read_distribution(dist_info))
+    ]
+    _index_cache[site_dir] = (mtime, dists)
+
+    try:
+        index_file.parent.mkdir(parents=True, exist_ok=True)
+        index_file.write_text(
+            json.dumps(
+                {
+                    "version": INDEX_VERSION,
+                    "mtime": mtime,
+                    "distributions": [asdict(d) for d in dists],
+                }
+            ),
+            encoding="utf-8",
+        )
+    except OSError:
+        # the cache is only an optimization
+        pass
+    return dists
+
+
+@cache(ttl=None)
+async def get_site_packages(python_path: str | None = None) -> list[Path]:
+    if python_path is None:
+        python_path = await get_default_python()
+
+    # virtual environments have a fixed layout, no need to start the interpreter
+    venv_dir = Path(python_path).parent.parent
+    if venv_dir.joinpath("pyvenv.cfg").is_file():
+        if dirs := [
+            *venv_dir.glob("lib/python*/site-packages"),
+            *venv_dir.glob("Lib/site-packages"),
+        ]:
+            return dirs
+
+    t = templates.get_template("meta/site_packages.py.jinja")
+    proc = await create_process(
+        python_path,
+        "-W",
+        "ignore",
+        "-c",
+        await t.render_async(),
+        stdout=asyncio.subprocess.PIPE,
+    )
+    stdout, stderr = await proc.communicate()
+    return [Path(p) for p in json.loads(stdout.strip())]
+
+
+@cache(ttl=None)
+async def get_marker_environment(python_path: str | None = None) -> dict[str, str]:
+    """获取目标解释器求值环境标记使用的环境"""
+    if python_path is None:
+        python_path = await get_default_python()
+
+    t = templates.get_template("meta/marker_environment.py.jinja")
+    proc = await create_process(
+        python_path,
+        "-W",
+        "ignore",
+        "-c",
+        await t.render_async(),
+        stdout=asyncio.subprocess.PIPE,
+    )
+    stdout, stderr = await proc.communicate()
+    return json.loads(stdout.strip())
+
+
+async def get_distributions(python_path: str | None = None) -> list[Distribution]:
+    """获取目标解释器中已安装的发行包, 直接读取磁盘上的元数据而不启动 pip"""
+    dists: dict[str, Distribution] = {}
+    for site_dir in await get_site_packages(python_path):
+        for dist in scan_site_packages(site_dir):
+            # earlier entries on sys.path take precedence
+            dists.setdefault(dist.normalized_name, dist)
+    return list(dists.values())
+
+
+async def get_installed_plugins(python_path: str | None = None) -> list[Distribution]:
+    return [
+        dist
+        for dist in await get_distributions(python_path)
+        if is_plugin_distribution(dist)
+    ]
+
+
+def is_plugin_distribution(dist: Distribution) -> bool:
+    name = dist.normalized_name
+    return (
+        name not in KIRAMIBOT_PACKAGES
+        and not name.startswith("nonebot-adapter-")
+        and bool(dist.requirement_names.intersection(KIRAMIBOT_PACKAGES))
+    )
@@ -0,0 +1,232 @@
+import asyncio
+import contextlib
+import logging
+import time
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass
+
+from kirami_cli import _
+
+from .procfs import ProcessStats, format_bytes, read_process_stats
+from .supervisor import Worker
+
+DEFAULT_METRICS_PORT = 9120
+
+METRICS = (
+    (
+        "kirami_process_resident_memory_bytes",
+        "gauge",
+        "Resident memory size in bytes.",
+    ),
+    (
+        "kirami_process_cpu_seconds_total",
+        "counter",
+        "Total user and system CPU time spent in seconds.",
+    ),
+    ("kirami_process_open_fds", "gauge", "Number of open file descriptors."),
+    ("kirami_process_threads", "gauge", "Number of OS threads."),
+    ("kirami_worker_up", "gauge", "Whether the bot process is running."),
+    ("kirami_worker_restarts_total", "counter", "Number of restarts."),
+    (
+        "kirami_worker_last_restart_duration_seconds",
+        "gauge",
+        "Duration of the last restart in seconds.",
+    ),
+)
+
+
+@dataclass
+class Sample:
+    """一次采样的结果
+
+    参数:
+        worker: 被采样的工作进程
+        stats: 资源占用, 进程未运行时为 `None`
+        cpu_percent: 与上次采样之间的 CPU 占用率
+    """
+
+    worker: Worker
+    stats: ProcessStats | None
+    cpu_percent: float = 0.0
+
+
+class MetricsServer:
+    """定时采样 bot 进程, 以 Prometheus 文本格式提供指标并定期输出摘要
+
+    采样只读取 `/proc` 中的少量文件, 抓取指标时返回最近一次采样的结果,
+    开销与抓取频率无关.
+
+    参数:
+        workers: 获取需要采样的工作进程
+        host: 指标服务监听地址
+        port: 指标服务监听端口, 为 `None` 时不提供服务
+        interval: 采样间隔
+        summary_interval: 输出摘要的间隔
+    """
+
+    def __init__(
+        self,
+        workers: Callable[[], Iterable[Worker]],
+        *,
+        host: str = "127.0.0.1",
+        port: int | None = DEFAULT_METRICS_PORT,
+        interval: float = 5.0,
+        summary_interval: float = 60.0,
+        logger: logging.Logger | None = None,
+    ) -> None:
+        self.workers = workers
+        self.host = host
+        self.port = port
+        self.interval = interval
+        self.summary_interval = summary_interval
+        self.logger = logger
+
+        self.samples: list[Sample] = []
+        self.sample_duration = 0.0
+        # pid -> (wall time, cpu time) of the previous sample
+        self._previous: dict[int, tuple[float, float]] = {}
+        self._server: asyncio.Server | None = None
+        self._task: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        """开始采样
+
+        异常:
+            OSError: 无法监听指标服务端口
+        """
+        if self.port is not None:
+            self._server = await asyncio.start_server(
+                self._handle, self.host, self.port
+            )
+            if self.logger:
+                self.logger.info(
+                    _("Serving metrics on http://{host}:{port}/metrics").format(
+                        host=self.host, port=self.port
+                    )
+                )
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+
+    async def _run(self) -> None:
+        last_summary = time.monotonic()
+        while True:
+            self.sample()
+            if time.monotonic() - last_summary >= self.summary_interval:
+                last_summary = time.monotonic()
+                if self.logger:
+                    self.logger.info(self.summary())
+            await asyncio.sleep(self.interval)
+
+    def sample(self) -> list[Sample]:
+        """采样所有工作进程"""
+        started = time.perf_counter()
+        samples: list[Sample] = []
+        previous, self._previous = self._previous, {}
+        for worker in self.workers():
+            process = worker.process
+            stats = None
+            if process is not None and process.returncode is None:
+                stats = read_process_stats(process.pid)
+            sample = Sample(worker, stats)
+            if process is not None and stats is not None:
+                now = time.monotonic()
+                if (last := previous.get(process.pid)) is not None and now > last[0]:
+                    sample.cpu_percent = (
+                        (stats.cpu_time - last[1]) / (now - last[0]) * 100
+                    )
+                self._previous[process.pid] = (now, stats.cpu_time)
+            samples.append(sample)
+        self.samples = samples
+        self.sample_duration = time.perf_counter() - started
+        return samples
+
+    def summary(self) -> str:
+        """一行内的采样摘要"""
+        running = [s.stats for s in self.samples if s.stats is not None]
+        return _(
+            "Metrics: {running}/{total} running, RSS {rss}, CPU {cpu:.1f}%, "
+            "{fds} fds, {threads} threads, {restarts} restarts"
+        ).format(
+            running=len(running),
+            total=len(self.samples),
+            rss=format_bytes(sum(s.rss for s in running)),
+            cpu=sum(s.cpu_percent for s in self.samples),
+            fds=sum(s.open_fds for s in running),
+            threads=sum(s.threads for s in running),
+            restarts=sum(s.worker.restarts for s in self.samples),
+        )
+
+    def render(self) -> str:
+        """以 Prometheus 文本格式输出最近一次采样的结果"""
+        values: dict[str, list[tuple[str, float]]] = {
+            metric[0]: [] for metric in METRICS
+        }
+        for sample in self.samples:
+            worker, stats = sample.worker, sample.stats
+            labels = f'{{worker="{worker.index}"}}'
+            if stats is not None:
+                values["kirami_process_resident_memory_bytes"].append(
+                    (labels, stats.rss)
+                )
+                values["kirami_process_cpu_seconds_total"].append(
+                    (labels, stats.cpu_time)
+                )
+                values["kirami_process_open_fds"].append((labels, stats.open_fds))
+                values["kirami_process_threads"].append((labels, stats.threads))
+            values["kirami_worker_up"].append((labels, int(stats is not None)))
+            values["kirami_worker_restarts_total"].append((labels, worker.restarts))
+            if worker.last_restart_duration is not None:
+                values["kirami_worker_last_restart_duration_seconds"].append(
+                    (labels, worker.last_restart_duration)
+                )
+
+        lines: list[str] = []
+        for name, type_, help_ in METRICS:
+            lines.append(f"# HELP {name} {help_}")
+            lines.append(f"# TYPE {name} {type_}")
+            lines.extend(f"{name}{labels} {value}" for labels, value in values[name])
+        lines.append("# HELP kirami_metrics_sample_duration_seconds Time of a sample.")
+        lines.append("# TYPE kirami_metrics_sample_duration_seconds gauge")
+        lines.append(f"kirami_metrics_sample_duration_seconds {self.sample_duration}")
+        return "\n".join(lines) + "\n"
+
+    async def _handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            request = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), 5.0)
+            path = request.split(b" ", 2)[1].partition(b"?")[0]
+        except (
+            asyncio.IncompleteReadError,
+            asyncio.LimitOverrunError,
+            asyncio.TimeoutError,
+            IndexError,
+        ):
+            writer.close()
+            return
+
+        if path in (b"/", b"/metrics"):
+            status, body = "200 OK", self.render().encode()
+        else:
+            status, body = "404 Not Found", b"Not Found\n"
+        writer.write(
+            (
+                f"HTTP/1.1 {status}\r\n"
+                "Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                "Connection: close\r\n\r\n"
+            ).encode()
+            + body
+        )
+        with contextlib.suppress(ConnectionError):
+            await writer.drain()
+        writer.close()
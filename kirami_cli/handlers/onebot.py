@@ -0,0 +1,437 @@
+import asyncio
+import contextlib
+import hashlib
+import hmac
+import json
+import random
+import time
+from collections import Counter, deque
+from collections.abc import Iterable, Iterator, Sequence
+from dataclasses import dataclass, field
+from typing import Any
+
+import httpx
+
+from .websocket import WebSocketClient
+
+DEFAULT_SELF_ID = 10000
+# ids of the synthetic users and groups, one for each event
+USER_ID_BASE = 200000000
+GROUP_ID_BASE = 100000000
+
+
+@dataclass
+class LoadResult:
+    """一次压测的结果, 时间单位为秒
+
+    参数:
+        sent: 上报的事件数
+        failed: 上报失败的事件数
+        duration: 上报事件所用的时间
+        reply_duration: 从开始上报到最后一次回复的时间
+        latencies: 得到回复的事件从计划上报到 bot 调用 API 回复的时间
+        api_calls: bot 调用各 API 的次数
+    """
+
+    sent: int = 0
+    failed: int = 0
+    duration: float = 0.0
+    reply_duration: float = 0.0
+    latencies: list[float] = field(default_factory=list)
+    api_calls: Counter[str] = field(default_factory=Counter)
+
+    @property
+    def events_per_second(self) -> float:
+        return self.sent / self.duration if self.duration else 0.0
+
+    @property
+    def replies_per_second(self) -> float:
+        if not self.reply_duration:
+            return 0.0
+        return len(self.latencies) / self.reply_duration
+
+    def percentile(self, percent: float) -> float | None:
+        """回复延迟的百分位数, 没有回复时为 `None`"""
+        if not self.latencies:
+            return None
+        latencies = sorted(self.latencies)
+        index = max(round(percent / 100 * len(latencies)) - 1, 0)
+        return latencies[min(index, len(latencies) - 1)]
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "sent": self.sent,
+            "failed": self.failed,
+            "replied": len(self.latencies),
+            "duration": self.duration,
+            "events_per_second": self.events_per_second,
+            "replies_per_second": self.replies_per_second,
+            "latency": {
+                f"p{percent}": self.percentile(percent) for percent in (50, 90, 99)
+            }
+            | {"max": max(self.latencies, default=None)},
+            "api_calls": dict(self.api_calls.most_common()),
+        }
+
+
+class OneBotStandIn:
+    """模拟 OneBot V11 协议端, 向 bot 上报事件并响应 bot 的 API 调用
+
+    事件通过反向 WebSocket 或 HTTP POST 上报. HTTP POST 时 bot 通过
+    `onebot_api_roots` 调用 API, 由 `start_api_server` 启动的服务响应.
+
+    等待回复的事件记录其会话, bot 首次向该会话调用 API 时视为回复了该事件,
+    同一会话的多个事件按先后顺序对应.
+
+    参数:
+        self_id: 模拟的机器人账号
+        access_token: 连接 bot 使用的访问令牌
+        secret: HTTP POST 上报的签名密钥
+    """
+
+    def __init__(
+        self,
+        *,
+        self_id: int = DEFAULT_SELF_ID,
+        access_token: str | None = None,
+        secret: str | None = None,
+    ) -> None:
+        self.self_id = self_id
+        self.access_token = access_token
+        self.secret = secret
+
+        self.result = LoadResult()
+        self.last_reply = 0.0
+        self._pending: dict[int, deque[float]] = {}
+        self._message_id = 0
+        self._websocket: WebSocketClient | None = None
+        self._receiving: asyncio.Task | None = None
+        self._client: httpx.AsyncClient | None = None
+        self._post_url: str | None = None
+        self._server: asyncio.Server | None = None
+
+    @property
+    def pending(self) -> int:
+        """尚未得到回复的事件数"""
+        return sum(len(times) for times in self._pending.values())
+
+    def _headers(self) -> dict[str, str]:
+        headers = {"X-Self-ID": str(self.self_id), "X-Client-Role": "Universal"}
+        if self.access_token:
+            headers["Authorization"] = f"Bearer {self.access_token}"
+        return headers
+
+    async def connect(self, url: str) -> None:
+        """作为反向 WebSocket 客户端连接到 bot
+
+        异常:
+            OSError: 无法连接
+            ConnectionError: bot 拒绝了连接
+            asyncio.TimeoutError: 连接超时
+        """
+        self._websocket = await WebSocketClient.connect(url, self._headers())
+        self._receiving = asyncio.create_task(self._receive(self._websocket))
+        await self._websocket.send(
+            json.dumps(
+                {
+                    "time": int(time.time()),
+                    "self_id": self.self_id,
+                    "post_type": "meta_event",
+                    "meta_event_type": "lifecycle",
+                    "sub_type": "connect",
+                }
+            )
+        )
+
+    async def start_api_server(
+        self, post_url: str, host: str = "127.0.0.1", port: int = 0
+    ) -> int:
+        """启动响应 API 调用的 HTTP 服务, 之后的事件通过 HTTP POST 上报
+
+        返回:
+            服务监听的端口
+
+        异常:
+            OSError: 无法监听端口
+        """
+        self._server = await asyncio.start_server(self._handle_http, host, port)
+        self._post_url = post_url
+        self._client = httpx.AsyncClient(headers=self._headers(), timeout=30.0)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def close(self) -> None:
+        if self._websocket is not None:
+            await self._websocket.close()
+            self._websocket = None
+        if self._receiving is not None:
+            self._receiving.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._receiving
+            self._receiving = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+
+    def expect_reply(self, event: dict[str, Any], sent: float) -> None:
+        """记录等待回复的事件
+
+        参数:
+            event: 上报的事件
+            sent: 计算延迟的起点, 为 `time.perf_counter` 的值
+        """
+        if (session := get_session(event)) is not None:
+            self._pending.setdefault(session, deque()).append(sent)
+
+    async def send_event(self, event: dict[str, Any]) -> None:
+        """上报事件
+
+        异常:
+            ConnectionError: 与 bot 的连接已断开
+            httpx.HTTPError: HTTP POST 上报失败
+        """
+        data = json.dumps(event)
+        if self._websocket is not None:
+            await self._websocket.send(data)
+            return
+        if self._client is None or self._post_url is None:
+            raise ConnectionError("not connected to the bot")
+
+        headers = {"Content-Type": "application/json"}
+        if self.secret:
+            signature = hmac.new(self.secret.encode(), data.encode(), hashlib.sha1)
+            headers["X-Signature"] = f"sha1={signature.hexdigest()}"
+        response = await self._client.post(
+            self._post_url, content=data, headers=headers
+        )
+        response.raise_for_status()
+
+    def call_api(self, action: str, params: dict[str, Any]) -> dict[str, Any]:
+        """响应 bot 的 API 调用, 返回 OneBot 格式的响应"""
+        self.result.api_calls[action] += 1
+        session = get_session(params)
+        if session is not None and (times := self._pending.get(session)):
+            self.last_reply = time.perf_counter()
+            self.result.latencies.append(self.last_reply - times.popleft())
+            if not times:
+                del self._pending[session]
+
+        data: Any = None
+        if action.startswith("send_") and action.endswith("_msg"):
+            self._message_id += 1
+            data = {"message_id": self._message_id}
+        elif action == "get_login_info":
+            data = {"user_id": self.self_id, "nickname": "kirami-bench"}
+        elif action == "get_status":
+            data = {"online": True, "good": True}
+        return {"status": "ok", "retcode": 0, "data": data}
+
+    async def _receive(self, websocket: WebSocketClient) -> None:
+        while (text := await websocket.recv()) is not None:
+            with contextlib.suppress(ValueError):
+                message = json.loads(text)
+                if isinstance(message, dict) and "action" in message:
+                    response = self.call_api(
+                        message["action"], message.get("params") or {}
+                    )
+                    if "echo" in message:
+                        response["echo"] = message["echo"]
+                    with contextlib.suppress(ConnectionError):
+                        await websocket.send(json.dumps(response))
+
+    async def _handle_http(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            # keep-alive, the bot reuses the connection for its api calls
+            while request := await reader.readuntil(b"\r\n\r\n"):
+                request_line, *lines = request.decode("latin-1").split("\r\n")
+                path = request_line.split(" ", 2)[1].partition("?")[0]
+                headers = {
+                    name.strip().lower(): value.strip()
+                    for name, _sep, value in (line.partition(":") for line in lines)
+                }
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                response = self.call_api(
+                    path.rstrip("/").rpartition("/")[2], json.loads(body or b"{}")
+                )
+                data = json.dumps(response).encode()
+                writer.write(
+                    (
+                        "HTTP/1.1 200 OK\r\n"
+                        "Content-Type: application/json\r\n"
+                        f"Content-Length: {len(data)}\r\n\r\n"
+                    ).encode()
+                    + data
+                )
+                await writer.drain()
+        except (
+            asyncio.IncompleteReadError,
+            asyncio.LimitOverrunError,
+            ConnectionError,
+            IndexError,
+            ValueError,
+        ):
+            pass
+        finally:
+            writer.close()
+
+
+def get_session(data: dict[str, Any]) -> int | None:
+    """事件或 API 调用参数所属的会话, 即群号或用户账号"""
+    target = data.get("group_id") or data.get("user_id")
+    try:
+        return None if target is None else int(target)
+    except (TypeError, ValueError):
+        return None
+
+
+def make_event(
+    seq: int,
+    self_id: int,
+    *,
+    message: str | None = None,
+    group: bool = False,
+) -> dict[str, Any]:
+    """生成一个合成事件, 每个事件使用不同的用户和群
+
+    参数:
+        seq: 事件序号
+        self_id: 机器人账号
+        message: 消息内容, 为 `None` 时生成戳一戳通知
+        group: 是否为群事件
+    """
+    user_id = USER_ID_BASE + seq
+    event: dict[str, Any] = {
+        "time": int(time.time()),
+        "self_id": self_id,
+        "user_id": user_id,
+    }
+    if group:
+        event["group_id"] = GROUP_ID_BASE + seq
+    if message is None:
+        return event | {
+            "post_type": "notice",
+            "notice_type": "notify",
+            "sub_type": "poke",
+            "target_id": self_id,
+        }
+
+    sender = {"user_id": user_id, "nickname": f"user{seq}", "sex": "unknown", "age": 0}
+    return event | {
+        "post_type": "message",
+        "message_type": "group" if group else "private",
+        "sub_type": "normal" if group else "friend",
+        "message_id": seq + 1,
+        "message": [{"type": "text", "data": {"text": message}}],
+        "raw_message": message,
+        "font": 0,
+        "sender": (sender | {"role": "member"}) if group else sender,
+    }
+
+
+async def feed_events(
+    stand_in: OneBotStandIn,
+    events: Iterable[tuple[float, dict[str, Any], bool]],
+    *,
+    grace: float = 5.0,
+) -> LoadResult:
+    """按计划的时间向 bot 上报事件, 并等待 bot 回复
+
+    事件按计划的时间上报而不等待回复, 延迟从计划上报的时间算起,
+    因此 bot 处理不过来时积压的时间也计入延迟.
+
+    参数:
+        stand_in: 已连接到 bot 的协议端替身
+        events: 事件, 相对开始的上报时间以及是否等待回复, 按时间排列
+        grace: 上报结束后等待回复的最长时间
+    """
+    result = stand_in.result
+    sending: set[asyncio.Task] = set()
+
+    async def send(event: dict[str, Any]) -> None:
+        try:
+            await stand_in.send_event(event)
+        except (ConnectionError, httpx.HTTPError):
+            result.failed += 1
+
+    started = time.perf_counter()
+    for offset, event, reply in events:
+        scheduled = started + offset
+        if (delay := scheduled - time.perf_counter()) > 0:
+            await asyncio.sleep(delay)
+        if reply:
+            stand_in.expect_reply(event, scheduled)
+        task = asyncio.create_task(send(event))
+        sending.add(task)
+        task.add_done_callback(sending.discard)
+        result.sent += 1
+    if sending:
+        await asyncio.wait(sending)
+    result.duration = time.perf_counter() - started
+
+    deadline = time.perf_counter() + grace
+    while stand_in.pending and time.perf_counter() < deadline:
+        await asyncio.sleep(0.05)
+    result.reply_duration = max(stand_in.last_reply - started, 0.0)
+    return result
+
+
+async def generate_load(
+    stand_in: OneBotStandIn,
+    *,
+    rate: float,
+    duration: float,
+    messages: Sequence[str],
+    group_ratio: float = 0.5,
+    notice_ratio: float = 0.0,
+    grace: float = 5.0,
+) -> LoadResult:
+    """以固定速率向 bot 上报合成事件, 并等待 bot 回复
+
+    参数:
+        stand_in: 已连接到 bot 的协议端替身
+        rate: 每秒上报的事件数
+        duration: 上报事件的时长
+        messages: 依次使用的消息内容
+        group_ratio: 群事件的比例
+        notice_ratio: 通知事件的比例
+        grace: 上报结束后等待回复的最长时间
+    """
+    choices = random.Random(0)
+
+    def events() -> Iterator[tuple[float, dict[str, Any], bool]]:
+        for seq in range(max(int(rate * duration), 1)):
+            notice = choices.random() < notice_ratio
+            event = make_event(
+                seq,
+                stand_in.self_id,
+                message=None if notice else messages[seq % len(messages)],
+                group=choices.random() < group_ratio,
+            )
+            yield seq / rate, event, True
+
+    return await feed_events(stand_in, events(), grace=grace)
+
+
+def compare_results(
+    old: dict[str, Any], new: dict[str, Any]
+) -> list[tuple[str, float | None, float | None]]:
+    """比较两次压测 `LoadResult.to_dict` 的结果, 返回 `(指标, 旧值, 新值)`"""
+    metrics = [
+        (name, old.get(name), new.get(name))
+        for name in (
+            "sent",
+            "failed",
+            "replied",
+            "events_per_second",
+            "replies_per_second",
+        )
+    ]
+    metrics.extend(
+        (f"latency_{name}", old.get("latency", {}).get(name), value)
+        for name, value in new.get("latency", {}).items()
+    )
+    return metrics
@@ -1,4 +1,5 @@
 import asyncio
+from pathlib import Path
 from typing import IO, Any
 
 from .process import create_process
@@ -36,6 +37,7 @@ async def call_pip_install(
     pip_args: list[str] | None = None,
     *,
     python_path: str | None = None,
+    wheelhouse: Path | None = None,
     stdin: IO[Any] | int | None = None,
     stdout: IO[Any] | int | None = None,
     stderr: IO[Any] | int | None = None,
@@ -44,6 +46,8 @@ async def call_pip_install(
         package = [package]
     if pip_args is None:
         pip_args = []
+    if wheelhouse is not None:
+        pip_args = ["--no-index", "--find-links", str(wheelhouse), *pip_args]
 
     return await call_pip(
         ["install", *package, *pip_args],
@@ -102,6 +106,31 @@ async def call_pip_uninstall(
     )
 
 
+@requires_pip
+async def call_pip_wheel(
+    package: str | list[str],
+    wheel_dir: Path,
+    pip_args: list[str] | None = None,
+    *,
+    python_path: str | None = None,
+    stdin: IO[Any] | int | None = None,
+    stdout: IO[Any] | int | None = None,
+    stderr: IO[Any] | int | None = None,
+) -> asyncio.subprocess.Process:
+    if isinstance(package, str):
+        package = [package]
+    if pip_args is None:
+        pip_args = []
+
+    return await call_pip(
+        ["wheel", "--wheel-dir", str(wheel_dir), *package, *pip_args],
+        python_path=python_path,
+        stdin=stdin,
+        stdout=stdout,
+        stderr=stderr,
+    )
+
+
 @requires_pip
 async def call_pip_list(
     pip_args: list[str] | None = None,
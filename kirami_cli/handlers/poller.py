@@ -0,0 +1,159 @@
+import asyncio
+import os
+import stat
+from collections.abc import Callable
+from pathlib import Path
+
+from anyio import to_thread
+from watchfiles import Change
+
+from .watch import ALWAYS_IGNORED
+
+
+class PollingWatcher:
+    """基于轮询的文件监视器, 用于收不到文件系统事件的网络或容器挂载目录
+
+    用法与 `watchfiles.awatch` 相同. 每轮轮询被拆分为若干片分散在整个间隔内,
+    目录只有在修改时间变化时才会重新列出, 文件仅检查通过过滤器的部分.
+
+    参数:
+        paths: 需要监视的目录
+        watch_filter: 事件过滤器
+        stop_event: 停止监视的事件
+        recursive: 是否监视子目录
+        interval: 轮询间隔
+        slices: 每轮轮询拆分的片数
+    """
+
+    def __init__(
+        self,
+        *paths: Path | str,
+        watch_filter: Callable[[Change, str], bool] | None = None,
+        stop_event: asyncio.Event | None = None,
+        recursive: bool = True,
+        interval: float = 1.0,
+        slices: int = 10,
+    ) -> None:
+        self.paths = [os.fspath(p) for p in paths]
+        self.watch_filter = watch_filter
+        self.stop_event = stop_event or asyncio.Event()
+        self.recursive = recursive
+        self.interval = interval
+        self.slices = max(slices, 1)
+
+        # directory -> (mtime, entry names)
+        self._dirs: dict[str, tuple[int, set[str]]] = {}
+        # file -> (mtime, size)
+        self._files: dict[str, tuple[int, int]] = {}
+        self._started = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> set[tuple[Change, str]]:
+        if not self._started:
+            await to_thread.run_sync(self._initial_scan)
+            self._started = True
+
+        changes: set[tuple[Change, str]] = set()
+        for index in range(self.slices):
+            if self.stop_event.is_set():
+                raise StopAsyncIteration
+            changes |= await to_thread.run_sync(self._scan_slice, index)
+            try:
+                await asyncio.wait_for(
+                    self.stop_event.wait(), self.interval / self.slices
+                )
+            except asyncio.TimeoutError:
+                pass
+        # an empty set is yielded like `awatch(..., yield_on_timeout=True)`
+        return changes
+
+    def _accept(self, change: Change, path: str) -> bool:
+        return self.watch_filter is None or self.watch_filter(change, path)
+
+    def _initial_scan(self) -> None:
+        for path in self.paths:
+            self._scan_dir(path, set(), initial=True)
+
+    def _scan_slice(self, index: int) -> set[tuple[Change, str]]:
+        changes: set[tuple[Change, str]] = set()
+
+        for directory in list(self._dirs)[index :: self.slices]:
+            if directory not in self._dirs:
+                # removed together with its parent earlier in this slice
+                continue
+            try:
+                mtime = os.stat(directory).st_mtime_ns
+            except OSError:
+                self._remove_dir(directory, changes)
+                continue
+            if mtime != self._dirs[directory][0]:
+                self._scan_dir(directory, changes)
+
+        for file in list(self._files)[index :: self.slices]:
+            if file not in self._files:
+                continue
+            try:
+                st = os.stat(file)
+            except OSError:
+                del self._files[file]
+                changes.add((Change.deleted, file))
+                continue
+            if (st.st_mtime_ns, st.st_size) != self._files[file]:
+                self._files[file] = (st.st_mtime_ns, st.st_size)
+                changes.add((Change.modified, file))
+
+        return changes
+
+    def _scan_dir(
+        self,
+        directory: str,
+        changes: set[tuple[Change, str]],
+        *,
+        initial: bool = False,
+    ) -> None:
+        try:
+            mtime = os.stat(directory).st_mtime_ns
+            entries = list(os.scandir(directory))
+        except OSError:
+            return
+
+        previous = self._dirs.get(directory, (0, set()))[1]
+        names = {entry.name for entry in entries}
+        self._dirs[directory] = (mtime, names)
+
+        for entry in entries:
+            if entry.name in previous:
+                continue
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+                st = entry.stat()
+            except OSError:
+                continue
+            if is_dir:
+                if entry.name in ALWAYS_IGNORED:
+                    continue
+                if not initial and self._accept(Change.added, entry.path):
+                    changes.add((Change.added, entry.path))
+                if self.recursive:
+                    self._scan_dir(entry.path, changes, initial=initial)
+            elif stat.S_ISREG(st.st_mode) and self._accept(Change.added, entry.path):
+                self._files[entry.path] = (st.st_mtime_ns, st.st_size)
+                if not initial:
+                    changes.add((Change.added, entry.path))
+
+        for name in previous - names:
+            path = os.path.join(directory, name)
+            if path in self._dirs:
+                self._remove_dir(path, changes)
+            elif self._files.pop(path, None) is not None:
+                changes.add((Change.deleted, path))
+
+    def _remove_dir(self, directory: str, changes: set[tuple[Change, str]]) -> None:
+        prefix = directory + os.sep
+        for path in [d for d in self._dirs if d == directory or d.startswith(prefix)]:
+            del self._dirs[path]
+        for path in [f for f in self._files if f.startswith(prefix)]:
+            del self._files[path]
+            changes.add((Change.deleted, path))
@@ -0,0 +1,185 @@
+import asyncio
+import contextlib
+import logging
+import os
+import signal
+import sys
+from collections.abc import Callable, Coroutine
+from typing import Any
+
+from kirami_cli import _
+
+from .agent import AgentConnection, AgentServer
+from .logfile import LogFile
+from .process import ProcessLike
+from .supervisor import pipe_output
+
+FORK_FDS_ENV = "KIRAMI_FORK_FDS"
+
+
+class ForkedProcess:
+    """由预加载进程派生的工作进程
+
+    工作进程不是 CLI 的子进程, 退出状态由预加载进程通过代理转告.
+    """
+
+    stdout = None
+    stderr = None
+
+    def __init__(self, connection: AgentConnection, pid: int) -> None:
+        self.connection = connection
+        self.pid = pid
+        self.returncode: int | None = None
+
+    async def wait(self) -> int:
+        if self.returncode is None:
+            try:
+                reply = await self.connection.request("wait", pid=self.pid)
+                self.returncode = reply["returncode"]
+            except ConnectionError:
+                # the preload process is gone, and its workers with it
+                self.returncode = -signal.SIGKILL
+        assert self.returncode is not None
+        return self.returncode
+
+    def send_signal(self, sig: int) -> None:
+        if self.returncode is None:
+            with contextlib.suppress(ProcessLookupError):
+                os.kill(self.pid, sig)
+
+    def terminate(self) -> None:
+        self.send_signal(signal.SIGTERM)
+
+    def kill(self) -> None:
+        self.send_signal(signal.SIGKILL)
+
+
+class PreloadServer:
+    """预先导入 bot 与插件, 并从中派生工作进程的进程
+
+    导入完成后预加载进程调用 `gc.freeze()` 再派生工作进程, 导入时创建的对象
+    以写时复制的方式在工作进程间共享. 每个工作进程的输出使用各自的管道,
+    工作进程重启后继续使用同一组管道.
+
+    参数:
+        startup_func: 启动预加载进程
+        shutdown_func: 关闭预加载进程
+        agent: 代理服务
+        workers: 工作进程数量
+        ready_timeout: 等待导入完成的超时时间
+        log_file: 同时写入工作进程输出的日志文件
+    """
+
+    def __init__(
+        self,
+        startup_func: Callable[..., Coroutine[Any, Any, ProcessLike]],
+        shutdown_func: Callable[[ProcessLike], Coroutine[Any, Any, None]],
+        *,
+        agent: AgentServer,
+        workers: int,
+        ready_timeout: float = 60.0,
+        log_file: LogFile | None = None,
+        logger: logging.Logger | None = None,
+    ) -> None:
+        self.startup_func = startup_func
+        self.shutdown_func = shutdown_func
+        self.agent = agent
+        self.workers = workers
+        self.ready_timeout = ready_timeout
+        self.log_file = log_file
+        self.logger = logger
+
+        self.process: ProcessLike | None = None
+        self.connection: AgentConnection | None = None
+        self._pipes: set[asyncio.Task] = set()
+
+    async def start(self) -> None:
+        """启动预加载进程并等待导入完成
+
+        异常:
+            RuntimeError: 预加载进程启动失败
+        """
+        pipes = [os.pipe() for _index in range(self.workers * 2)]
+        try:
+            self.process = await self.startup_func(
+                fork_fds=[write for _read, write in pipes]
+            )
+        finally:
+            # the preload process and the workers hold the write ends
+            for _read, write in pipes:
+                os.close(write)
+
+        loop = asyncio.get_running_loop()
+        for index, (read, _write) in enumerate(pipes):
+            reader = asyncio.StreamReader()
+            await loop.connect_read_pipe(
+                lambda reader=reader: asyncio.StreamReaderProtocol(reader),
+                os.fdopen(read, "rb", buffering=0),
+            )
+            output = sys.stdout if index % 2 == 0 else sys.stderr
+            prefix = f"[worker {index // 2 + 1}] ".encode()
+            task = asyncio.create_task(
+                pipe_output(reader, output, prefix, log_file=self.log_file)
+            )
+            self._pipes.add(task)
+            task.add_done_callback(self._pipes.discard)
+
+        exited = asyncio.ensure_future(self.process.wait())
+        preloaded = asyncio.ensure_future(self._wait_preloaded(self.process.pid))
+        try:
+            await asyncio.wait(
+                (exited, preloaded),
+                timeout=self.ready_timeout,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+        finally:
+            exited.cancel()
+            preloaded.cancel()
+        if not preloaded.done() or preloaded.cancelled():
+            raise RuntimeError(_("Preload process failed to import the bot."))
+        self.connection = preloaded.result()
+
+        if self.logger:
+            self.logger.info(
+                _("Preloaded the bot in process [{pid}].").format(pid=self.process.pid)
+            )
+
+    async def _wait_preloaded(self, pid: int) -> AgentConnection:
+        connection = await self.agent.wait_for(pid)
+        await connection.wait_event("preloaded")
+        return connection
+
+    async def fork(
+        self, index: int, *, env: dict[str, str] | None = None, **kwargs: Any
+    ) -> ForkedProcess:
+        """派生序号为 `index` 的工作进程, 其余参数被忽略
+
+        参数:
+            index: 工作进程序号, 决定使用的输出管道
+            env: 工作进程额外的环境变量
+        """
+        if self.connection is None:
+            raise RuntimeError("Preload process is not started")
+        reply = await self.connection.request("fork", index=index, env=env or {})
+        if "error" in reply:
+            raise RuntimeError(reply["error"])
+        return ForkedProcess(self.connection, reply["pid"])
+
+    @property
+    def returncode(self) -> int | None:
+        return self.process.returncode if self.process is not None else None
+
+    async def wait_closed(self) -> None:
+        """等待预加载进程退出"""
+        if self.process is not None:
+            await self.process.wait()
+
+    async def close(self) -> None:
+        if self.process is not None:
+            if self.process.returncode is None:
+                await self.shutdown_func(self.process)
+            self.agent.discard(self.process.pid)
+        if self._pipes:
+            _done, pending = await asyncio.wait(self._pipes, timeout=1.0)
+            for task in pending:
+                task.cancel()
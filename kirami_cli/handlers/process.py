@@ -1,14 +1,19 @@
 import os
+import time
 import signal
 import asyncio
+import logging
+import weakref
 import subprocess
 from pathlib import Path
 from functools import wraps
-from contextlib import nullcontext
+from dataclasses import dataclass
+from contextlib import suppress, nullcontext
 from typing_extensions import ParamSpec
-from typing import IO, Any, Union
-from collections.abc import Callable, Coroutine
+from typing import IO, Any, Union, Protocol
+from collections.abc import Callable, Coroutine, Sequence
 
+from kirami_cli import _
 from kirami_cli.consts import WINDOWS
 
 from .signal import shield_signals, remove_signal_handler, register_signal_handler
@@ -16,6 +21,61 @@ from .signal import shield_signals, remove_signal_handler, register_signal_handl
 P = ParamSpec("P")
 
 
+@dataclass
+class ShutdownPolicy:
+    """终止子进程的流程
+
+    先发送 SIGTERM (Windows 上为 CTRL_BREAK_EVENT) 等待进程自行退出, 超时后发送
+    SIGKILL, 最后结束进程组中残留的进程, 如 bot 启动的子进程.
+
+    参数:
+        grace_timeout: 等待进程自行退出的时间
+        kill_timeout: 发送 SIGKILL 后等待进程退出的时间
+        logger: 记录各阶段耗时的日志记录器
+    """
+
+    grace_timeout: float = 10.0
+    kill_timeout: float = 5.0
+    logger: logging.Logger | None = None
+
+
+shutdown_policy = ShutdownPolicy()
+# terminating a process twice would send a second signal, which makes
+# servers like uvicorn skip their graceful shutdown
+_terminating: "weakref.WeakKeyDictionary[Any, asyncio.Future[None]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+class ProcessLike(Protocol):
+    """可以终止与等待的进程, 如 `asyncio.subprocess.Process`"""
+
+    @property
+    def pid(self) -> int:
+        ...
+
+    @property
+    def returncode(self) -> int | None:
+        ...
+
+    @property
+    def stdout(self) -> asyncio.StreamReader | None:
+        ...
+
+    @property
+    def stderr(self) -> asyncio.StreamReader | None:
+        ...
+
+    def terminate(self) -> None:
+        ...
+
+    def kill(self) -> None:
+        ...
+
+    async def wait(self) -> int:
+        ...
+
+
 def ensure_process_terminated(
     func: Callable[P, Coroutine[Any, Any, asyncio.subprocess.Process]]
 ) -> Callable[P, Coroutine[Any, Any, asyncio.subprocess.Process]]:
@@ -58,17 +118,29 @@ def ensure_process_terminated(
 async def create_process(
     *args: Union[str, bytes, "os.PathLike[str]", "os.PathLike[bytes]"],
     cwd: Path | None = None,
+    env: dict[str, str] | None = None,
+    pass_fds: Sequence[int] = (),
+    new_session: bool = False,
     stdin: IO[Any] | int | None = None,
     stdout: IO[Any] | int | None = None,
     stderr: IO[Any] | int | None = None,
 ) -> asyncio.subprocess.Process:
+    """启动子进程
+
+    参数:
+        new_session: 是否在新的会话中启动进程 (仅 POSIX). 终端的信号只会发送给
+            CLI, 由 CLI 终止整个进程组, 进程也就无法再从终端读取输入.
+    """
     return await asyncio.create_subprocess_exec(
         *args,
         cwd=cwd,
+        env={**os.environ, **env} if env is not None else None,
+        pass_fds=pass_fds,
         stdin=stdin,
         stdout=stdout,
         stderr=stderr,
         creationflags=subprocess.CREATE_NEW_PROCESS_GROUP if WINDOWS else 0,
+        start_new_session=new_session and not WINDOWS,
     )
 
 
@@ -90,16 +162,74 @@ async def create_process_shell(
     )
 
 
-async def terminate_process(process: asyncio.subprocess.Process) -> None:
-    if process.returncode is not None:
-        return
-
-    context = shield_signals() if WINDOWS else nullcontext()
-
-    with context:
-        if WINDOWS:
-            os.kill(process.pid, signal.CTRL_BREAK_EVENT)
-        else:
-            process.terminate()
-
-        await process.wait()
+async def terminate_process(process: ProcessLike) -> None:
+    """按 `shutdown_policy` 终止进程, 同时终止同一进程时共用一个流程"""
+    if (future := _terminating.get(process)) is None:
+        future = asyncio.ensure_future(_terminate_process(process, shutdown_policy))
+        _terminating[process] = future
+    await asyncio.shield(future)
+
+
+async def _wait_process(process: ProcessLike, timeout: float) -> bool:
+    # `wait` also waits for the output pipes to close, which processes started
+    # by the child may keep open, only the exit of the process itself counts
+    waiter = asyncio.ensure_future(process.wait())
+    deadline = time.perf_counter() + timeout
+    try:
+        while process.returncode is None and not waiter.done():
+            if time.perf_counter() >= deadline:
+                return False
+            await asyncio.sleep(0.05)
+    finally:
+        waiter.cancel()
+    return True
+
+
+async def _terminate_process(process: ProcessLike, policy: ShutdownPolicy) -> None:
+    logger = policy.logger
+    phases: list[str] = []
+
+    if process.returncode is None:
+        context = shield_signals() if WINDOWS else nullcontext()
+        with context:
+            started = time.perf_counter()
+            with suppress(ProcessLookupError):
+                if WINDOWS:
+                    os.kill(process.pid, signal.CTRL_BREAK_EVENT)
+                else:
+                    process.terminate()
+            exited = await _wait_process(process, policy.grace_timeout)
+            phases.append(f"SIGTERM {time.perf_counter() - started:.2f}s")
+
+            if not exited:
+                if logger:
+                    logger.warning(
+                        _(
+                            "Process [{pid}] did not exit within {timeout}s, "
+                            "killing it..."
+                        ).format(pid=process.pid, timeout=policy.grace_timeout)
+                    )
+                started = time.perf_counter()
+                with suppress(ProcessLookupError):
+                    process.kill()
+                await _wait_process(process, policy.kill_timeout)
+                phases.append(f"SIGKILL {time.perf_counter() - started:.2f}s")
+
+    if not WINDOWS and process.returncode != 0:
+        # processes started in a new session lead their own group, the group
+        # outlives the process as long as anything it started is still
+        # running. a process that exited cleanly has cleaned up after itself
+        started = time.perf_counter()
+        with suppress(ProcessLookupError, PermissionError):
+            os.killpg(process.pid, signal.SIGKILL)
+            phases.append(f"process group {time.perf_counter() - started:.2f}s")
+
+    with suppress(asyncio.TimeoutError):
+        await asyncio.wait_for(process.wait(), policy.kill_timeout)
+
+    if logger and phases:
+        logger.info(
+            _("Stopped process [{pid}] ({phases}).").format(
+                pid=process.pid, phases=", ".join(phases)
+            )
+        )
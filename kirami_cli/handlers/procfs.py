@@ -0,0 +1,92 @@
+import os
+from dataclasses import dataclass
+from pathlib import Path
+
+PROC_ROOT = Path("/proc")
+
+
+@dataclass
+class MemoryUsage:
+    """进程的内存占用, 单位为字节
+
+    参数:
+        rss: 常驻内存, 包括与其他进程共享的页
+        pss: 按共享进程数均摊共享页后的内存
+        uss: 进程独占的内存, 即进程退出后能释放的内存
+    """
+
+    rss: int
+    pss: int
+    uss: int
+
+
+def read_memory_usage(pid: int) -> MemoryUsage | None:
+    """从 `/proc` 读取进程的内存占用, 进程不存在或系统不支持时返回 `None`"""
+    fields: dict[str, int] = {}
+    # smaps_rollup is much cheaper than summing up smaps, but needs linux 4.14
+    for name in ("smaps_rollup", "smaps"):
+        try:
+            lines = PROC_ROOT.joinpath(str(pid), name).read_text().splitlines()
+        except OSError:
+            continue
+        for line in lines:
+            key, _, value = line.partition(":")
+            if value.endswith(" kB"):
+                fields[key] = fields.get(key, 0) + int(value[:-3]) * 1024
+        break
+    else:
+        return None
+
+    return MemoryUsage(
+        rss=fields.get("Rss", 0),
+        pss=fields.get("Pss", 0),
+        uss=fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0),
+    )
+
+
+@dataclass
+class ProcessStats:
+    """进程的资源占用
+
+    参数:
+        rss: 常驻内存, 单位为字节
+        cpu_time: 用户态与内核态 CPU 时间之和, 单位为秒
+        open_fds: 打开的文件描述符数量
+        threads: 线程数量
+    """
+
+    rss: int
+    cpu_time: float
+    open_fds: int
+    threads: int
+
+
+def read_process_stats(pid: int) -> ProcessStats | None:
+    """从 `/proc` 读取进程的资源占用, 进程不存在或系统不支持时返回 `None`
+
+    只读取 `stat` 与 `fd` 目录, 开销远小于 `read_memory_usage`.
+    """
+    proc = PROC_ROOT / str(pid)
+    try:
+        stat = proc.joinpath("stat").read_bytes()
+        open_fds = len(os.listdir(proc / "fd"))
+    except OSError:
+        return None
+
+    # the command name may contain spaces and parentheses, fields start after it
+    fields = stat[stat.rindex(b")") + 2 :].split()
+    clock_ticks = os.sysconf("SC_CLK_TCK")
+    return ProcessStats(
+        rss=int(fields[21]) * os.sysconf("SC_PAGE_SIZE"),
+        cpu_time=(int(fields[11]) + int(fields[12])) / clock_ticks,
+        open_fds=open_fds,
+        threads=int(fields[17]),
+    )
+
+
+def format_bytes(size: float) -> str:
+    for unit in ("B", "KiB", "MiB"):
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GiB"
@@ -0,0 +1,62 @@
+from collections import Counter
+from pathlib import Path
+from typing import Any
+
+from .agent import AgentConnection
+
+
+async def request_profile(
+    connection: AgentConnection,
+    output: Path,
+    *,
+    duration: float,
+    interval: float = 0.005,
+    cprofile: bool = False,
+) -> dict[str, Any]:
+    """让 bot 进程采样调用栈并写入文件
+
+    调用栈以 flamegraph 工具使用的折叠格式写入 `<output>.folded`,
+    开启 `cprofile` 时另外将事件循环线程的 pstats 写入 `<output>.pstats`.
+
+    参数:
+        connection: 与 bot 进程内代理的连接
+        output: 输出文件路径, 不含扩展名
+        duration: 采样时长
+        interval: 采样间隔
+        cprofile: 是否同时使用 cProfile 记录事件循环线程
+
+    异常:
+        RuntimeError: bot 进程无法完成采样
+        ConnectionError: 与代理的连接已断开
+    """
+    reply = await connection.request(
+        "profile",
+        timeout=duration + 30.0,
+        output=str(output.resolve()),
+        duration=duration,
+        interval=interval,
+        cprofile=cprofile,
+    )
+    if "error" in reply:
+        raise RuntimeError(reply["error"])
+    return reply
+
+
+def summarize_folded(path: Path, top: int = 10) -> list[tuple[str, int, int]]:
+    """统计折叠格式调用栈中最耗时的函数
+
+    返回:
+        `(函数, 自身采样数, 总采样数)`, 按自身采样数降序排列
+    """
+    own: Counter[str] = Counter()
+    total: Counter[str] = Counter()
+    for line in path.read_text(encoding="utf-8").splitlines():
+        stack, _sep, count = line.rpartition(" ")
+        # the first frame is the name of the thread
+        frames = stack.split(";")[1:]
+        if not frames:
+            continue
+        own[frames[-1]] += int(count)
+        for frame in set(frames):
+            total[frame] += int(count)
+    return [(frame, count, total[frame]) for frame, count in own.most_common(top)]
@@ -1,4 +1,6 @@
 import asyncio
+import socket
+from collections.abc import Sequence
 from functools import cache
 from pathlib import Path
 from textwrap import dedent
@@ -6,15 +8,23 @@ from typing import IO, Any
 
 from cookiecutter.main import cookiecutter
 
+from . import templates
+from .agent import AgentServer
+from .listen import LISTEN_FD_ENV, LISTEN_PORT_ENV
+from .memory import TRACEMALLOC_ENV
 from .meta import (
     get_default_python,
+    get_kiramibot_config,
     get_project_root,
     requires_kiramibot,
     requires_project_root,
 )
+from .preload import FORK_FDS_ENV
 from .process import create_process
 
 TEMPLATE_ROOT = Path(__file__).parent.parent / "template" / "project"
+# drivers listening on a port, only one process can serve at a time
+SERVER_DRIVERS = ("~fastapi", "~quart")
 
 
 def create_project(
@@ -22,12 +32,14 @@ def create_project(
     context: dict[str, Any] | None = None,
     output_dir: str | None = None,
     no_input: bool = True,
+    overwrite_if_exists: bool = False,
 ) -> None:
     cookiecutter(
         str(TEMPLATE_ROOT.resolve()) if template is None else template,
         no_input=no_input,
         extra_context=context,
         output_dir=output_dir or ".",
+        overwrite_if_exists=overwrite_if_exists,
     )
 
 
@@ -45,11 +57,42 @@ def generate_run_script() -> str:
     )
 
 
+def get_preload_modules() -> list[str]:
+    """获取备用进程需要预先导入的模块"""
+    config = get_kiramibot_config()
+    drivers = [d for d in config.driver.split("+") if d]
+    return [
+        "kirami",
+        *(d.replace("~", "nonebot.drivers.", 1) for d in drivers),
+        *(a.replace("~", "nonebot.adapters.", 1) for a in config.adapters),
+    ]
+
+
+def uses_server_driver() -> bool:
+    drivers = [
+        d.replace("nonebot.drivers.", "~", 1)
+        for d in get_kiramibot_config().driver.split("+")
+        if d
+    ]
+    # kiramibot defaults to the fastapi driver
+    return not drivers or any(d in SERVER_DRIVERS for d in drivers)
+
+
 @requires_project_root
 @requires_kiramibot
 async def run_project(
     exist_bot: Path = Path("bot.py"),
     *,
+    agent: AgentServer | None = None,
+    module_reload: bool = False,
+    standby: bool = False,
+    listen_socket: socket.socket | None = None,
+    listen_port: int | None = None,
+    fork_fds: Sequence[int] = (),
+    profile_imports: bool = False,
+    trace_memory: int = 0,
+    capture: Path | None = None,
+    env: dict[str, str] | None = None,
     python_path: str | None = None,
     cwd: Path | None = None,
     stdin: IO[Any] | int | None = None,
@@ -61,11 +104,55 @@ async def run_project(
     if cwd is None:
         cwd = get_project_root()
 
+    env = dict(env or {})
+    pass_fds: tuple[int, ...] = ()
+    if listen_socket is not None:
+        env[LISTEN_FD_ENV] = str(listen_socket.fileno())
+        pass_fds = (listen_socket.fileno(),)
+    if listen_port is not None:
+        env[LISTEN_PORT_ENV] = str(listen_port)
+    if fork_fds:
+        # output pipes of the forked workers, two for each worker
+        env[FORK_FDS_ENV] = ",".join(map(str, fork_fds))
+        pass_fds += tuple(fork_fds)
+    if trace_memory:
+        env[TRACEMALLOC_ENV] = str(trace_memory)
+
+    if agent is not None or env or profile_imports or capture is not None:
+        # the bootstrap hooks into nonebot before running the bot
+        t = templates.get_template("project/run_project.py.jinja")
+        script = await t.render_async(
+            agent=agent,
+            listen_fd_env=LISTEN_FD_ENV if listen_socket is not None else None,
+            listen_port_env=LISTEN_PORT_ENV if listen_port is not None else None,
+            fork_fds_env=FORK_FDS_ENV if fork_fds else None,
+            profile_imports=profile_imports,
+            capture=str(capture.resolve()) if capture is not None else None,
+            reload=module_reload,
+            standby=standby,
+            preload=get_preload_modules() if standby else [],
+            exist_bot=str(exist_bot) if cwd.joinpath(exist_bot).exists() else None,
+            run_script=generate_run_script(),
+        )
+        return await create_process(
+            python_path,
+            "-c",
+            script,
+            cwd=cwd,
+            env=env,
+            pass_fds=pass_fds,
+            new_session=True,
+            stdin=stdin,
+            stdout=stdout,
+            stderr=stderr,
+        )
+
     if cwd.joinpath(exist_bot).exists():
         return await create_process(
             python_path,
             exist_bot,
             cwd=cwd,
+            new_session=True,
             stdin=stdin,
             stdout=stdout,
             stderr=stderr,
@@ -76,6 +163,7 @@ async def run_project(
         "-c",
         generate_run_script(),
         cwd=cwd,
+        new_session=True,
         stdin=stdin,
         stdout=stdout,
         stderr=stderr,
@@ -1,14 +1,28 @@
+import ast
 import asyncio
+import dataclasses
+import hashlib
 import logging
-from collections.abc import Callable, Coroutine
+import os
+import re
+import time
+from collections.abc import Callable, Coroutine, Iterator
 from pathlib import Path
-from typing import Any
+from typing import Any, Literal
 
-from watchfiles import awatch
+from anyio import to_thread
+from watchfiles import Change, awatch
 
 from kirami_cli import _
+from kirami_cli.consts import WINDOWS
 
+from .agent import AgentServer
+from .poller import PollingWatcher
 from .signal import register_signal_handler, remove_signal_handler
+from .watch import WatchScope, translate_glob
+
+# files modified this close to the start of hash priming are not primed
+PRIME_MTIME_MARGIN = 2_000_000_000
 
 
 class FileFilter:
@@ -29,7 +43,7 @@ class FileFilter:
         self.excludes = [
             default for default in default_excludes if default not in includes
         ]
-        self.exclude_dirs = []
+        self.exclude_dirs: list[Path] = []
         for e in excludes:
             p = Path(e)
             try:
@@ -39,22 +53,56 @@ class FileFilter:
                 is_dir = False
 
             if is_dir:
-                self.exclude_dirs.append(p)
+                self.exclude_dirs.append(p.resolve())
             else:
                 self.excludes.append(e)
         self.excludes = list(set(self.excludes))
 
+        self.pattern = self._compile()
+
+    def _compile(self) -> re.Pattern[str]:
+        includes = [p for p in self.includes if p.strip("/")]
+        if not includes:
+            return re.compile(r"(?!)")
+
+        # one pass over the path: the optional `.*/` backtracks from the last
+        # separator, so patterns on the file name are checked first
+        regex = ""
+        if self.exclude_dirs:
+            dirs = "|".join(re.escape(d.as_posix()) for d in self.exclude_dirs)
+            regex += f"(?!(?:{dirs})/)"
+        if excludes := [p for p in self.excludes if p.strip("/")]:
+            regex += rf"(?!(?:.*/)?(?:{'|'.join(map(translate_glob, excludes))})\Z)"
+        regex += rf"(?:.*/)?(?:{'|'.join(map(translate_glob, includes))})\Z"
+        # `Path.match` is case-insensitive on Windows
+        return re.compile(regex, re.IGNORECASE if WINDOWS else 0)
+
+    def match(self, path: str) -> bool:
+        return self.pattern.match(path.replace(os.sep, "/")) is not None
+
     def __call__(self, path: Path) -> bool:
-        for include_pattern in self.includes:
-            if path.match(include_pattern):
-                for exclude_dir in self.exclude_dirs:
-                    if exclude_dir in path.parents:
-                        return False
-
-                return not any(
-                    path.match(exclude_pattern) for exclude_pattern in self.excludes
-                )
-        return False
+        return self.match(str(path))
+
+    def watch_filter(self, change: Change, path: str) -> bool:
+        """用作 `watchfiles` 的过滤器, 在事件进入重载逻辑前完成过滤"""
+        return self.match(path)
+
+
+def file_digest(path: Path, ast_hash: bool = False) -> str | None:
+    """计算文件内容的哈希值, 文件不可读时返回 `None`
+
+    `ast_hash` 为真时 Python 文件按语法树计算, 忽略注释与空白的变化.
+    """
+    try:
+        data = path.read_bytes()
+    except OSError:
+        return None
+    if ast_hash and path.suffix == ".py":
+        try:
+            data = ast.dump(ast.parse(data)).encode()
+        except (SyntaxError, ValueError):
+            pass
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
 
 
 class Reloader:
@@ -68,37 +116,141 @@ class Reloader:
         reload_dirs: list[Path] | None = None,
         file_filter: FileFilter | None = None,
         reload_delay: float = 0.5,
+        agent: AgentServer | None = None,
+        module_reload: bool = False,
+        module_reload_timeout: float = 10.0,
+        standby_func: Callable[[], Coroutine[Any, Any, asyncio.subprocess.Process]]
+        | None = None,
+        standby_exclusive: bool = True,
+        ready_timeout: float = 60.0,
+        content_hash: Literal["none", "content", "ast"] = "content",
+        debounce_min: float = 0.05,
+        debounce_max: float = 1.0,
+        watch_scope: WatchScope | None = None,
+        backend: Literal["native", "poll"] = "native",
+        poll_interval: float = 1.0,
+        compile_func: Callable[[list[Path]], Coroutine[Any, Any, None]] | None = None,
         cwd: Path | None = None,
         logger: logging.Logger | None = None,
     ) -> None:
         self.startup_func = startup_func
         self.shutdown_func = shutdown_func
         self.process: asyncio.subprocess.Process | None = None
+        self.agent = agent
+        self.module_reload = module_reload
+        self.module_reload_timeout = module_reload_timeout
+
+        self.standby_func = standby_func if agent is not None else None
+        self.standby_exclusive = standby_exclusive
+        self.standby: asyncio.subprocess.Process | None = None
+        self.ready_timeout = ready_timeout
+        self.downtimes: list[float] = []
+        self.restarts = 0
+        self._restart_lock = asyncio.Lock()
+        self.compile_func = compile_func
+        self._compiling: asyncio.Future[None] | None = None
+        self._tasks: set[asyncio.Task] = set()
 
         self.cwd = (cwd or Path.cwd()).resolve()
         self.logger = logger
 
+        self.watch_filter = file_filter or FileFilter()
+
+        # with a scope every directory is listed and watched non-recursively,
+        # so ignored trees never get a watch
+        self.watch_scope = watch_scope
         self.reload_dirs: list[Path] = []
-        for directory in reload_dirs or []:
-            directory = directory.resolve()
-            if self.cwd not in directory.parents:
-                self.reload_dirs.append(directory)
-        if self.cwd not in self.reload_dirs:
-            self.reload_dirs.append(self.cwd)
+        if watch_scope is not None:
+            self.watch_scope = watch_scope = dataclasses.replace(
+                watch_scope,
+                dirs=[
+                    *watch_scope.dirs,
+                    *(d.resolve() for d in reload_dirs or []),
+                ],
+                exclude_dirs=[
+                    *watch_scope.exclude_dirs,
+                    *self.watch_filter.exclude_dirs,
+                ],
+            )
+            self.reload_dirs = watch_scope.walk()
+        else:
+            for directory in reload_dirs or []:
+                directory = directory.resolve()
+                if self.cwd not in directory.parents:
+                    self.reload_dirs.append(directory)
+            if self.cwd not in self.reload_dirs:
+                self.reload_dirs.append(self.cwd)
 
-        self.watch_filter = file_filter or FileFilter()
         self.reload_delay = reload_delay
 
+        self.content_hash = content_hash
+        self.hashes: dict[Path, str] = {}
+        self.suppressed = 0
+
+        self.debounce_min = debounce_min
+        self.debounce_max = debounce_max
+        self.debounce = debounce_min
+        self._last_changes = 0.0
+        self._next_changes: asyncio.Future[set[tuple[Change, str]]] | None = None
+
+        self.backend = backend
+        self.poll_interval = poll_interval
+
         self.should_exit = asyncio.Event()
-        self.watcher = awatch(
+        self._watcher_stop = asyncio.Event()
+        self.watcher = self._create_watcher()
+
+    def _create_watcher(self):
+        # awatch sets its stop event when cancelled, every watcher gets its own
+        # so that replacing the watcher does not stop the reloader
+        self._watcher_stop = asyncio.Event()
+        if self.backend == "poll":
+            return PollingWatcher(
+                *self.reload_dirs,
+                watch_filter=self._watch_filter,
+                stop_event=self._watcher_stop,
+                recursive=self.watch_scope is None,
+                interval=self.poll_interval,
+            )
+        return awatch(
             *self.reload_dirs,
-            watch_filter=None,
-            stop_event=self.should_exit,
+            watch_filter=self._watch_filter,
+            stop_event=self._watcher_stop,
+            recursive=self.watch_scope is None,
             # using yield_on_timeout here mostly to make sure tests don't
             # hang forever, won't affect the class's behavior
             yield_on_timeout=True,
         )
 
+    def _has_new_dirs(self, changes: set[tuple[Change, str]]) -> bool:
+        # new directories are not watched yet, stop waiting for more changes
+        return self.watch_scope is not None and any(
+            change == Change.added and os.path.isdir(path) for change, path in changes
+        )
+
+    def _watch_filter(self, change: Change, path: str) -> bool:
+        if (
+            self.watch_scope is not None
+            and change == Change.added
+            and os.path.isdir(path)
+        ):
+            directory = Path(path)
+            return self.watch_scope.contains(
+                directory
+            ) and not self.watch_scope.is_ignored(directory)
+        return self.watch_filter.watch_filter(change, path)
+
+    async def _rewatch(self, new_dirs: list[Path]) -> list[Path]:
+        """重新监视新增的目录, 返回其中已经存在的文件"""
+        assert self.watch_scope is not None
+        self.reload_dirs = await to_thread.run_sync(self.watch_scope.walk)
+        if self._next_changes is not None:
+            self._next_changes.cancel()
+            self._next_changes = None
+        self.watcher = self._create_watcher()
+        files = await to_thread.run_sync(list, self._iter_watched_files())
+        return [path for path in files if any(d in path.parents for d in new_dirs)]
+
     async def __aenter__(self):
         await self.startup()
         return self
@@ -124,31 +276,222 @@ class Reloader:
                                 "Watchfiles detected changes in {paths}. Reloading..."
                             ).format(paths=", ".join(map(self._display_path, changes)))
                         )
-                    await self.restart()
+                    async with self._restart_lock:
+                        self._start_compile(changes)
+                        if not await self.reload_modules(changes):
+                            await self.restart(changes)
+
+    def _start_compile(self, changes: list[Path]) -> None:
+        # compile while the old process shuts down, before the new one imports
+        sources = [path for path in changes if path.suffix == ".py" and path.exists()]
+        if self.compile_func is not None and sources:
+            self._compiling = asyncio.ensure_future(self.compile_func(sources))
+
+    async def _wait_compiled(self) -> None:
+        if self._compiling is not None:
+            compiling, self._compiling = self._compiling, None
+            await compiling
+
+    async def reload(self) -> None:
+        """立即重启 bot, 不等待文件变化"""
+        async with self._restart_lock:
+            if self.should_exit.is_set():
+                return
+            if self.logger:
+                self.logger.info(_("Reloading on request..."))
+            await self.restart()
 
     async def startup(self) -> None:
         register_signal_handler(self.handle_exit)
+        if self.content_hash != "none":
+            self._create_task(to_thread.run_sync(self._prime_hashes))
 
         self.process = await self.startup_func()
         if self.logger:
             self.logger.info(
                 _("Started reloader with process [{pid}].").format(pid=self.process.pid)
             )
-
-    async def restart(self) -> None:
+        await self.start_standby()
+
+    async def restart(self, changes: list[Path] | None = None) -> None:
+        # the standby has already read the config, it can only take over
+        # when nothing but python sources changed
+        self.restarts += 1
+        if changes and all(path.suffix == ".py" for path in changes):
+            await self._wait_compiled()
+            if await self.takeover():
+                await self.start_standby()
+                return
+        await self.stop_standby()
+
+        started = time.perf_counter()
         if self.process and self.process.returncode is None:
             await self.shutdown_func(self.process)
+        if self.agent and self.process:
+            self.agent.discard(self.process.pid)
 
         await asyncio.sleep(self.reload_delay)
+        await self._wait_compiled()
 
         self.process = await self.startup_func()
         if self.logger:
             self.logger.info(
                 _("Restarted process [{pid}].").format(pid=self.process.pid)
             )
+        self._create_task(self._record_downtime(self.process, started))
+        await self.start_standby()
+
+    @property
+    def last_restart_duration(self) -> float | None:
+        """上次重启期间 bot 无法处理事件的时间"""
+        return self.downtimes[-1] if self.downtimes else None
+
+    async def start_standby(self) -> None:
+        """启动等待接管的备用进程"""
+        if self.standby_func is None or self.standby is not None:
+            return
+        self.standby = await self.standby_func()
+        if self.logger:
+            self.logger.debug(
+                _("Started standby process [{pid}].").format(pid=self.standby.pid)
+            )
+
+    async def stop_standby(self) -> None:
+        if (standby := self.standby) is None:
+            return
+        self.standby = None
+        if standby.returncode is None:
+            await self.shutdown_func(standby)
+        if self.agent:
+            self.agent.discard(standby.pid)
+
+    async def takeover(self) -> bool:
+        """由备用进程接管, 旧进程在备用进程就绪后才会被终止
+
+        返回:
+            是否接管成功, 失败时需要冷启动
+        """
+        standby, old = self.standby, self.process
+        if self.agent is None or standby is None or standby.returncode is not None:
+            return False
+
+        started = time.perf_counter()
+        try:
+            connection = await self.agent.wait_for(standby.pid, self.ready_timeout)
+            await connection.wait_event("standby", self.ready_timeout)
+            await connection.request(
+                "takeover",
+                timeout=self.module_reload_timeout,
+                exclusive=self.standby_exclusive,
+            )
+            if self.standby_exclusive:
+                # the listening port can only be bound after the old process
+                # exited, stop it once the plugins have been imported
+                await connection.wait_event("loaded", self.ready_timeout)
+                started = time.perf_counter()
+                if old and old.returncode is None:
+                    await self.shutdown_func(old)
+                await connection.request("start", timeout=self.module_reload_timeout)
+            await connection.wait_event("ready", self.ready_timeout)
+        except (ConnectionError, asyncio.TimeoutError) as e:
+            if self.logger:
+                self.logger.warning(
+                    _("Standby process failed to take over ({reason}).").format(
+                        reason=repr(e)
+                    )
+                )
+            return False
+
+        downtime = time.perf_counter() - started if self.standby_exclusive else 0.0
+        if old and old.returncode is None:
+            await self.shutdown_func(old)
+        if old:
+            self.agent.discard(old.pid)
+
+        self.standby, self.process = None, standby
+        self.downtimes.append(downtime)
+        if self.logger:
+            self.logger.info(
+                _(
+                    "Standby process [{pid}] took over, downtime {downtime:.0f}ms."
+                ).format(pid=standby.pid, downtime=downtime * 1000)
+            )
+        return True
+
+    async def _record_downtime(
+        self, process: asyncio.subprocess.Process, started: float
+    ) -> None:
+        if self.agent is None:
+            # without the agent the readiness of the bot is unknown
+            self.downtimes.append(time.perf_counter() - started)
+            return
+        try:
+            connection = await self.agent.wait_for(process.pid, self.ready_timeout)
+            await connection.wait_event("ready", self.ready_timeout)
+        except (ConnectionError, asyncio.TimeoutError):
+            return
+        downtime = time.perf_counter() - started
+        self.downtimes.append(downtime)
+        if self.logger:
+            self.logger.info(
+                _("Process [{pid}] is ready, downtime {downtime:.0f}ms.").format(
+                    pid=process.pid, downtime=downtime * 1000
+                )
+            )
+
+    def _create_task(self, coro: Coroutine[Any, Any, None]) -> None:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def reload_modules(self, changes: list[Path]) -> bool:
+        """尝试在进程内重载变更文件所属的插件
+
+        返回:
+            是否重载成功, 失败时需要重启进程
+        """
+        if not self.module_reload or self.agent is None or self.process is None:
+            return False
+        if any(path.suffix != ".py" for path in changes):
+            return False
+        if (connection := self.agent.get(self.process.pid)) is None:
+            return False
+        await self._wait_compiled()
+
+        try:
+            result = await connection.request(
+                "reload",
+                timeout=self.module_reload_timeout,
+                paths=[str(path) for path in changes],
+            )
+        except (ConnectionError, asyncio.TimeoutError) as e:
+            result = {"status": "restart", "reason": repr(e)}
+
+        if result.get("status") != "reloaded":
+            if self.logger:
+                self.logger.warning(
+                    _("Module reload failed ({reason}), restarting process...").format(
+                        reason=result.get("reason") or result.get("error")
+                    )
+                )
+            return False
+
+        if self.logger:
+            self.logger.info(
+                _("Reloaded plugins {plugins} in {elapsed:.0f}ms.").format(
+                    plugins=", ".join(result["plugins"]),
+                    elapsed=result["elapsed"] * 1000,
+                )
+            )
+        return True
 
     async def shutdown(self) -> None:
         remove_signal_handler(self.handle_exit)
+        for task in self._tasks:
+            task.cancel()
+        if self._next_changes is not None:
+            self._next_changes.cancel()
+        await self.stop_standby()
 
         if self.process and self.process.returncode is None:
             if self.logger:
@@ -158,14 +501,138 @@ class Reloader:
             await self.shutdown_func(self.process)
 
         if self.logger:
+            if self.suppressed:
+                self.logger.info(
+                    _("Suppressed {count} restarts without content changes.").format(
+                        count=self.suppressed
+                    )
+                )
             self.logger.info(_("Stopped reloader."))
 
+    async def _wait_changes(
+        self, timeout: float | None = None
+    ) -> set[tuple[Change, str]] | None:
+        # the pending step is kept across timeouts, cancelling it would close
+        # the watcher generator
+        if self._next_changes is None:
+            self._next_changes = asyncio.ensure_future(self.watcher.__anext__())
+        exit_waiter = asyncio.ensure_future(self.should_exit.wait())
+        done, _ = await asyncio.wait(
+            {self._next_changes, exit_waiter},
+            timeout=timeout,
+            return_when=asyncio.FIRST_COMPLETED,
+        )
+        exit_waiter.cancel()
+        if self.should_exit.is_set():
+            # let the watcher finish, it raises `StopAsyncIteration` afterwards
+            self._watcher_stop.set()
+        elif self._next_changes not in done:
+            return None
+        future, self._next_changes = self._next_changes, None
+        return await future
+
+    def _observe_changes(self) -> None:
+        now = time.perf_counter()
+        gap = now - self._last_changes
+        self._last_changes = now
+        if gap < self.debounce_max:
+            # events keep coming in bursts, widen the window to cover them
+            self.debounce = min(
+                self.debounce_max,
+                max(self.debounce_min, 0.5 * self.debounce + gap),
+            )
+        else:
+            self.debounce = max(self.debounce_min, self.debounce * 0.5)
+
     async def should_restart(self) -> list[Path] | None:
-        changes = await self.watcher.__anext__()
-        if changes:
-            unique_paths = {Path(c[1]) for c in changes}
-            return [p for p in unique_paths if self.watch_filter(p)]
-        return None
+        changes = await self._wait_changes()
+        if not changes:
+            return None
+        self._observe_changes()
+
+        # coalesce bursts, e.g. editors saving several times or formatters
+        unique_paths = {Path(c[1]) for c in changes}
+        while not self._has_new_dirs(changes) and (
+            changes := await self._wait_changes(self.debounce)
+        ):
+            self._observe_changes()
+            unique_paths.update(Path(c[1]) for c in changes)
+
+        paths = [p for p in unique_paths if not p.is_dir()]
+        if new_dirs := [p for p in unique_paths if p.is_dir()]:
+            # files may have been created before the new directory was watched
+            paths.extend(await self._rewatch(new_dirs))
+        if not paths or self.content_hash == "none":
+            return paths
+
+        changed = await to_thread.run_sync(self._filter_changed, paths)
+        if not changed:
+            self.suppressed += 1
+            if self.logger:
+                self.logger.debug(
+                    _("Content of {paths} did not change, skipped.").format(
+                        paths=", ".join(map(self._display_path, paths))
+                    )
+                )
+        return changed
+
+    def _filter_changed(self, paths: list[Path]) -> list[Path]:
+        changed: list[Path] = []
+        for path in paths:
+            digest = file_digest(path, self.content_hash == "ast")
+            if digest is None:
+                self.hashes.pop(path, None)
+            elif self.hashes.get(path) == digest:
+                continue
+            else:
+                self.hashes[path] = digest
+            changed.append(path)
+        return changed
+
+    def _iter_watched_files(self) -> Iterator[Path]:
+        if self.watch_scope is not None:
+            for directory in self.reload_dirs:
+                try:
+                    entries = list(os.scandir(directory))
+                except OSError:
+                    continue
+                for entry in entries:
+                    if entry.is_file() and self.watch_filter.match(entry.path):
+                        yield Path(entry.path)
+            return
+
+        exclude_dirs = set(self.watch_filter.exclude_dirs)
+        for directory in self.reload_dirs:
+            for root, dirs, files in os.walk(directory):
+                root_path = Path(root)
+                # hidden directories such as .git and .venv are never relevant
+                dirs[:] = [
+                    d
+                    for d in dirs
+                    if not d.startswith(".")
+                    and d != "__pycache__"
+                    and root_path / d not in exclude_dirs
+                ]
+                for name in files:
+                    if self.watch_filter(path := root_path / name):
+                        yield path
+
+    def _prime_hashes(self) -> None:
+        # runs alongside the first changes, a file edited after priming started
+        # must not get its new hash recorded as the old one, leave it unknown
+        # so that the filter treats it as changed. the margin covers
+        # filesystems with coarse timestamps
+        started = time.time_ns() - PRIME_MTIME_MARGIN
+        for path in self._iter_watched_files():
+            if path not in self.hashes:
+                digest = file_digest(path, self.content_hash == "ast")
+                try:
+                    mtime = path.stat().st_mtime_ns
+                except OSError:
+                    continue
+                if digest is not None and mtime < started:
+                    # the filter may have stored a newer hash in the meantime
+                    self.hashes.setdefault(path, digest)
 
     def handle_exit(self, sig, frame):
         self.should_exit.set()
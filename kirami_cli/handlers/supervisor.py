@@ -0,0 +1,396 @@
+import asyncio
+import contextlib
+import logging
+import sys
+import time
+from collections import deque
+from collections.abc import Callable, Coroutine
+from dataclasses import dataclass, field
+from typing import IO, Any
+
+from kirami_cli import _
+
+from .agent import AgentServer
+from .logfile import LogFile, get_terminal_writer
+from .process import ProcessLike
+from .procfs import format_bytes, read_memory_usage
+from .signal import register_signal_handler, remove_signal_handler
+
+
+@dataclass
+class Worker:
+    """受监管的 bot 工作进程
+
+    参数:
+        index: 工作进程序号, 从 1 开始
+        process: 当前运行的进程
+        started: 当前进程的启动时间
+        restarts: 重启次数
+        last_restart_duration: 上次从退出到重新启动所用的时间
+        backoff: 下次重启前的等待时间
+        crashes: 崩溃循环检测窗口内的退出时间
+        failed: 是否因崩溃循环被放弃
+        stopped: 是否已正常退出 (退出码为 0), 正常退出的工作进程不会被重启
+        restarting: 是否正在被主动重启
+    """
+
+    index: int
+    process: ProcessLike | None = None
+    started: float = 0.0
+    restarts: int = 0
+    last_restart_duration: float | None = None
+    backoff: float = 0.0
+    crashes: deque[float] = field(default_factory=deque)
+    failed: bool = False
+    stopped: bool = False
+    restarting: bool = False
+
+
+class Supervisor:
+    """启动并监管多个 bot 工作进程
+
+    意外退出的工作进程会以指数退避的间隔重启, 在检测窗口内崩溃过多次的
+    工作进程被视为陷入崩溃循环并不再重启. 正常退出的工作进程被视为主动停止,
+    不会被重启, 所有工作进程都停止后监管随之结束. 所有工作进程的输出按行加上前缀后合并输出.
+
+    参数:
+        startup_func: 启动工作进程, 参数为工作进程序号与输出管道
+        shutdown_func: 关闭工作进程
+        workers: 工作进程数量
+        backoff_initial: 首次重启前的等待时间
+        backoff_max: 重启前的最长等待时间
+        crash_loop_count: 判定为崩溃循环的崩溃次数
+        crash_loop_window: 崩溃循环检测窗口, 运行超过该时间后退避时间被重置
+        agent: 代理服务, 提供时在所有工作进程启动完成后报告内存占用
+        preload: 派生工作进程的预加载进程, 一并报告内存占用
+        ready_timeout: 等待工作进程启动完成的超时时间
+        log_file: 同时写入工作进程输出的日志文件
+    """
+
+    def __init__(
+        self,
+        startup_func: Callable[..., Coroutine[Any, Any, ProcessLike]],
+        shutdown_func: Callable[[ProcessLike], Coroutine[Any, Any, None]],
+        *,
+        workers: int = 1,
+        backoff_initial: float = 0.5,
+        backoff_max: float = 30.0,
+        crash_loop_count: int = 5,
+        crash_loop_window: float = 60.0,
+        agent: AgentServer | None = None,
+        preload: ProcessLike | None = None,
+        ready_timeout: float = 60.0,
+        log_file: LogFile | None = None,
+        logger: logging.Logger | None = None,
+    ) -> None:
+        self.startup_func = startup_func
+        self.shutdown_func = shutdown_func
+        self.workers = [Worker(index) for index in range(1, workers + 1)]
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        self.crash_loop_count = crash_loop_count
+        self.crash_loop_window = crash_loop_window
+        self.agent = agent
+        self.preload = preload
+        self.ready_timeout = ready_timeout
+        self.log_file = log_file
+        self.logger = logger
+
+        self.should_exit = asyncio.Event()
+        self._reload_lock = asyncio.Lock()
+        self._tasks: set[asyncio.Task] = set()
+        self._pipes: set[asyncio.Task] = set()
+
+    @property
+    def failed(self) -> bool:
+        """是否有工作进程因崩溃循环被放弃"""
+        return any(worker.failed for worker in self.workers)
+
+    async def __aenter__(self):
+        await self.startup()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.shutdown()
+
+    async def run(self) -> None:
+        async with self:
+            await self.should_exit.wait()
+
+    async def startup(self) -> None:
+        register_signal_handler(self.handle_exit)
+        for worker in self.workers:
+            await self.start_worker(worker)
+            self._create_task(self._supervise(worker))
+        if self.logger:
+            self.logger.info(
+                _("Started supervisor with {count} workers.").format(
+                    count=len(self.workers)
+                )
+            )
+            if self.agent is not None:
+                self._create_task(self._report_memory_when_ready())
+
+    async def shutdown(self) -> None:
+        remove_signal_handler(self.handle_exit)
+        supervise_tasks = list(self._tasks)
+        for task in supervise_tasks:
+            task.cancel()
+        await asyncio.gather(*supervise_tasks, return_exceptions=True)
+
+        running = [
+            worker.process
+            for worker in self.workers
+            if worker.process and worker.process.returncode is None
+        ]
+        if running and self.logger:
+            self.logger.info(
+                _("Shutting down {count} workers...").format(count=len(running))
+            )
+        await asyncio.gather(*(self.shutdown_func(process) for process in running))
+
+        # flush what the workers printed while shutting down, the pipes may be
+        # held open by processes the workers spawned
+        if self._pipes:
+            _done, pending = await asyncio.wait(self._pipes, timeout=1.0)
+            for task in pending:
+                task.cancel()
+        if self.logger:
+            self.logger.info(_("Stopped supervisor."))
+
+    async def start_worker(self, worker: Worker) -> None:
+        process = await self.startup_func(
+            worker.index,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        worker.process = process
+        worker.started = time.monotonic()
+
+        prefix = f"[worker {worker.index}] ".encode()
+        for reader, output in (
+            (process.stdout, sys.stdout),
+            (process.stderr, sys.stderr),
+        ):
+            if reader is not None:
+                task = asyncio.create_task(
+                    pipe_output(reader, output, prefix, log_file=self.log_file)
+                )
+                self._pipes.add(task)
+                task.add_done_callback(self._pipes.discard)
+
+    async def restart_worker(self, worker: Worker) -> None:
+        """立即重启工作进程, 包括已正常退出或因崩溃循环被放弃的进程"""
+        worker.crashes.clear()
+        worker.backoff = 0.0
+        if worker.failed or worker.stopped:
+            worker.failed = worker.stopped = False
+            await self.start_worker(worker)
+            worker.restarts += 1
+            self._create_task(self._supervise(worker))
+        elif worker.process is not None and worker.process.returncode is None:
+            # the supervising task sees the exit and starts a new process
+            worker.restarting = True
+            await self.shutdown_func(worker.process)
+
+    async def reload(self) -> None:
+        """依次重启所有工作进程
+
+        每个工作进程启动完成后才重启下一个, 其余工作进程在此期间继续处理事件.
+        """
+        async with self._reload_lock:
+            if self.logger:
+                self.logger.info(_("Reloading workers one by one..."))
+            for worker in self.workers:
+                if self.should_exit.is_set():
+                    return
+                previous = worker.process
+                await self.restart_worker(worker)
+                with contextlib.suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(
+                        self._wait_ready(worker, previous), self.ready_timeout
+                    )
+
+    async def _wait_ready(self, worker: Worker, previous: ProcessLike | None) -> None:
+        # the supervising task starts the new process once the old one exits
+        while worker.process is previous or worker.process is None:
+            if self.should_exit.is_set() or worker.failed or worker.stopped:
+                return
+            await asyncio.sleep(0.05)
+        if self.agent is not None:
+            connection = await self.agent.wait_for(worker.process.pid)
+            await connection.wait_event("ready")
+
+    async def _supervise(self, worker: Worker) -> None:
+        while not self.should_exit.is_set():
+            assert worker.process is not None
+            returncode = await worker.process.wait()
+            if self.should_exit.is_set():
+                return
+
+            exited = time.monotonic()
+            if worker.restarting:
+                worker.restarting = False
+                await self._restart(worker, exited)
+                continue
+            if returncode == 0:
+                # exited on purpose, e.g. the bot shut itself down
+                worker.stopped = True
+                if self.logger:
+                    self.logger.info(
+                        _("Worker {index} exited normally, not restarting.").format(
+                            index=worker.index
+                        )
+                    )
+                self._check_done()
+                return
+            if exited - worker.started > self.crash_loop_window:
+                # ran long enough, this is not part of a crash loop
+                worker.backoff = 0.0
+                worker.crashes.clear()
+            worker.crashes.append(exited)
+            while worker.crashes[0] < exited - self.crash_loop_window:
+                worker.crashes.popleft()
+
+            if len(worker.crashes) >= self.crash_loop_count:
+                worker.failed = True
+                if self.logger:
+                    self.logger.error(
+                        _(
+                            "Worker {index} exited {count} times within {window}s, "
+                            "giving up."
+                        ).format(
+                            index=worker.index,
+                            count=len(worker.crashes),
+                            window=self.crash_loop_window,
+                        )
+                    )
+                self._check_done()
+                return
+
+            worker.backoff = min(
+                worker.backoff * 2 or self.backoff_initial, self.backoff_max
+            )
+            if self.logger:
+                self.logger.warning(
+                    _(
+                        "Worker {index} exited with code {code}, "
+                        "restarting in {delay:.1f}s..."
+                    ).format(index=worker.index, code=returncode, delay=worker.backoff)
+                )
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self.should_exit.wait(), worker.backoff)
+            if self.should_exit.is_set():
+                return
+
+            await self._restart(worker, exited)
+
+    def _check_done(self) -> None:
+        if all(worker.failed or worker.stopped for worker in self.workers):
+            self.should_exit.set()
+
+    async def _restart(self, worker: Worker, exited: float) -> None:
+        await self.start_worker(worker)
+        worker.restarts += 1
+        worker.last_restart_duration = time.monotonic() - exited
+        if self.logger:
+            assert worker.process is not None
+            self.logger.info(
+                _("Restarted worker {index} with process [{pid}].").format(
+                    index=worker.index, pid=worker.process.pid
+                )
+            )
+
+    async def _report_memory_when_ready(self) -> None:
+        assert self.agent is not None
+        pids = [worker.process.pid for worker in self.workers if worker.process]
+        try:
+            for pid in pids:
+                connection = await self.agent.wait_for(pid, self.ready_timeout)
+                await connection.wait_event("ready", self.ready_timeout)
+        except asyncio.TimeoutError:
+            return
+        self.report_memory()
+
+    def report_memory(self) -> None:
+        """报告各工作进程的内存占用
+
+        RSS 包括共享的页, 各进程 RSS 之和远大于实际占用; PSS 之和才是所有进程
+        实际占用的内存, USS 为各进程独占的内存.
+        """
+        if not self.logger:
+            return
+
+        processes = [
+            (_("worker {index}").format(index=worker.index), worker.process)
+            for worker in self.workers
+            if worker.process and worker.process.returncode is None
+        ]
+        if self.preload is not None:
+            processes.append((_("preload process"), self.preload))
+
+        total_rss = total_pss = 0
+        for name, process in processes:
+            if (usage := read_memory_usage(process.pid)) is None:
+                return
+            total_rss += usage.rss
+            total_pss += usage.pss
+            self.logger.info(
+                _("Memory of {name} [{pid}]: RSS {rss}, PSS {pss}, USS {uss}").format(
+                    name=name,
+                    pid=process.pid,
+                    rss=format_bytes(usage.rss),
+                    pss=format_bytes(usage.pss),
+                    uss=format_bytes(usage.uss),
+                )
+            )
+        self.logger.info(
+            _("Memory of all processes: {pss} (RSS adds up to {rss}).").format(
+                pss=format_bytes(total_pss), rss=format_bytes(total_rss)
+            )
+        )
+
+    def _create_task(self, coro: Coroutine[Any, Any, None]) -> None:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def handle_exit(self, sig, frame):
+        self.should_exit.set()
+
+
+async def pipe_output(
+    reader: asyncio.StreamReader,
+    output: IO[str],
+    prefix: bytes = b"",
+    limit: int = 65536,
+    log_file: LogFile | None = None,
+) -> None:
+    """将子进程的输出逐行加上前缀后写入 `output`, 提供 `log_file` 时一并写入日志文件
+
+    `output` 由后台线程写入, 终端无法及时读取时丢弃最旧的输出而不阻塞事件循环.
+    """
+    # only whole lines are written, so the output of workers never interleaves
+    # within a line; a partial line is held back until it ends or grows too long
+    terminal = get_terminal_writer(output)
+    pending = b""
+    while True:
+        chunk = await reader.read(limit)
+        if not chunk:
+            lines = [pending + b"\n"] if pending else []
+        else:
+            pending += chunk
+            end = pending.rfind(b"\n") + 1
+            if not end and len(pending) >= limit:
+                end = len(pending)
+            lines = pending[:end].splitlines(keepends=True)
+            pending = pending[end:]
+        if lines:
+            data = b"".join(prefix + line for line in lines)
+            if not data.endswith(b"\n"):
+                data += b"\n"
+            if log_file is not None:
+                log_file.write(data)
+            terminal.write(data)
+        if not chunk:
+            return
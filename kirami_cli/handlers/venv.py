@@ -1,10 +1,32 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
 from pathlib import Path
+from typing import Any
 
 import virtualenv
+from anyio import to_thread
 
 from kirami_cli.config import ConfigManager
+from kirami_cli.consts import WINDOWS
 
-from .meta import requires_python, get_default_python
+from .data import DATA_DIR
+from .lock import LockedPackage, resolve_lock
+from .meta import get_default_python, get_python_version, requires_python
+from .pip import call_pip_install
+
+VENV_TEMPLATE_DIR = DATA_DIR / "venvs"
+VENV_TEMPLATE_FILE = "kirami-template.json"
+# only these packages are baked into templates, the rest of the project
+# dependencies are installed into the cloned environment afterwards
+VENV_TEMPLATE_BASE = ("kiramibot",)
+VENV_TEMPLATE_LIMIT = 3
+# seconds a template is used for after it was built
+VENV_TEMPLATE_TTL = 7 * 24 * 60 * 60
 
 
 def detect_virtualenv(cwd: Path | None = None) -> str | None:
@@ -28,4 +50,248 @@ async def create_virtualenv(
 
     args.append(str(venv_dir))
 
-    return virtualenv.cli_run(args)
+    return await to_thread.run_sync(virtualenv.cli_run, args)
+
+
+def _normalize_package(package: str) -> str:
+    return re.sub(r"[-_.]+", "-", package).lower()
+
+
+def _get_venv_python(venv_dir: Path) -> str:
+    return str(
+        venv_dir
+        / ("Scripts" if WINDOWS else "bin")
+        / ("python.exe" if WINDOWS else "python")
+    )
+
+
+def _get_venv_site_packages(venv_dir: Path) -> Path | None:
+    if WINDOWS:
+        site_packages = venv_dir / "Lib" / "site-packages"
+        return site_packages if site_packages.is_dir() else None
+    return next(venv_dir.glob("lib/python*/site-packages"), None)
+
+
+def _read_template_meta(template: Path) -> dict[str, Any] | None:
+    try:
+        return json.loads(template.joinpath(VENV_TEMPLATE_FILE).read_text())
+    except (OSError, ValueError):
+        # incomplete or broken template
+        return None
+
+
+def _iter_virtualenv_templates() -> list[tuple[Path, dict[str, Any]]]:
+    if not VENV_TEMPLATE_DIR.is_dir():
+        return []
+    return [
+        (template, meta)
+        for template in VENV_TEMPLATE_DIR.iterdir()
+        # templates being built or removed are hidden
+        if not template.name.startswith(".")
+        and (meta := _read_template_meta(template)) is not None
+    ]
+
+
+def _is_expired(meta: dict[str, Any]) -> bool:
+    return time.time() - meta.get("created", 0) > VENV_TEMPLATE_TTL
+
+
+def _find_virtualenv_template(key: str) -> Path | None:
+    template = VENV_TEMPLATE_DIR / key
+    meta = _read_template_meta(template)
+    if meta is None or _is_expired(meta) or _get_venv_site_packages(template) is None:
+        return None
+    # mark as recently used for pruning
+    template.joinpath(VENV_TEMPLATE_FILE).touch()
+    return template
+
+
+def _prune_virtualenv_templates(limit: int = VENV_TEMPLATE_LIMIT) -> None:
+    templates = sorted(
+        _iter_virtualenv_templates(),
+        key=lambda item: item[0].joinpath(VENV_TEMPLATE_FILE).stat().st_mtime,
+        reverse=True,
+    )
+    expired = [item for item in templates[:limit] if _is_expired(item[1])]
+    for template, _meta in templates[limit:] + expired:
+        _remove_virtualenv_template(template)
+
+
+def _remove_virtualenv_template(template: Path) -> None:
+    trash = Path(tempfile.mkdtemp(dir=VENV_TEMPLATE_DIR, prefix=".remove-"))
+    try:
+        # hide it from other processes before removing the files
+        template.rename(trash / template.name)
+    except OSError:
+        pass
+    shutil.rmtree(trash, ignore_errors=True)
+
+
+async def get_virtualenv_template(
+    packages: list[str],
+    pip_args: list[str] | None = None,
+    *,
+    python_path: str | None = None,
+) -> tuple[Path | None, list[str]]:
+    """获取可用于克隆的虚拟环境模板
+
+    模板只包含 `VENV_TEMPLATE_BASE` 中的包, 按 Python 版本, 这些包解析得到的
+    版本与 pip 参数缓存, 项目的其余依赖需要在克隆后另外安装. 没有可用模板时
+    会构建新的模板, 模板在 `VENV_TEMPLATE_TTL` 秒后过期, 并只保留最近使用的
+    `VENV_TEMPLATE_LIMIT` 个模板.
+
+    Windows 下脚本启动器中写死了模板路径, 不使用模板.
+
+    参数:
+        packages: 项目需要安装的包
+        pip_args: 构建模板时额外的 pip 参数
+        python_path: 虚拟环境使用的 Python 解释器
+
+    返回:
+        模板目录 (无可用模板时为 `None`) 与模板中缺少的包
+    """
+    normalized = {_normalize_package(p): p for p in packages}
+    base = [p for n, p in normalized.items() if n in VENV_TEMPLATE_BASE]
+    if WINDOWS or not base:
+        return None, packages
+
+    if python_path is None:
+        python_path = await get_default_python()
+
+    version = await get_python_version(python_path)
+    python = f"{version['major']}.{version['minor']}"
+
+    # the template is reused only for the same versions from the same index
+    locked, _output = await resolve_lock(
+        base, [*(pip_args or []), "--no-deps"], python_path=python_path
+    )
+    if not locked:
+        return None, packages
+    requirements = sorted(p.requirement for p in locked)
+    digest = hashlib.sha256(json.dumps(pip_args or []).encode()).hexdigest()
+    key = hashlib.sha256(
+        json.dumps([python, requirements, digest]).encode()
+    ).hexdigest()[:16]
+
+    template = _find_virtualenv_template(key)
+    if template is None:
+        template = await _build_virtualenv_template(
+            key, python, locked, pip_args, python_path=python_path
+        )
+        if template is None:
+            return None, packages
+
+    meta = _read_template_meta(template) or {"packages": []}
+    missing = [p for n, p in normalized.items() if n not in meta["packages"]]
+    return template, missing
+
+
+async def _build_virtualenv_template(
+    key: str,
+    python: str,
+    locked: list[LockedPackage],
+    pip_args: list[str] | None,
+    *,
+    python_path: str,
+) -> Path | None:
+    template = VENV_TEMPLATE_DIR / key
+
+    # build under a hidden name and move it into place when complete, so
+    # concurrent builds never see or remove each other's files
+    VENV_TEMPLATE_DIR.mkdir(parents=True, exist_ok=True)
+    build_dir = Path(tempfile.mkdtemp(dir=VENV_TEMPLATE_DIR, prefix=f".{key}-"))
+    try:
+        await create_virtualenv(build_dir, prompt=key, python_path=python_path)
+        proc = await call_pip_install(
+            [p.requirement for p in locked],
+            pip_args,
+            python_path=_get_venv_python(build_dir),
+        )
+        await proc.wait()
+        if proc.returncode != 0:
+            return None
+
+        build_dir.joinpath(VENV_TEMPLATE_FILE).write_text(
+            json.dumps(
+                {
+                    "python": python,
+                    "packages": sorted(_normalize_package(p.name) for p in locked),
+                    "requirements": sorted(p.requirement for p in locked),
+                    "created": time.time(),
+                    # scripts keep pointing to where the template was built
+                    "prefix": str(build_dir.resolve()),
+                }
+            )
+        )
+        if template.exists() and _find_virtualenv_template(key) is None:
+            # expired or broken template under the same key
+            _remove_virtualenv_template(template)
+        try:
+            build_dir.rename(template)
+        except OSError:
+            # another process finished the same template first
+            return _find_virtualenv_template(key)
+    finally:
+        shutil.rmtree(build_dir, ignore_errors=True)
+
+    _prune_virtualenv_templates()
+    return template
+
+
+def _link_or_copy(src: str | Path, dst: str | Path) -> None:
+    try:
+        os.link(src, dst)
+    except OSError:
+        # cross-device or filesystem without hardlink support
+        shutil.copy2(src, dst)
+
+
+def apply_virtualenv_template(template: Path, venv_dir: Path) -> bool:
+    """将模板中安装的包克隆到新建的虚拟环境
+
+    包文件使用硬链接 (不支持时复制), 脚本中指向模板解释器的 shebang 会被重写.
+
+    返回:
+        是否完成克隆, 找不到 site-packages 时为 `False`
+    """
+    src_site = _get_venv_site_packages(template)
+    dst_site = _get_venv_site_packages(venv_dir)
+    if src_site is None or dst_site is None:
+        return False
+
+    # packages seeded by virtualenv itself, e.g. pip and setuptools
+    seeded = {
+        _normalize_package(p.name.split("-")[0]) for p in dst_site.glob("*.dist-info")
+    }
+
+    for entry in src_site.iterdir():
+        if entry.name.endswith(".dist-info") and (
+            _normalize_package(entry.name.split("-")[0]) in seeded
+        ):
+            continue
+        target = dst_site / entry.name
+        if target.exists():
+            continue
+        if entry.is_dir():
+            shutil.copytree(entry, target, copy_function=_link_or_copy)
+        else:
+            _link_or_copy(entry, target)
+
+    src_bin = Path(_get_venv_python(template)).parent
+    dst_bin = Path(_get_venv_python(venv_dir)).parent
+    meta = _read_template_meta(template) or {}
+    src_prefix = meta.get("prefix", str(template.resolve())).encode()
+    dst_prefix = str(venv_dir.resolve()).encode()
+    for script in src_bin.iterdir():
+        target = dst_bin / script.name
+        if target.exists() or not script.is_file():
+            continue
+        content = script.read_bytes()
+        if content.startswith(b"#!"):
+            shebang, sep, body = content.partition(b"\n")
+            content = shebang.replace(src_prefix, dst_prefix) + sep + body
+            target.write_bytes(content)
+            shutil.copymode(script, target)
+        else:
+            shutil.copy2(script, target)
+    return True
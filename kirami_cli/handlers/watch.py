@@ -0,0 +1,249 @@
+import os
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from .meta import get_kiramibot_config, get_project_root, strip_plugin_priority
+
+IGNORE_FILES = (".gitignore", ".kiramiignore")
+# never worth watching, whether ignored or not
+ALWAYS_IGNORED = {".git", ".hg", ".svn", "__pycache__"}
+
+
+def translate_glob_part(part: str) -> str:
+    # same semantics as fnmatch, but wildcards never cross a path separator
+    i, n = 0, len(part)
+    result: list[str] = []
+    while i < n:
+        char = part[i]
+        i += 1
+        if char == "*":
+            result.append("[^/]*")
+        elif char == "?":
+            result.append("[^/]")
+        elif char == "[":
+            j = i
+            if j < n and part[j] == "!":
+                j += 1
+            if j < n and part[j] == "]":
+                j += 1
+            while j < n and part[j] != "]":
+                j += 1
+            if j >= n:
+                result.append("\\[")
+            else:
+                chars = part[i:j].replace("\\", "\\\\")
+                i = j + 1
+                if chars.startswith("!"):
+                    chars = "^" + chars[1:]
+                elif chars.startswith("^"):
+                    chars = "\\" + chars
+                result.append(f"[{chars}]")
+        else:
+            result.append(re.escape(char))
+    return "".join(result)
+
+
+def translate_glob(pattern: str) -> str:
+    """将 `Path.match` 风格的模式转换为正则表达式
+
+    结果需要从路径中某个 `/` 之后开始匹配到末尾, 绝对模式只能从路径开头匹配.
+    """
+    pattern = pattern.replace(os.sep, "/")
+    body = "/".join(translate_glob_part(p) for p in pattern.split("/") if p)
+    if pattern.startswith("/"):
+        return rf"(?<=\A/){body}"
+    if re.match(r"[A-Za-z]:/", pattern):
+        return rf"\A{body}"
+    return body
+
+
+@dataclass
+class IgnoreRules:
+    """单个忽略文件中的规则
+
+    参数:
+        base: 忽略文件所在目录
+        rules: 编译后的规则, 依次为模式, 是否仅匹配目录, 是否为取反规则
+    """
+
+    base: Path
+    rules: list[tuple[re.Pattern[str], bool, bool]] = field(default_factory=list)
+
+    @classmethod
+    def from_file(cls, file: Path) -> "IgnoreRules":
+        rules = cls(file.parent)
+        try:
+            lines = file.read_text(encoding="utf-8", errors="replace").splitlines()
+        except OSError:
+            return rules
+        for line in lines:
+            if rule := _translate_ignore(line):
+                rules.rules.append(rule)
+        return rules
+
+    def match(self, path: Path, is_dir: bool) -> bool | None:
+        """判断路径是否被忽略, 没有规则匹配时返回 `None`"""
+        try:
+            relative = path.relative_to(self.base).as_posix()
+        except ValueError:
+            return None
+        for pattern, dir_only, negate in reversed(self.rules):
+            if (is_dir or not dir_only) and pattern.match(relative):
+                return not negate
+        return None
+
+
+def _translate_ignore(line: str) -> tuple[re.Pattern[str], bool, bool] | None:
+    # gitignore syntax: trailing spaces are trimmed unless escaped
+    line = line.rstrip("\n")
+    if not line.endswith("\\ "):
+        line = line.rstrip()
+    if not line or line.startswith("#"):
+        return None
+
+    negate = line.startswith("!")
+    if negate or line.startswith("\\!") or line.startswith("\\#"):
+        line = line[1:]
+    dir_only = line.endswith("/")
+    line = line.rstrip("/")
+    if not line:
+        return None
+
+    # patterns with a separator are relative to the ignore file
+    anchored = "/" in line
+    parts = line.lstrip("/").split("/")
+    regex = "" if anchored else "(?:.*/)?"
+    for index, part in enumerate(parts):
+        last = index == len(parts) - 1
+        if part == "**":
+            regex += ".*" if last else "(?:.*/)?"
+        else:
+            regex += translate_glob_part(part) + ("" if last else "/")
+    return re.compile(rf"{regex}\Z"), dir_only, negate
+
+
+def _load_ignore_rules(directory: Path) -> list[IgnoreRules]:
+    return [
+        IgnoreRules.from_file(file)
+        for name in IGNORE_FILES
+        if (file := directory / name).is_file()
+    ]
+
+
+def _is_ignored(path: Path, is_dir: bool, stack: list[IgnoreRules]) -> bool:
+    if path.name in ALWAYS_IGNORED:
+        return True
+    # rules in deeper ignore files take precedence
+    for rules in reversed(stack):
+        if (result := rules.match(path, is_dir)) is not None:
+            return result
+    return False
+
+
+def _is_virtualenv(directory: Path) -> bool:
+    return directory.joinpath("pyvenv.cfg").is_file()
+
+
+@dataclass
+class WatchScope:
+    """需要监视的目录范围
+
+    参数:
+        root: 项目根目录, 仅监视其中的文件
+        dirs: 需要递归监视的目录
+        files: 需要额外监视的文件, 监视其所在目录
+        exclude_dirs: 不监视的目录, 其中的目录树不会被进入
+    """
+
+    root: Path
+    dirs: list[Path] = field(default_factory=list)
+    files: list[Path] = field(default_factory=list)
+    exclude_dirs: list[Path] = field(default_factory=list)
+
+    def _get_stack(self, directory: Path) -> list[IgnoreRules]:
+        stack: list[IgnoreRules] = []
+        if self.root == directory or self.root in directory.parents:
+            parents = [directory, *directory.parents]
+            for parent in reversed(parents[: parents.index(self.root) + 1]):
+                stack.extend(_load_ignore_rules(parent))
+        return stack
+
+    def walk(self) -> list[Path]:
+        """获取需要 (非递归) 监视的全部目录, 被忽略的目录树不会被进入"""
+        watch_dirs = {self.root, *(f.parent for f in self.files)}
+        for scope_dir in self.dirs:
+            if not scope_dir.is_dir() or self.is_ignored(scope_dir):
+                continue
+            pending = [(scope_dir, self._get_stack(scope_dir))]
+            while pending:
+                directory, stack = pending.pop()
+                watch_dirs.add(directory)
+                try:
+                    entries = list(os.scandir(directory))
+                except OSError:
+                    continue
+                for entry in entries:
+                    if not entry.is_dir(follow_symlinks=False):
+                        continue
+                    path = Path(entry.path)
+                    if (
+                        path in self.exclude_dirs
+                        or _is_ignored(path, True, stack)
+                        or _is_virtualenv(path)
+                    ):
+                        continue
+                    pending.append((path, stack + _load_ignore_rules(path)))
+        return sorted(watch_dirs)
+
+    def is_ignored(self, path: Path) -> bool:
+        """判断新出现的目录是否被忽略"""
+        if any(d == path or d in path.parents for d in self.exclude_dirs):
+            return True
+        chain: list[Path] = []
+        while path != self.root and self.root in path.parents:
+            chain.append(path)
+            path = path.parent
+        return any(
+            _is_ignored(directory, True, self._get_stack(directory.parent))
+            for directory in reversed(chain)
+        )
+
+    def contains(self, path: Path) -> bool:
+        return any(d == path or d in path.parents for d in self.dirs)
+
+
+def _resolve_plugin_path(root: Path, plugin: str) -> Path | None:
+    if (path := root / plugin).exists():
+        return path
+    module = root.joinpath(*plugin.split("."))
+    if module.is_dir():
+        return module
+    if (file := module.with_suffix(".py")).is_file():
+        return file
+    # installed packages are not part of the project
+    return None
+
+
+def get_watch_scope(entry: Path | None = None, cwd: Path | None = None) -> WatchScope:
+    """根据项目配置获取需要监视的范围
+
+    监视插件目录与本地插件, 以及项目根目录中的配置与入口文件.
+    配置中没有本地插件时监视整个项目.
+    """
+    root = get_project_root(cwd).resolve()
+    config = get_kiramibot_config()
+
+    dirs: list[Path] = []
+    files: list[Path] = []
+    for plugin_dir in config.plugin_dirs:
+        dirs.append((root / strip_plugin_priority(plugin_dir)).resolve())
+    for plugin in config.plugins:
+        if path := _resolve_plugin_path(root, strip_plugin_priority(plugin)):
+            (dirs if path.is_dir() else files).append(path.resolve())
+
+    if entry is not None:
+        files.append((root / entry).resolve())
+    if not dirs:
+        dirs.append(root)
+    return WatchScope(root, dirs, files)
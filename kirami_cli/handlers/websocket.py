@@ -0,0 +1,159 @@
+import asyncio
+import base64
+import contextlib
+import hashlib
+import os
+import struct
+from collections.abc import Mapping
+from urllib.parse import urlsplit
+
+WEBSOCKET_GUID = b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+OP_CONTINUATION = 0x0
+OP_TEXT = 0x1
+OP_BINARY = 0x2
+OP_CLOSE = 0x8
+OP_PING = 0x9
+OP_PONG = 0xA
+
+
+def _apply_mask(payload: bytes, mask: bytes) -> bytes:
+    # xor as big integers, much faster than byte by byte
+    length = len(payload)
+    key = (mask * (length // 4 + 1))[:length]
+    return (int.from_bytes(payload, "big") ^ int.from_bytes(key, "big")).to_bytes(
+        length, "big"
+    )
+
+
+class WebSocketClient:
+    """只支持 `ws://` 的最小 WebSocket 客户端, 用于模拟连接到 bot 的协议端
+
+    参数:
+        reader: 已完成握手的连接的读取端
+        writer: 已完成握手的连接的写入端
+    """
+
+    def __init__(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        self._reader = reader
+        self._writer = writer
+        self._lock = asyncio.Lock()
+        self.closed = False
+
+    @classmethod
+    async def connect(
+        cls, url: str, headers: Mapping[str, str] | None = None, timeout: float = 10.0
+    ) -> "WebSocketClient":
+        """连接到 WebSocket 服务
+
+        异常:
+            OSError: 无法连接
+            ConnectionError: 服务拒绝了握手
+            asyncio.TimeoutError: 握手超时
+        """
+        parts = urlsplit(url)
+        if parts.scheme != "ws" or not parts.hostname:
+            raise ValueError(f"unsupported websocket url {url!r}")
+        port = parts.port or 80
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(parts.hostname, port), timeout
+        )
+
+        key = base64.b64encode(os.urandom(16)).decode()
+        request = [
+            f"GET {parts.path or '/'}{'?' + parts.query if parts.query else ''} HTTP/1.1",
+            f"Host: {parts.hostname}:{port}",
+            "Upgrade: websocket",
+            "Connection: Upgrade",
+            f"Sec-WebSocket-Key: {key}",
+            "Sec-WebSocket-Version: 13",
+            *(f"{name}: {value}" for name, value in (headers or {}).items()),
+        ]
+        writer.write(("\r\n".join(request) + "\r\n\r\n").encode())
+        try:
+            response = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout)
+        except asyncio.IncompleteReadError as e:
+            writer.close()
+            raise ConnectionError("connection closed during handshake") from e
+
+        status, *lines = response.decode("latin-1").split("\r\n")
+        accept = base64.b64encode(
+            hashlib.sha1(key.encode() + WEBSOCKET_GUID).digest()
+        ).decode()
+        fields = {
+            name.strip().lower(): value.strip()
+            for name, _sep, value in (line.partition(":") for line in lines)
+        }
+        if (
+            status.split(" ", 2)[1:2] != ["101"]
+            or fields.get("sec-websocket-accept") != accept
+        ):
+            writer.close()
+            raise ConnectionError(f"handshake rejected: {status}")
+        return cls(reader, writer)
+
+    async def send(self, text: str) -> None:
+        """发送一条文本消息
+
+        异常:
+            ConnectionError: 连接已断开
+        """
+        await self._send_frame(OP_TEXT, text.encode())
+
+    async def recv(self) -> str | None:
+        """接收一条文本或二进制消息, 连接关闭时返回 `None`"""
+        message = b""
+        while not self.closed:
+            try:
+                head = await self._reader.readexactly(2)
+                length = head[1] & 0x7F
+                if length == 126:
+                    (length,) = struct.unpack("!H", await self._reader.readexactly(2))
+                elif length == 127:
+                    (length,) = struct.unpack("!Q", await self._reader.readexactly(8))
+                mask = await self._reader.readexactly(4) if head[1] & 0x80 else b""
+                payload = await self._reader.readexactly(length)
+            except (asyncio.IncompleteReadError, ConnectionError):
+                self.closed = True
+                return None
+            if mask:
+                payload = _apply_mask(payload, mask)
+
+            opcode = head[0] & 0x0F
+            if opcode == OP_PING:
+                with contextlib.suppress(ConnectionError):
+                    await self._send_frame(OP_PONG, payload)
+            elif opcode == OP_CLOSE:
+                await self.close()
+                return None
+            elif opcode in (OP_TEXT, OP_BINARY, OP_CONTINUATION):
+                message += payload
+                if head[0] & 0x80:
+                    return message.decode("utf-8", "replace")
+        return None
+
+    async def close(self) -> None:
+        if self.closed:
+            return
+        with contextlib.suppress(ConnectionError):
+            await self._send_frame(OP_CLOSE, struct.pack("!H", 1000))
+        self.closed = True
+        self._writer.close()
+
+    async def _send_frame(self, opcode: int, payload: bytes) -> None:
+        # frames sent by a client are always masked
+        length = len(payload)
+        if length < 126:
+            head = struct.pack("!BB", 0x80 | opcode, 0x80 | length)
+        elif length < 1 << 16:
+            head = struct.pack("!BBH", 0x80 | opcode, 0x80 | 126, length)
+        else:
+            head = struct.pack("!BBQ", 0x80 | opcode, 0x80 | 127, length)
+        mask = os.urandom(4)
+        async with self._lock:
+            if self.closed:
+                raise ConnectionError("websocket is closed")
+            self._writer.write(head + mask + _apply_mask(payload, mask))
+            await self._writer.drain()
@@ -0,0 +1,81 @@
+import asyncio
+import os
+import tempfile
+from pathlib import Path
+
+from .pip import call_pip_wheel
+
+DEFAULT_WHEELHOUSE = "wheelhouse"
+WHEELHOUSE_REQUIREMENTS = "requirements.txt"
+
+
+def get_default_jobs() -> int:
+    return min(8, (os.cpu_count() or 1) + 4)
+
+
+async def build_wheelhouse(
+    packages: list[str],
+    wheel_dir: Path,
+    pip_args: list[str] | None = None,
+    *,
+    jobs: int | None = None,
+    python_path: str | None = None,
+) -> dict[str, bytes]:
+    """并发收集包及其依赖的 wheel 到本地目录
+
+    每个 pip 进程写入各自的临时目录, 全部完成后再合并到 `wheel_dir`,
+    避免多个进程同时写入同一个依赖的 wheel.
+
+    参数:
+        packages: 需要收集的包
+        wheel_dir: wheel 存放目录
+        pip_args: 额外的 pip 参数
+        jobs: 同时运行的 pip 进程数
+
+    返回:
+        收集失败的包及其 pip 输出
+    """
+    wheel_dir.mkdir(parents=True, exist_ok=True)
+    semaphore = asyncio.Semaphore(jobs or get_default_jobs())
+    failed: dict[str, bytes] = {}
+
+    async def _build(package: str, job_dir: Path) -> None:
+        async with semaphore:
+            proc = await call_pip_wheel(
+                package,
+                job_dir,
+                pip_args,
+                python_path=python_path,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT,
+            )
+            stdout, _ = await proc.communicate()
+            if proc.returncode != 0:
+                failed[package] = stdout
+
+    with tempfile.TemporaryDirectory(dir=wheel_dir, prefix=".build-") as temp_dir:
+        job_dirs = [Path(temp_dir, str(index)) for index in range(len(packages))]
+        await asyncio.gather(
+            *(_build(package, job_dir) for package, job_dir in zip(packages, job_dirs))
+        )
+        for job_dir in job_dirs:
+            if not job_dir.is_dir():
+                continue
+            for wheel in job_dir.iterdir():
+                # packages sharing a dependency build the same wheel
+                wheel.replace(wheel_dir / wheel.name)
+
+    if not failed:
+        wheel_dir.joinpath(WHEELHOUSE_REQUIREMENTS).write_text(
+            "".join(f"{package}\n" for package in packages), encoding="utf-8"
+        )
+    return failed
+
+
+def get_wheelhouse_packages(wheel_dir: Path) -> list[str] | None:
+    """读取构建 wheelhouse 时记录的包列表, 以便离线安装时无需访问商店"""
+    file = wheel_dir / WHEELHOUSE_REQUIREMENTS
+    if not file.is_file():
+        return None
+    lines = file.read_text(encoding="utf-8").splitlines()
+    return [line.strip() for line in lines if line.strip()]
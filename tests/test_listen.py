@@ -0,0 +1,92 @@
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+
+import pytest
+
+from kirami_cli.consts import WINDOWS
+from kirami_cli.handlers.listen import create_listen_socket
+
+# an http server accepting on the inherited socket, finishing the request it is
+# handling when asked to stop, like the bot does
+SERVER = """
+import signal, sys, threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socket import socket
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, *args):
+        pass
+
+
+server = HTTPServer(("", 0), Handler, bind_and_activate=False)
+server.socket = socket(fileno=int(sys.argv[1]))
+signal.signal(
+    signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown).start()
+)
+print("ready", flush=True)
+server.serve_forever()
+"""
+RESTARTS = 3
+# seconds between two restarts, while requests keep coming
+UPTIME = 0.5
+
+
+def start_server(fd: int) -> subprocess.Popen:
+    process = subprocess.Popen(
+        [sys.executable, "-c", SERVER, str(fd)],
+        pass_fds=(fd,),
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    assert process.stdout is not None
+    assert process.stdout.readline() == "ready\n"
+    return process
+
+
+@pytest.mark.skipif(WINDOWS, reason="sockets are passed by fd inheritance")
+def test_no_failed_requests_across_restart():
+    sock = create_listen_socket("127.0.0.1", 0)
+    url = f"http://127.0.0.1:{sock.getsockname()[1]}/"
+    results = {"ok": 0, "failed": 0}
+    done = threading.Event()
+
+    def request_loop() -> None:
+        while not done.is_set():
+            try:
+                with urllib.request.urlopen(url, timeout=10) as response:
+                    assert response.read() == b"ok"
+                results["ok"] += 1
+            except OSError:
+                results["failed"] += 1
+
+    process = start_server(sock.fileno())
+    client = threading.Thread(target=request_loop)
+    client.start()
+    try:
+        for _ in range(RESTARTS):
+            time.sleep(UPTIME)
+            # stop the old process before starting the new one, the listening
+            # socket stays open in between
+            process.terminate()
+            process.wait(10)
+            process = start_server(sock.fileno())
+        time.sleep(UPTIME)
+    finally:
+        done.set()
+        client.join()
+        process.terminate()
+        process.wait(10)
+        sock.close()
+
+    assert results["ok"]
+    assert not results["failed"], f"{results['failed']} of {sum(results.values())}"
@@ -0,0 +1,52 @@
+import asyncio
+import time
+from pathlib import Path
+
+from watchfiles import Change
+
+from kirami_cli.handlers.poller import PollingWatcher
+from kirami_cli.handlers.reloader import FileFilter
+
+DIRS = 500
+FILES_PER_DIR = 100
+INTERVAL = 0.5
+ROUNDS = 4
+# share of one core the polling may use once the tree is cached
+MAX_CPU_SHARE = 0.25
+
+
+def make_tree(root: Path) -> Path:
+    """创建 50k 个文件的目录树, 其中十分之一会通过重载过滤器"""
+    for index in range(DIRS):
+        directory = root / f"pkg{index // 50}" / f"mod{index}"
+        directory.mkdir(parents=True)
+        for number in range(FILES_PER_DIR):
+            suffix = ".py" if number % 10 == 0 else ".dat"
+            directory.joinpath(f"file{number}{suffix}").touch()
+    return root / "pkg0" / "mod0" / "file0.py"
+
+
+def test_polling_cpu_usage(tmp_path: Path):
+    changed = make_tree(tmp_path)
+    file_filter = FileFilter()
+
+    async def poll() -> tuple[float, float, set[tuple[Change, str]]]:
+        watcher = PollingWatcher(
+            tmp_path, watch_filter=file_filter.watch_filter, interval=INTERVAL
+        )
+        # the first round includes the initial scan of the whole tree
+        await watcher.__anext__()
+
+        wall, cpu = time.perf_counter(), time.process_time()
+        for _ in range(ROUNDS):
+            assert not await watcher.__anext__()
+        wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+
+        changed.write_text("changed = True\n")
+        changes = await watcher.__anext__()
+        watcher.stop_event.set()
+        return wall, cpu, changes
+
+    wall, cpu, changes = asyncio.run(poll())
+    assert cpu / wall < MAX_CPU_SHARE, f"{cpu:.2f}s CPU in {wall:.2f}s"
+    assert changes == {(Change.modified, str(changed))}